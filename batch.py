@@ -0,0 +1,88 @@
+import os
+import time
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config.constants import tx_csv, px_csv, grouping_configs
+from src.Transaction import Transaction
+from src.Price import Price
+from src.PriceIndex import PriceIndex
+from src.Portfolio import Portfolio
+
+
+
+# Batch valuation of many accounts sharing one price file
+# Each account is a folder holding its own tx_etf.csv. Monthly and yearly performances are saved as csv in output/<account>/
+# Prices are loaded and indexed once, then memory-mapped by every worker process (see PriceIndex)
+# Usage: python batch.py <accounts folder> [--output output/accounts] [--processes N]
+
+
+
+# Price index opened once per worker process (see init_worker)
+worker_price_index = None
+
+
+
+def init_worker(price_index_folder: str):
+    global worker_price_index
+    worker_price_index = PriceIndex(price_index_folder)
+
+
+
+def value_account(account_folder: str, output_folder: str) -> dict:
+    start = time.perf_counter()
+
+    # Account files are read once per batch: no parquet cache is written into the client folders
+    transaction = Transaction(os.path.join(account_folder, tx_csv), use_cache=False).reconstruct_positions()
+    portfolio = Portfolio(transaction, worker_price_index).value_positions('asof')
+    performances = portfolio.calculate_performances(grouping_configs)
+
+    account_output_folder = os.path.join(output_folder, os.path.basename(os.path.normpath(account_folder)))
+    os.makedirs(account_output_folder, exist_ok=True)
+    for suffix, performance in performances.items():
+        performance.to_csv(os.path.join(account_output_folder, f'{suffix}.csv'))
+
+    return {'account': account_folder, 'transactions': len(transaction.dataframe), 'seconds': time.perf_counter() - start}
+
+
+
+def value_accounts(account_folders: list[str], output_folder: str, processes: int = None) -> list[dict]:
+
+    """
+    Values every account folder in parallel against px_csv and returns the wall time of each account, in completion order
+    """
+
+    # Only the index of prices is shared with workers (see PriceIndex.save), so dates are kept as read
+    price = Price(px_csv, compact=False)
+
+    with tempfile.TemporaryDirectory() as price_index_folder:
+        PriceIndex.save(price, price_index_folder)
+
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_worker, initargs=(price_index_folder,)) as executor:
+            futures = [executor.submit(value_account, account_folder, output_folder) for account_folder in account_folders]
+            results = []
+            for future in as_completed(futures):
+                result = future.result()
+                print(f'{result["account"]}: {result["transactions"]} transactions valued in {result["seconds"]:.2f} s')
+                results.append(result)
+
+    return results
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Value many accounts (folders holding a tx_etf.csv) against px_etf.csv')
+    parser.add_argument('accounts', help='folder holding one sub-folder per account')
+    parser.add_argument('--output', default=os.path.join('output', 'accounts'), help='folder where per-account csv files are saved')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    args = parser.parse_args()
+
+    account_folders = sorted(os.path.join(args.accounts, name) for name in os.listdir(args.accounts) if os.path.exists(os.path.join(args.accounts, name, tx_csv)))
+
+    start = time.perf_counter()
+    results = value_accounts(account_folders, args.output, args.processes)
+    elapsed = time.perf_counter() - start
+    print(f'{len(results)} accounts valued in {elapsed:.2f} s ({sum(result["seconds"] for result in results):.2f} s of account time)')
\ No newline at end of file
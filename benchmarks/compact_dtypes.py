@@ -0,0 +1,41 @@
+import tempfile
+import pandas as pd
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+from lib.utils import get_memory_report
+from benchmarks.synthetic import write_files
+
+
+
+# Memory of the pipeline dataframes with csv dtypes vs compact dtypes (see File.compact_columns), on a random universe of 500 tickers over 20 years
+# Aggregated outputs of both runs are checked to be identical by tests/test_compact_dtypes.py
+# Run from the repository root: python -m benchmarks.compact_dtypes
+
+
+
+def run(px_path: str, tx_path: str, compact: bool, engine: str) -> pd.DataFrame:
+    transaction = Transaction(tx_path, use_cache=False, compact=compact).reconstruct_positions()
+    price = Price(px_path, use_cache=False, compact=compact).unpivot()
+    portfolio = Portfolio(transaction, price).value_positions(engine)
+    frames = {'transaction': transaction.dataframe, 'price': price.dataframe, 'unpivot': price.unpivot_dataframe, 'portfolio': portfolio.dataframe}
+    return get_memory_report(frames)
+
+
+
+if __name__ == '__main__':
+
+    with tempfile.TemporaryDirectory() as folder:
+        px_path, tx_path = write_files(folder, n_tickers=500, n_years=20, trades_per_day=100)
+        for engine in ['cartesian', 'asof']:
+            report = run(px_path, tx_path, False, engine)
+            compact_report = run(px_path, tx_path, True, engine)
+
+            print(f'Engine: {engine}')
+            # One row per column, except for the wide prices (one float64 column per ticker, unchanged)
+            columns = pd.merge(report, compact_report, how='left', on=['dataframe', 'column'], suffixes=('', '_compact'))
+            print(columns[columns['dataframe'] != 'price'].to_string(index=False))
+            for name, memory in report.groupby('dataframe', sort=False)['bytes'].sum().items():
+                compact_memory = compact_report.loc[compact_report['dataframe'] == name, 'bytes'].sum()
+                print(f'{name:<12} {memory/2**20:9.1f} MiB -> {compact_memory/2**20:9.1f} MiB ({memory/compact_memory:.1f}x smaller)')
+            print()
\ No newline at end of file
@@ -0,0 +1,50 @@
+import os
+import time
+import tempfile
+from src.Transaction import Transaction
+from src.Price import Price
+from lib.loader import Loader
+from benchmarks.synthetic import write_files
+
+
+
+# Start-up time of loading transactions (parsed then reconstructed) and prices (parsed then unpivoted) one after the other vs concurrently (lib/loader.py)
+# on a random universe of 500 tickers over 20 years, from the csv files (use_cache=False). Concurrent loading approaches the longest load only with at least 2 cores
+# Both must give the same dataframes: checked by tests/test_loader.py
+# Run from the repository root: python -m benchmarks.concurrent_loading
+
+
+
+def load_transaction(tx_path: str) -> Transaction:
+    return Transaction(tx_path, use_cache=False).reconstruct_positions()
+
+
+
+def load_price(px_path: str) -> Price:
+    return Price(px_path, use_cache=False).unpivot()
+
+
+
+def measure(function: callable, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+
+if __name__ == '__main__':
+
+    with tempfile.TemporaryDirectory() as folder:
+        px_path, tx_path = write_files(folder, n_tickers=500, n_years=20, trades_per_day=200)
+
+        transaction_time, transaction = measure(load_transaction, tx_path)
+        price_time, price = measure(load_price, px_path)
+
+        start = time.perf_counter()
+        with Loader(report=lambda message: None) as loader:
+            loader.submit('transactions', load_transaction, tx_path)
+            loader.submit('prices', load_price, px_path)
+        concurrent_time = time.perf_counter() - start
+
+    print(f'{os.cpu_count()} core(s), {transaction.rows} transactions, {price.rows} dates x {len(price.tickers)} tickers')
+    print(f'transactions: {transaction_time:.2f} s | prices: {price_time:.2f} s | sequential: {transaction_time + price_time:.2f} s | concurrent: {concurrent_time:.2f} s')
\ No newline at end of file
@@ -0,0 +1,48 @@
+import time
+from config.constants import tx_csv, px_csv
+from src.Transaction import Transaction
+from src.Price import Price
+from lib.cache import clear_cache, is_columnar_cache_available
+
+
+
+# Cold vs warm load of Price and Transaction
+# - no cache: pd.read_csv only (previous behaviour)
+# - cold: pd.read_csv + parquet copy written (first run or csv modified)
+# - warm: memory-mapped parquet copy loaded
+# Run from the repository root: python -m benchmarks.file_cache
+
+
+
+def time_load(cls: type, file_name: str, use_cache: bool, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cls(file_name, use_cache=use_cache)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+
+def time_cold_load(cls: type, file_name: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        clear_cache(file_name)
+        start = time.perf_counter()
+        cls(file_name)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+
+if __name__ == '__main__':
+
+    if not is_columnar_cache_available():
+        raise SystemExit('pyarrow is required to benchmark the columnar cache')
+
+    repeat = 5
+    for cls, file_name in [(Price, px_csv), (Transaction, tx_csv)]:
+        no_cache = time_load(cls, file_name, use_cache=False, repeat=repeat)
+        cold = time_cold_load(cls, file_name, repeat=repeat)
+        warm = time_load(cls, file_name, use_cache=True, repeat=repeat)
+        print(f'{cls.__name__:<12} no cache: {1000*no_cache:8.2f} ms | cold: {1000*cold:8.2f} ms | warm: {1000*warm:8.2f} ms | speed-up: {no_cache/warm:5.1f}x')
\ No newline at end of file
@@ -0,0 +1,46 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from lib.kernels import signed_cumsum, forward_fill, get_codes, is_numba_available
+
+
+
+# Time of the per-ticker kernels (lib/kernels.py) vs the pandas groupby path, on random rows (default: 10M rows over 5,000 tickers)
+# Results are checked to be identical by tests/test_kernels.py
+# Memory: about 60 bytes per row for the pandas path (e.g: 600 MB at 10M rows, 6 GB at 100M rows)
+# Run from the repository root: python -m benchmarks.kernels [--rows N] [--tickers N]
+
+
+
+def measure(function: callable) -> tuple[float, np.ndarray]:
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--tickers', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f'Kernel: {"numba" if is_numba_available() else "numpy"}')
+
+    # Random rows, already sorted by date (kernels and groupby keep the row order)
+    rng = np.random.default_rng(0)
+    tickers = rng.integers(0, args.tickers, args.rows)
+    quantities = rng.integers(1, 1000, args.rows)
+    is_buy = rng.random(args.rows) < 0.6
+    prices = np.where(rng.random(args.rows) < 0.5, rng.uniform(10, 500, args.rows), np.nan)
+
+    pandas_time, positions = measure(lambda: pd.Series(np.where(is_buy, quantities, -quantities)).groupby(tickers).cumsum().to_numpy())
+    kernel_time, kernel_positions = measure(lambda: signed_cumsum(get_codes(tickers), quantities, is_buy))
+    print(f'{args.rows} rows, {args.tickers} tickers | positions: groupby cumsum {pandas_time:.2f} s, kernel {kernel_time:.2f} s ({pandas_time/kernel_time:.1f}x)')
+    del positions, kernel_positions
+
+    pandas_time, filled = measure(lambda: pd.Series(prices).groupby(tickers).ffill().to_numpy())
+    kernel_time, kernel_filled = measure(lambda: forward_fill(get_codes(tickers), prices))
+    print(f'{args.rows} rows, {args.tickers} tickers | prices: groupby ffill {pandas_time:.2f} s, kernel {kernel_time:.2f} s ({pandas_time/kernel_time:.1f}x)')
\ No newline at end of file
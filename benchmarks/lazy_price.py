@@ -0,0 +1,57 @@
+import os
+import time
+import tempfile
+import numpy as np
+from config.constants import tx_csv
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+from benchmarks.synthetic import generate_prices, generate_transactions
+
+
+
+# Time of loading px_csv in full vs lazily (Price.for_transactions) to value a small account (5 tickers traded over one year) against 5,000 tickers over 20 years
+# Both from the csv (use_cache=False) and from its parquet cache, plus the lazy load on a cold cache (which parses the whole csv once to write it). Valued positions are checked to be identical by tests/test_lazy_price.py
+# Prices of the account tickers are blanked out before its first trade, so that some values rely on the price carried over from before the date range
+# Run from the repository root: python -m benchmarks.lazy_price
+
+
+
+def measure(function: callable) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+
+if __name__ == '__main__':
+
+    prices = generate_prices(n_tickers=5000, n_years=20)
+    account_tickers = list(prices.columns[1:6])
+    account_prices = prices.loc[(prices['Date'] >= '2015-01-01') & (prices['Date'] <= '2015-12-31'), ['Date'] + account_tickers].reset_index(drop=True)
+    transactions = generate_transactions(account_prices, trades_per_day=2)
+    prices.loc[(prices['Date'] >= '2014-12-01') & (prices['Date'] < '2015-01-15'), account_tickers] = np.nan
+
+    with tempfile.TemporaryDirectory() as folder:
+        px_path = os.path.join(folder, 'px_etf.csv')
+        prices.to_csv(px_path, index=False)
+        transactions.to_csv(os.path.join(folder, tx_csv), index=False)
+        transaction = Transaction(os.path.join(folder, tx_csv), use_cache=False).reconstruct_positions()
+
+        # The first load writes the parquet cache, which the cached runs below read: every column is parsed, even for a lazy load
+        cold_time, _ = measure(lambda: Price.for_transactions(px_path, transaction))
+        print(f'cold cache    lazy: {cold_time:6.2f} s (whole csv parsed and cached)')
+        for use_cache in [False, True]:
+            full_time, full_price = measure(lambda: Price(px_path, use_cache=use_cache))
+            lazy_time, lazy_price = measure(lambda: Price.for_transactions(px_path, transaction, use_cache=use_cache))
+            source = 'parquet cache' if use_cache else 'csv'
+            print(f'{source:<13} full: {full_time:6.2f} s ({full_price.rows} x {len(full_price.tickers)}) | lazy: {lazy_time:6.2f} s ({lazy_price.rows} x {len(lazy_price.tickers)})')
+
+        # The full universe is valued with the asof engine only (the cartesian one would build 25M rows). Both engines give the same prices and values
+        columns = ['date', 'ticker', 'price', 'value']
+        full_time, _ = measure(lambda: Portfolio(transaction, full_price).value_positions('asof').dataframe.reset_index(drop=True)[columns])
+        print(f'value_positions(asof) full: {full_time:6.2f} s')
+        lazy_price.unpivot()
+        for engine in ['cartesian', 'asof']:
+            lazy_time, _ = measure(lambda: Portfolio(transaction, lazy_price).value_positions(engine).dataframe.reset_index(drop=True)[columns])
+            print(f'value_positions({engine}) lazy: {lazy_time:6.2f} s')
\ No newline at end of file
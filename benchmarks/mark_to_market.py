@@ -0,0 +1,24 @@
+import time
+import tempfile
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+from benchmarks.synthetic import write_files
+
+
+
+# Time of Portfolio.mark_to_market on a random universe of 5,000 tickers over 20 years of business days
+# Run from the repository root: python -m benchmarks.mark_to_market
+
+
+
+if __name__ == '__main__':
+
+    with tempfile.TemporaryDirectory() as folder:
+        px_path, tx_path = write_files(folder, n_tickers=5000, n_years=20, trades_per_day=50)
+        portfolio = Portfolio(Transaction(tx_path, use_cache=False), Price(px_path, use_cache=False))
+        start = time.perf_counter()
+        portfolio.mark_to_market()
+        elapsed = time.perf_counter() - start
+
+    print(f'{portfolio.position_matrix.shape[0]} dates x {portfolio.position_matrix.shape[1]} tickers, {portfolio.transaction.rows} transactions: mark_to_market in {elapsed:.2f} s')
\ No newline at end of file
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+from config.constants import grouping_configs
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+from lib.charts import evolution, composition
+from benchmarks.synthetic import write_files
+
+
+
+# Time and peak memory of each stage of the pipeline, on synthetic files of the given size
+# Results are saved as json and can be compared against a baseline (e.g: a previous run saved with --output)
+# Usage: python -m benchmarks.pipeline [--tickers 50] [--years 10] [--trades-per-day 20] [--output results.json] [--baseline baseline.json] [--tolerance 0.25]
+# Exits with code 1 if a stage is slower than the baseline by more than tolerance
+
+
+
+def measure(function: callable, repeat: int) -> dict:
+    # Best time of repeat runs, then peak memory in a separate run as tracemalloc slows down allocations a lot
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': min(seconds), 'peak_mib': peak / 2**20}
+
+
+
+def run(n_tickers: int, n_years: int, trades_per_day: float, repeat: int) -> dict:
+
+    matplotlib.use('Agg', force=True)
+
+    with tempfile.TemporaryDirectory() as folder:
+        px_path, tx_path = write_files(folder, n_tickers, n_years, trades_per_day)
+
+        transaction = Transaction(tx_path, use_cache=False)
+        price = Price(px_path, use_cache=False)
+        portfolio = Portfolio(transaction, price)
+        n_cells = len(set(transaction.dates + price.dates)) * len(price.tickers)
+
+        # Each stage: function (run repeat+1 times), number of rows it reads, and number of rows it produces (evaluated after the run)
+        stages = {
+            'Transaction': (lambda: Transaction(tx_path, use_cache=False), transaction.rows, lambda: transaction.rows),
+            'Price': (lambda: Price(px_path, use_cache=False), price.rows, lambda: price.rows),
+            'Price.unpivot': (price.unpivot, price.rows, lambda: len(price.unpivot_dataframe)),
+            'Transaction.reconstruct_positions': (transaction.reconstruct_positions, transaction.rows, lambda: len(transaction.dataframe)),
+            'Portfolio.value_positions': (portfolio.value_positions, n_cells, lambda: len(portfolio.dataframe)),
+            'Portfolio.value_positions_asof': (portfolio.value_positions_asof, transaction.rows, lambda: len(portfolio.dataframe)),
+            'Portfolio.mark_to_market': (portfolio.mark_to_market, transaction.rows, lambda: portfolio.position_matrix.size),
+            'Portfolio.calculate_performances': (lambda: portfolio.calculate_performances(grouping_configs), transaction.rows, lambda: sum(len(performance) for performance in performances.values()))
+        }
+
+        results = {}
+        for name, (function, rows_in, rows_out) in stages.items():
+            results[name] = measure(function, repeat)
+            if name == 'Portfolio.calculate_performances':
+                performances = portfolio.calculate_performances(grouping_configs)
+            results[name].update({'rows_in': rows_in, 'rows_out': rows_out()})
+
+        # Charts over the whole period, closed after each run
+        monthly, yearly = performances['monthly'], performances['yearly']
+        charts = {
+            'evolution (monthly)': lambda: evolution(monthly, int(monthly['year_month'].min()), int(monthly['year_month'].max()), 'USD', os.path.join(folder, 'evolution_monthly.png')),
+            'evolution (yearly)': lambda: evolution(yearly, int(yearly['year'].min()), int(yearly['year'].max()), 'USD', os.path.join(folder, 'evolution_yearly.png')),
+            'composition (monthly)': lambda: composition(monthly, int(monthly['year_month'].min()), os.path.join(folder, 'composition_monthly.png')),
+            'composition (yearly)': lambda: composition(yearly, int(yearly['year'].min()), os.path.join(folder, 'composition_yearly.png'))
+        }
+        for name, chart in charts.items():
+            results[name] = measure(lambda: (chart(), plt.close('all')), repeat)
+            results[name].update({'rows_in': len(monthly) if 'monthly' in name else len(yearly), 'rows_out': 1})
+
+    return results
+
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    # Stages slower than baseline by more than tolerance (e.g: 0.25 = 25%)
+    regressions = []
+    for name, result in results['stages'].items():
+        if name in baseline['stages']:
+            ratio = result['seconds'] / baseline['stages'][name]['seconds']
+            if ratio > 1 + tolerance:
+                regressions.append(f'{name}: {ratio:.2f}x slower than baseline')
+    return regressions
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark each stage of the pipeline on synthetic data')
+    parser.add_argument('--tickers', type=int, default=50)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--trades-per-day', type=float, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help='json file where results are saved')
+    parser.add_argument('--baseline', default=None, help='json file of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {
+        'config': {'tickers': args.tickers, 'years': args.years, 'trades_per_day': args.trades_per_day, 'repeat': args.repeat},
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__, 'machine': platform.machine()},
+        'stages': run(args.tickers, args.years, args.trades_per_day, args.repeat)
+    }
+
+    for name, result in results['stages'].items():
+        print(f'{name:<36} {result["seconds"]:9.4f} s {result["peak_mib"]:10.1f} MiB   rows in: {result["rows_in"]}, rows out: {result["rows_out"]}')
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+        print(f'Results saved in {args.output}')
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['config'] != results['config']:
+            print(f'Warning: baseline was run with {baseline["config"]}')
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'Regression - {regression}')
+        if regressions:
+            sys.exit(1)
+        print('No regression against baseline')
\ No newline at end of file
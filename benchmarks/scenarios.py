@@ -0,0 +1,53 @@
+import time
+import tracemalloc
+import numpy as np
+from config.constants import tx_csv, px_csv, grouping_configs
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+from src.Scenario import Scenario
+
+
+
+# Time of src/Scenario.py revaluing 10,000 random scenarios (per-ticker multipliers) of tx_etf.csv and px_etf.csv, with the peak memory of its blocks
+# vs the naive way: shocked prices in the valued dataframe, then calculate_performances, once per scenario (timed on a few scenarios only)
+# Both must give the same monthly and yearly portfolio values: checked by tests/test_scenario.py
+# Run from the repository root: python -m benchmarks.scenarios
+
+
+
+def revalue_naive(portfolio: Portfolio, multipliers: np.ndarray) -> dict[str, np.ndarray]:
+    shocked = Portfolio(portfolio.transaction, portfolio.price)
+    shocked.dataframe = portfolio.dataframe.copy()
+    shocked.dataframe['price'] *= multipliers[portfolio.get_ticker_codes(shocked.dataframe['ticker'])]
+    shocked.dataframe['value'] = shocked.dataframe['position'] * shocked.dataframe['price']
+    performances = shocked.calculate_performances(grouping_configs)
+    return {suffix: performances[suffix].drop_duplicates(period)[f'portfolio_{suffix}_value'].to_numpy() for suffix, period in [('monthly', 'year_month'), ('yearly', 'year')]}
+
+
+
+if __name__ == '__main__':
+
+    portfolio = Portfolio(Transaction(tx_csv).reconstruct_positions(), Price(px_csv).unpivot()).value_positions()
+    portfolio.mark_to_market()
+    scenarios = np.random.default_rng(0).lognormal(0, 0.2, (10_000, len(portfolio.tickers)))
+
+    start = time.perf_counter()
+    scenario = Scenario(portfolio)
+    setup_time = time.perf_counter() - start
+
+    for block_size in [100, 1000, 10_000]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        revalued = scenario.revalue(scenarios, block_size)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{len(scenarios)} scenarios, blocks of {block_size:>6}: {elapsed:.3f} s (setup {setup_time:.3f} s), peak memory {peak / 2**20:.1f} MiB')
+
+    n_naive = 5
+    start = time.perf_counter()
+    for multipliers in scenarios[:n_naive]:
+        revalue_naive(portfolio, multipliers)
+    naive_time = (time.perf_counter() - start) / n_naive
+    print(f'naive: {naive_time:.3f} s per scenario, i.e {naive_time * len(scenarios):.0f} s for {len(scenarios)} scenarios')
\ No newline at end of file
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+from config.constants import tx_csv, px_csv
+
+
+
+# Start-up cost of the command line entry point (main.py), each measure being the median of 5 fresh Python processes:
+# - import time of the modules loaded by each command: lib.utils (every command) vs lib.charts (matplotlib, chart and all only)
+# - wall time of python main.py --help, aggregate and all, on tx_etf.csv and px_etf.csv copied to a temporary folder (results cached by a first run)
+# value and aggregate must not import matplotlib: exits with status 1 otherwise
+# Run from the repository root: python -m benchmarks.startup
+
+
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+runs = 5
+
+
+
+def get_median_time(command: list[str], cwd: str = repository) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[runs // 2]
+
+
+
+def get_import_time(statement: str) -> float:
+    # Import time measured in the child process, so that interpreter start-up is left out
+    code = f'import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)'
+    times = [float(subprocess.run([sys.executable, '-c', code], cwd=repository, check=True, capture_output=True, text=True).stdout) for _ in range(runs)]
+    return sorted(times)[runs // 2]
+
+
+
+if __name__ == '__main__':
+
+    for statement in ['import lib.utils', 'import src.Portfolio', 'import lib.charts']:
+        print(f'{statement:<22} {get_import_time(statement):6.3f} s')
+
+    is_lazy = True
+    with tempfile.TemporaryDirectory() as folder:
+        for file_name in [tx_csv, px_csv]:
+            shutil.copy(os.path.join(repository, file_name), folder)
+        main_path = os.path.join(repository, 'main.py')
+        subprocess.run([sys.executable, main_path, 'all'], cwd=folder, check=True, stdout=subprocess.DEVNULL)
+
+        for arguments in [['--help'], ['aggregate'], ['all']]:
+            print(f'main.py {arguments[0]:<10} {get_median_time([sys.executable, main_path, *arguments], cwd=folder):6.3f} s')
+
+        # Modules loaded by a command, checked in the process which ran it
+        for command in ['value', 'aggregate']:
+            code = f'import sys, runpy; sys.path.insert(0, {repository!r}); sys.argv = ["main.py", "{command}"]; runpy.run_path({main_path!r}, run_name="__main__"); print("matplotlib" in sys.modules)'
+            result = subprocess.run([sys.executable, '-c', code], cwd=folder, check=True, capture_output=True, text=True).stdout.split()[-1]
+            if result != 'False':
+                is_lazy = False
+                print(f'main.py {command} imports matplotlib')
+
+    print('matplotlib imported by chart commands only' if is_lazy else 'matplotlib imported by other commands')
+    sys.exit(0 if is_lazy else 1)
\ No newline at end of file
@@ -0,0 +1,70 @@
+import os
+import itertools
+import string
+import numpy as np
+import pandas as pd
+from config.constants import tx_csv, px_csv
+
+
+
+# Synthetic px_etf.csv/tx_etf.csv files of any size, following the same schemas (and passing the same checks) as the bundled ones
+
+
+
+def generate_tickers(n_tickers: int) -> list[str]:
+    # 3 capital letters, as expected by ticker_rules (up to 26^3 tickers)
+    return [''.join(letters) for letters in itertools.islice(itertools.product(string.ascii_uppercase, repeat=3), n_tickers)]
+
+
+
+def generate_prices(n_tickers: int, n_years: int, start: str = '2005-01-03', seed: int = 0) -> pd.DataFrame:
+    # One row per business day, one column per ticker. Prices follow a geometric random walk, so they stay positive
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=252*n_years).strftime('%Y-%m-%d')
+    returns = rng.normal(0.0003, 0.012, size=(len(dates), n_tickers))
+    prices = pd.DataFrame(rng.uniform(10, 500, n_tickers) * np.exp(np.cumsum(returns, axis=0)), columns=generate_tickers(n_tickers))
+    prices.insert(0, 'Date', dates)
+    return prices
+
+
+
+def generate_transactions(prices: pd.DataFrame, trades_per_day: float, missing_price_days: float = 0.02, seed: int = 0) -> pd.DataFrame:
+
+    """
+    trades_per_day: average number of transactions per date (at most one per ticker)
+    missing_price_days: share of transaction dates that are not in px_csv (like the bundled files, where some transactions are recorded on days without prices)
+    """
+
+    rng = np.random.default_rng(seed)
+    tickers = np.array([column for column in prices.columns if column != 'Date'])
+    dates = pd.to_datetime(prices['Date'])
+
+    # Some trades are moved to the next Saturday, which has no price
+    n_trades = max(int(trades_per_day * len(dates)), 2)
+    trade_dates = pd.DatetimeIndex(dates.to_numpy()[rng.integers(0, len(dates), n_trades)])
+    is_weekend = rng.random(n_trades) < missing_price_days
+    trade_dates = trade_dates + pd.to_timedelta(np.where(is_weekend, 5 - trade_dates.dayofweek, 0), unit='D')
+
+    # Quantities are derived from random target positions, so that positions never go negative
+    # One transaction at most per date and ticker, so that the order of same-day transactions does not matter
+    transactions = pd.DataFrame({
+        'date': trade_dates.strftime('%Y-%m-%d'),
+        'ticker': tickers[rng.integers(0, len(tickers), n_trades)]
+    }).drop_duplicates().sort_values(by=['ticker', 'date']).reset_index(drop=True)
+    positions = pd.Series(rng.integers(0, 10_000, len(transactions)))
+    trades = positions - positions.groupby(transactions['ticker']).shift(1).fillna(0).astype('int64')
+    transactions['qty'] = trades.abs().astype('int64')
+    transactions['order'] = np.where(trades >= 0, 'BUY', 'SELL')
+
+    return transactions.sort_values(by='date', kind='stable').reset_index(drop=True)
+
+
+
+def write_files(folder: str, n_tickers: int, n_years: int, trades_per_day: float, seed: int = 0) -> tuple[str, str]:
+    # Files are written as px_csv/tx_csv in folder, so that Price and Transaction accept their names
+    prices = generate_prices(n_tickers, n_years, seed=seed)
+    transactions = generate_transactions(prices, trades_per_day, seed=seed)
+    os.makedirs(folder, exist_ok=True)
+    prices.to_csv(os.path.join(folder, px_csv), index=False)
+    transactions.to_csv(os.path.join(folder, tx_csv), index=False)
+    return os.path.join(folder, px_csv), os.path.join(folder, tx_csv)
\ No newline at end of file
@@ -0,0 +1,59 @@
+import time
+import numpy as np
+import pandas as pd
+from config.constants import tx_schema, validation_sample_size
+from lib.utils import validate
+from benchmarks.synthetic import generate_tickers
+
+
+
+# Time of the per-call checks (previous Transaction sanity checks) against the schema validation, on a synthetic 10M-row transaction dataframe
+# The full validation costs about as much as the per-call checks (both are dominated by hashing the string columns): it is not faster, it reports every violation.
+# The cheap paths are the sampled validation and the 'auto' mode, which skips the checks on a cache already validated (see src/File.py)
+# Run from the repository root: python -m benchmarks.validation
+
+
+
+def generate(n_rows: int, n_tickers: int = 500, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    tickers = np.array(generate_tickers(n_tickers))
+    dates = pd.bdate_range('2005-01-01', '2024-12-31').strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'date': pd.array(np.array(dates)[np.sort(rng.integers(0, len(dates), n_rows))], dtype='str'),
+        'ticker': pd.array(tickers[rng.integers(0, n_tickers, n_rows)], dtype='str'),
+        'qty': rng.integers(1, 5000, n_rows),
+        'order': pd.array(np.where(rng.random(n_rows) < 0.6, 'BUY', 'SELL'), dtype='str')
+    })
+
+
+
+def per_call_checks(dataframe: pd.DataFrame):
+    # Previous checks, one pass per rule: ticker names, qty type and sign, order values
+    uncorrect_ticker_names = [ticker_name for ticker_name in dataframe['ticker'].unique() if len(ticker_name) != 3]
+    if uncorrect_ticker_names != []:
+        raise ValueError(uncorrect_ticker_names)
+    if dataframe['qty'].dtype != 'int64':
+        raise TypeError(dataframe['qty'].dtype)
+    if (dataframe['qty'] < 0).any():
+        raise ValueError('qty')
+    order_unique_values_sorted = sorted(list(dataframe['order'].unique()))
+    if order_unique_values_sorted != ['BUY', 'SELL']:
+        raise ValueError(order_unique_values_sorted)
+
+
+
+def timed(function: callable) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+
+if __name__ == '__main__':
+
+    dataframe = generate(10_000_000)
+
+    print(f'{len(dataframe)} rows')
+    print(f'per-call checks            : {timed(lambda: per_call_checks(dataframe)):7.3f} s (stops at the first violation)')
+    print(f'schema validation, full    : {timed(lambda: validate(dataframe, tx_schema)):7.3f} s (collects every violation)')
+    print(f'schema validation, sampled : {timed(lambda: validate(dataframe, tx_schema, validation_sample_size)):7.3f} s ({validation_sample_size} rows)')
\ No newline at end of file
@@ -0,0 +1,70 @@
+import os
+import time
+import tempfile
+import tracemalloc
+import itertools
+import string
+import numpy as np
+import pandas as pd
+from config.constants import tx_csv, px_csv
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+
+
+
+# Time and peak memory of Portfolio.value_positions with the 'cartesian' and 'asof' engines
+# The bundled px_etf.csv/tx_etf.csv are widened 10x and 100x by copying each ticker under new 3-letter names (prices are scaled by a random factor)
+# Run from the repository root: python -m benchmarks.valuation_engine
+
+
+
+def widen(price: pd.DataFrame, transaction: pd.DataFrame, factor: int, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    tickers = [ticker for ticker in price.columns if ticker != 'Date']
+    names = (''.join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=3))
+    mapping = {(ticker, copy): next(names) for copy in range(factor) for ticker in tickers}
+
+    wide_price = pd.concat([price[['Date']]] + [price[[ticker]].mul(rng.uniform(0.5, 2)).rename(columns={ticker: mapping[(ticker, copy)]}) for copy in range(factor) for ticker in tickers], axis=1)
+    wide_transaction = pd.concat([transaction.assign(ticker=transaction['ticker'].map({ticker: mapping[(ticker, copy)] for ticker in tickers})) for copy in range(factor)], ignore_index=True)
+    return wide_price, wide_transaction
+
+
+
+def measure(engine: str) -> tuple[float, float]:
+    transaction = Transaction(tx_csv, use_cache=False).reconstruct_positions()
+    price = Price(px_csv, use_cache=False).unpivot()
+
+    # Time and memory are measured in two separate runs as tracemalloc slows down allocations a lot
+    start = time.perf_counter()
+    Portfolio(transaction, price).value_positions(engine)
+    elapsed = time.perf_counter() - start
+
+    portfolio = Portfolio(transaction, price)
+    tracemalloc.start()
+    portfolio.value_positions(engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+
+if __name__ == '__main__':
+
+    price = pd.read_csv(px_csv)
+    transaction = pd.read_csv(tx_csv)
+    current_directory = os.getcwd()
+
+    for factor in [1, 10, 100]:
+        wide_price, wide_transaction = widen(price, transaction, factor)
+        with tempfile.TemporaryDirectory() as folder:
+            # Price and Transaction check the file names, so the widened files are written under the same names in a temporary folder
+            wide_price.to_csv(os.path.join(folder, px_csv), index=False)
+            wide_transaction.to_csv(os.path.join(folder, tx_csv), index=False)
+            os.chdir(folder)
+            try:
+                for engine in ['cartesian', 'asof']:
+                    elapsed, peak = measure(engine)
+                    print(f'{factor:>4}x ({len(wide_price.columns)-1:>5} tickers, {len(wide_transaction):>8} transactions) {engine:<10} time: {elapsed:8.3f} s | peak memory: {peak/2**20:9.1f} MiB')
+            finally:
+                os.chdir(current_directory)
\ No newline at end of file
@@ -7,10 +7,99 @@ tx_headers = ['date', 'ticker', 'qty', 'order']
 
 
 
+# Rules checked on the values of tx_csv and px_csv (see lib.utils.validate)
+# In px_schema, '*' applies to every column not named in the schema (i.e tickers). Ticker names in px_csv headers follow ticker_rules
+ticker_rules = {'length': 3}
+tx_schema = {
+    'date': {},
+    'ticker': ticker_rules,
+    'qty': {'dtype': 'int64', 'min': 0},
+    'order': {'values': ['BUY', 'SELL']}
+}
+px_schema = {
+    'Date': {},
+    '*': {'dtype': 'float64', 'min': 0}
+}
+
+# Corporate actions (optional, see src/Adjustment.py): one row per event. factor: shares held after the event per share held before (e.g: 2 for a 2-for-1 split, 1 + dividend / price for a reinvested dividend)
+ca_csv = 'ca_etf.csv'
+ca_schema = {'date': {}, 'ticker': ticker_rules, 'factor': {'dtype': 'float64', 'min': 0}}
+
+# FX rates (optional): one row per date, one column per currency, in USD per unit of currency. Tickers missing from ticker_currencies are quoted in USD
+fx_csv = 'fx_etf.csv'
+fx_schema = {'Date': {}, '*': {'dtype': 'float64', 'min': 0}}
+ticker_currencies = {}
+
+# Validation mode: 'full', 'sample' (rules on values are evaluated on validation_sample_size random rows), 'skip'
+# or 'auto': 'skip' when the file is loaded from a cache which already passed a full validation, 'full' otherwise
+validation_mode = 'auto'
+validation_sample_size = 100_000
+
+# Compact dtypes (opt-in), applied once checks passed: dates parsed once as datetime64, tickers and orders as categories, quantities as int32 when they fit
+# Aggregated outputs are identical, transactions and valued positions take 2-3x less memory (see benchmarks/compact_dtypes.py)
+compact_dtypes = False
+
+# Per-ticker cumulative sum (positions) and forward fill (prices) done in one pass over integer ticker codes instead of a pandas groupby (see lib/kernels.py)
+# Same results as the pandas path. Meant for Numba (optional dependency): without it, the NumPy fallback sorts the codes and is slower than groupby (see benchmarks/kernels.py)
+use_kernels = False
+
+
+
+# Aggregations computed by Portfolio.calculate_performances. Results are merged by suffix
+grouping_configs = [
+    {
+        'columns': ['year', 'ticker'],
+        'agg': {'value': 'sum', 'price': ['mean', 'std']},
+        'suffix': 'yearly'
+    },
+    {
+        'columns': ['year', 'month', 'ticker'],
+        'agg': {'value': 'sum', 'price': ['mean', 'std']},
+        'suffix': 'monthly'
+    },
+    {
+        'columns': ['year'],
+        'agg': {'value': 'sum'},
+        'suffix': 'yearly'
+    },
+    {
+        'columns': ['year', 'month'],
+        'agg': {'value': 'sum'},
+        'suffix': 'monthly'
+    }
+]
+
+
+
 start_year_month = 200501
 end_year_month = 202312
 
 
 
 start_year = 2005
-end_year = 2023
\ No newline at end of file
+end_year = 2023
+
+
+
+# Folder (created next to each source csv) holding the columnar cache of the parsed csv files
+cache_dir = '.cache'
+
+
+
+# Folder holding the memoized results of the pipeline stages (i.e: unpivoted prices, positions, valued portfolio, performances)
+# Results are content-addressed: a stage is only recomputed when its inputs, its parameters or result_cache_version change
+# Least recently used results are evicted once the folder exceeds result_cache_max_bytes. Bump result_cache_version when a stage's logic changes
+result_cache_dir = '.cache/results'
+result_cache_max_bytes = 1024 * 2**20
+result_cache_version = 1
+
+
+
+# Formats of the output files (see lib/output.py): 'csv', 'parquet' (partitioned by year) and/or 'feather'. Parquet and feather require pyarrow
+output_formats = ['csv']
+output_compression = 'zstd'
+
+
+
+# Number of scenarios revalued at once by src/Scenario.py. Memory of a block: block size x (tickers + months + years) floats
+scenario_block_size = 1000
\ No newline at end of file
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+import pandas as pd
+from config.constants import cache_dir, result_cache_dir, result_cache_max_bytes, result_cache_version
+from lib.profiling import stage
+
+
+
+def is_columnar_cache_available() -> bool:
+    # Parquet files are written and memory-mapped through pyarrow. Without it, we simply fall back to pd.read_csv
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+
+def get_source_signature(file_name: str) -> dict:
+    # A cached file is only valid for the exact source it was built from: same path, same size, same last modification time
+    stat = os.stat(file_name)
+    return {'path': os.path.abspath(file_name), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+
+def get_cache_paths(file_name: str, cache_directory: str = cache_dir) -> tuple[str, str]:
+
+    """
+    Returns the paths of the parquet file and of its metadata (json) for a given source csv.
+    The cache folder is created next to the source csv. The hash of the absolute path avoids collisions between files sharing the same name.
+    """
+
+    source_path = os.path.abspath(file_name)
+    folder = os.path.join(os.path.dirname(source_path), cache_directory)
+    key = hashlib.sha1(source_path.encode()).hexdigest()[:16]
+    base_name = f'{os.path.splitext(os.path.basename(source_path))[0]}_{key}'
+    return os.path.join(folder, f'{base_name}.parquet'), os.path.join(folder, f'{base_name}.json')
+
+
+
+def read_cache_metadata(file_name: str, cache_directory: str = cache_dir) -> dict:
+    # Metadata of a fresh cache (i.e source signature, plus 'validated': the key of the schemas the parsed file passed). Empty if the cache is missing or stale
+    data_path, meta_path = get_cache_paths(file_name, cache_directory)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return {}
+    with open(meta_path) as meta_file:
+        try:
+            metadata = json.load(meta_file)
+        except json.JSONDecodeError:
+            return {}
+    signature = get_source_signature(file_name)
+    if {key: metadata.get(key) for key in signature} != signature:
+        return {}
+    return metadata
+
+
+
+def is_cache_fresh(file_name: str, cache_directory: str = cache_dir) -> bool:
+    return read_cache_metadata(file_name, cache_directory) != {}
+
+
+
+def is_cache_validated(file_name: str, schema_key: str, cache_directory: str = cache_dir) -> bool:
+    # A fresh cache whose content passed a full validation can be trusted, so its checks can be skipped
+    # schema_key (e.g: get_key(tx_schema)): the rules it was validated against. A change of the rules invalidates the validation, not the cache
+    return read_cache_metadata(file_name, cache_directory).get('validated') == schema_key
+
+
+
+def mark_cache_validated(file_name: str, schema_key: str, cache_directory: str = cache_dir) -> None:
+    metadata = read_cache_metadata(file_name, cache_directory)
+    if metadata == {}:
+        return
+    _, meta_path = get_cache_paths(file_name, cache_directory)
+    # Not marked if the cache folder became read-only: the checks simply run again on next load
+    try:
+        with open(f'{meta_path}.tmp', 'w') as meta_file:
+            json.dump({**metadata, 'validated': schema_key}, meta_file)
+        os.replace(f'{meta_path}.tmp', meta_path)
+    except OSError:
+        pass
+
+
+
+def clear_cache(file_name: str, cache_directory: str = cache_dir) -> None:
+    for path in get_cache_paths(file_name, cache_directory):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+
+def read_csv_cached(file_name: str, cache_directory: str = cache_dir, usecols: list[str] = None) -> pd.DataFrame:
+
+    """
+    Drop-in replacement of pd.read_csv(file_name, usecols=usecols).
+    If a fresh parquet copy of the csv exists, it is loaded memory-mapped (only the columns in usecols, the others are never read).
+    Otherwise, the whole csv is parsed (every column, whatever usecols) and the parquet copy is (re)written, so that any later usecols is served by the cache.
+    """
+
+    if not is_columnar_cache_available():
+        return pd.read_csv(file_name, usecols=usecols)
+
+    data_path, meta_path = get_cache_paths(file_name, cache_directory)
+
+    # Step 1 - Warm path: the source did not change since the cache was written
+    if is_cache_fresh(file_name, cache_directory):
+        return pd.read_parquet(data_path, engine='pyarrow', memory_map=True, columns=usecols)
+
+    # Step 2 - Cold path: parse the csv. The signature is taken before parsing so that a csv modified meanwhile invalidates the cache on next run
+    signature = get_source_signature(file_name)
+    dataframe = pd.read_csv(file_name)
+
+    # Step 3 - Write the parquet file then its metadata, both through a temporary file so a crash never leaves a half-written cache behind
+    # The cache is only an accelerator: if it cannot be written (e.g: read-only folder, cache_directory existing as a file), the parsed csv is returned anyway
+    try:
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        dataframe.to_parquet(f'{data_path}.tmp', engine='pyarrow', index=False)
+        os.replace(f'{data_path}.tmp', data_path)
+        with open(f'{meta_path}.tmp', 'w') as meta_file:
+            json.dump(signature, meta_file)
+        os.replace(f'{meta_path}.tmp', meta_path)
+    except OSError as error:
+        print(f'Cache of {file_name} not written ({error}), the csv will be parsed again on next run')
+
+    return dataframe if usecols is None else dataframe[usecols]
+
+
+
+# Hits and misses of the memoized stages, by stage name
+result_cache_stats = {}
+
+# Memoized stages may run concurrently (e.g: transactions and prices, see lib/loader.py): one eviction at a time, so that two of them never remove the same file
+eviction_lock = threading.Lock()
+
+
+
+def get_file_key(file_name: str) -> str:
+    # Content hash of a source file: renaming, copying or touching the file keeps its key, editing a single byte changes it
+    return get_file_keys(file_name)[1]
+
+
+
+def get_file_keys(file_name: str, size: int = 0) -> tuple[str, str, int]:
+
+    """
+    Content hashes of the first size bytes and of the whole file, computed in a single read, and the number of bytes read
+    (e.g: the part of an append-only file processed by a previous run, and the whole file for the next one, see Portfolio.append_positions)
+    The first hash is None if the file is shorter than size
+    """
+
+    digest, prefix_key, position = hashlib.sha256(), None, 0
+    with open(file_name, 'rb') as source_file:
+        while True:
+            block = source_file.read(2**20)
+            if prefix_key is None and position + len(block) >= size:
+                digest.update(block[:size - position])
+                prefix_key = digest.hexdigest()
+                digest.update(block[size - position:])
+            else:
+                digest.update(block)
+            if not block:
+                break
+            position += len(block)
+    return prefix_key, digest.hexdigest(), position
+
+
+
+def get_key(*parts) -> str:
+    # Key of a result from the keys of its inputs and its parameters (json serialisable). result_cache_version invalidates every result at once
+    payload = json.dumps([result_cache_version, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+
+def evict_results(max_bytes: int = result_cache_max_bytes, cache_directory: str = result_cache_dir, keep: str = None) -> None:
+    # Removes the least recently used results (a hit refreshes the file's mtime) until the folder fits in max_bytes. 'keep' is never removed
+    if not os.path.isdir(cache_directory):
+        return
+    with eviction_lock:
+        paths = [os.path.join(cache_directory, name) for name in os.listdir(cache_directory) if name.endswith('.pkl')]
+        stats = {path: os.stat(path) for path in paths}
+        total_bytes = sum(stat.st_size for stat in stats.values())
+        for path in sorted(paths, key=lambda path: stats[path].st_mtime_ns):
+            if total_bytes <= max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total_bytes -= stats[path].st_size
+
+
+
+def memoize(stage_name: str, key: str, compute: callable, cache_directory: str = result_cache_dir, max_bytes: int = result_cache_max_bytes) -> object:
+
+    """
+    Returns the result stored under (stage_name, key) if any, otherwise calls compute(), stores its result and returns it.
+    Since compute is only called on a miss, chaining memoized stages (i.e: compute loading the result of the previous stage) skips the whole upstream pipeline on a hit.
+    """
+
+    path = os.path.join(cache_directory, f'{stage_name}_{key[:32]}.pkl')
+    stats = result_cache_stats.setdefault(stage_name, {'hits': 0, 'misses': 0, 'seconds': 0.0})
+
+    with stage(f'{stage_name} (memoized)') as running_stage:
+        start = time.perf_counter()
+
+        # Step 1 - Hit: load the stored result and refresh its mtime, so that it becomes the most recently used one. A corrupted file counts as a miss
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as result_file:
+                    result = pickle.load(result_file)
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+                os.remove(path)
+            else:
+                os.utime(path)
+                stats['hits'] += 1
+                stats['seconds'] += time.perf_counter() - start
+                running_stage.record['detail'] = 'hit'
+                return result
+
+        # Step 2 - Miss: compute the result and store it through a temporary file, so a crash never leaves a half-written result behind
+        result = compute()
+        os.makedirs(cache_directory, exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as result_file:
+            pickle.dump(result, result_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{path}.tmp', path)
+        evict_results(max_bytes, cache_directory, keep=path)
+
+        stats['misses'] += 1
+        stats['seconds'] += time.perf_counter() - start
+        running_stage.record['detail'] = 'miss'
+
+    return result
+
+
+
+def print_result_cache_report() -> None:
+    for stage_name, stats in result_cache_stats.items():
+        print(f'{stage_name}: {stats["hits"]} hit(s), {stats["misses"]} miss(es), {stats["seconds"]:.2f} s')
\ No newline at end of file
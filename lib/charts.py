@@ -0,0 +1,220 @@
+import os
+import time
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from lib import profiling
+from lib.profiling import stage
+
+
+
+# Charts of the performances (png). Kept apart from lib/utils.py so that matplotlib, slow to import, is only loaded by the code which renders charts
+# (e.g: main.py chart and all commands, QueryService.get_chart)
+
+
+
+@stage(detail=lambda df, start, end, unit, save_path=None: f'{start}-{end} {unit}', rows_in=lambda df, *args, **kwargs: len(df))
+def evolution(df: pd.DataFrame, start: int, end: int, unit: str, save_path: str = None):
+
+    """
+    start: date. If year: YYYY; if year_month: YYYYMM
+    end: date. If year: YYYY; if year_month: YYYYMM 
+    unit: USD or pct
+    """
+
+    # Dates must be 4-or-6 sized and their lengths must be equal (e.g: if start = 2024, end cannot be 202406)
+    start_length = len(str(start))
+    end_length = len(str(end))
+    valid_length = [4,6]
+    if (start_length not in valid_length or end_length not in valid_length) or (start_length != end_length):
+        raise ValueError('start and end parameters must be 4 or 6 characters long and have same length')
+    
+    # The end date cannot be inferior or equal to the start date 
+    if end<start:
+        raise ValueError('end argument must be greater than start')
+    
+    # Performance only available in USD or %
+    if unit != 'USD' and unit != 'pct':
+        raise ValueError('unit parameter must be either "USD" or "pct"')
+
+
+    # Initialize a figure with given size 
+    plt.figure(figsize=(12,6))
+
+
+    if start_length == 6:
+
+        # Check if input dataframe is correct
+        if 'year_month' not in df.columns or ('portfolio_monthly_performance_USD' not in df.columns and 'portfolio_monthly_performance_pct' not in df.columns):
+            raise ValueError('To get portfolio monthly evolution, dataframe should at least contain "year_month" and "portfolio_monthly_performance_USD"/"portfolio_monthly_performance_pct" attributes')
+
+        # Even if they have correct lengths, check if start and end dates are valid dates
+        unique_dates = df['year_month'].unique()  
+        if start not in unique_dates or end not in unique_dates:
+            raise ValueError('Invalid dates')
+
+        df_sliced = df.loc[(df['year_month']>=start) & (df['year_month']<=end), ['year_month', f'portfolio_monthly_performance_{unit}']].copy()
+        df_sliced['year_month'] = pd.to_datetime(df_sliced['year_month'], format='%Y%m')
+
+        plt.plot(df_sliced['year_month'], df_sliced[f'portfolio_monthly_performance_{unit}'], label={unit})
+
+
+    elif start_length == 4:
+
+        # Check if input dataframe is correct
+        if 'year' not in df.columns or ('portfolio_yearly_performance_USD' not in df.columns and 'portfolio_yearly_performance_pct' not in df.columns):
+            raise ValueError('To get portfolio yearly evolution, dataframe should at least contain "year" and "portfolio_yearly_performance_USD"/"portfolio_yearly_performance_pct" attributes')
+
+        # Even if they have correct lengths, check if start and end dates are valid dates
+        unique_dates = df['year'].unique()  
+        if start not in unique_dates or end not in unique_dates:
+            raise ValueError('Invalid dates')
+
+        df_sliced = df.loc[(df['year']>=start) & (df['year']<=end), ['year', f'portfolio_yearly_performance_{unit}']].copy()
+        df_sliced['year'] = pd.to_datetime(df_sliced['year'], format='%Y')
+
+        plt.plot(df_sliced['year'], df_sliced[f'portfolio_yearly_performance_{unit}'], label={unit})
+    
+
+    plt.xlabel('Year')
+    plt.ylabel('Performance')
+    plt.title(f'Portfolio performance from {start} to {end} in {unit}')
+    plt.legend()
+    
+    #plt.show()
+    if save_path != None:
+        plt.savefig(save_path)
+        print(f'Portfolio evolution from {start} to {end} saved in {save_path}')
+
+
+
+@stage(detail=lambda df, date, save_path=None: str(date), rows_in=lambda df, *args, **kwargs: len(df))
+def composition(df: pd.DataFrame, date: int, save_path: str = None):
+
+    """
+    start: date. If year: YYYY; if year_month: YYYYMM
+    end: date. If year: YYYY; if year_month: YYYYMM 
+    """
+    
+    date_length = len(str(date))
+
+    if date_length != 4 and date_length != 6:
+        raise ValueError(f'Date must have 4 or 6 characters')    
+    
+
+    # Initialize a figure with given size 
+    plt.figure(figsize=(8, 8))
+
+
+    if date_length == 6:
+
+        # Check if input dataframe is correct
+        if 'year_month' not in df.columns or 'ticker' not in df.columns or 'ticker_monthly_value' not in df.columns:
+            raise ValueError('To get portfolio monthly composition, dataframe should at least contain "year_month", "ticker" and "ticker_monthly_value"')  
+
+        # Even if it has correct length, check if date is a valid date
+        unique_dates = df['year_month'].unique()  
+        if date not in unique_dates:
+            raise ValueError('Invalid dates')
+
+        df_sliced = df.loc[df['year_month']==date, ['year_month', 'ticker', 'ticker_monthly_value']].copy()
+        df_sliced['year_month'] = pd.to_datetime(df_sliced['year_month'], format='%Y%m')
+
+        plt.pie(df_sliced['ticker_monthly_value'], labels=df_sliced['ticker'], autopct='%1.1f%%', startangle=140)
+
+
+    elif date_length == 4:
+
+        # Check if input dataframe is correct
+        if 'year' not in df.columns or 'ticker' not in df.columns or 'ticker_yearly_value' not in df.columns:
+            raise ValueError('To get portfolio yearly composition, dataframe should at least contain "year", "ticker" and "ticker_yearly_value"')  
+
+        # Even if it has correct length, check if date is a valid date
+        unique_dates = df['year'].unique()  
+        if date not in unique_dates:
+            raise ValueError('Invalid dates')
+
+        df_sliced = df.loc[df['year']==date, ['year', 'ticker', 'ticker_yearly_value']].copy()
+        df_sliced['year'] = pd.to_datetime(df_sliced['year'], format='%Y')
+
+        plt.pie(df_sliced['ticker_yearly_value'], labels=df_sliced['ticker'], autopct='%1.1f%%', startangle=140)
+        
+
+    plt.title(f'Portfolio composition in {date}')
+    plt.legend()
+    #plt.show()
+
+    if save_path != None:
+        plt.savefig(save_path)
+        print(f'Portfolio composition in {date} saved in {save_path}')
+
+
+
+# Dataframes shared by the charts rendered by a worker process (see render_charts)
+worker_dataframes = {}
+
+
+
+def init_chart_worker(dataframes: dict, origin: float):
+    # Non-interactive backend: charts are only saved as png. Start times of the stages are measured from the parent's origin (see lib.profiling.set_origin)
+    matplotlib.use('Agg', force=True)
+    worker_dataframes.update(dataframes)
+    profiling.set_origin(origin)
+
+
+
+def render_chart(spec: dict) -> dict:
+    chart_functions = {'evolution': evolution, 'composition': composition}
+    kwargs = {key: value for key, value in spec.items() if key not in ['function', 'df']}
+
+    start = time.perf_counter()
+    first_record = len(profiling.records)
+    try:
+        chart_functions[spec['function']](df=worker_dataframes[spec['df']], **kwargs)
+    finally:
+        # Close the figure right away, so memory does not grow with the number of charts
+        plt.close('all')
+
+    # Stages recorded in the worker (if profiling is on) are sent back to the parent process
+    # Depths are made relative to the worker, whose stack of running stages may be inherited from the parent process
+    records = [{**record, 'depth': record['depth'] - len(profiling.get_running_stages())} for record in profiling.records[first_record:]]
+    return {'function': spec['function'], 'save_path': spec.get('save_path'), 'seconds': time.perf_counter() - start, 'records': records}
+
+
+
+@stage(rows_in=lambda specs, *args, **kwargs: len(specs))
+def render_charts(specs: list[dict], processes: int = None) -> list[dict]:
+
+    """
+    specs: list of {'function': 'evolution' or 'composition', 'df': dataframe, and the other parameters of that function}
+    processes: number of worker processes. Default: number of CPUs (at most the number of charts)
+    Returns the render time of each chart (in seconds), in the same order as specs
+
+    N.B: Workers are forked from a fork server when the platform allows it, spawned otherwise (e.g: Windows). Either way, they start from a single-threaded process
+    and never inherit locks held by other threads of the caller (e.g: the output writer thread, see lib/output.py). The calling script must be guarded by if __name__ == '__main__'
+    """
+
+    for spec in specs:
+        if spec.get('function') not in ['evolution', 'composition']:
+            raise ValueError(f'function must be either "evolution" or "composition". Got {spec.get("function")}')
+
+    # Each dataframe is sent once to each worker instead of once per chart
+    dataframes = {id(spec['df']): spec['df'] for spec in specs}
+    worker_specs = [{**spec, 'df': id(spec['df'])} for spec in specs]
+
+    processes = min(processes or os.cpu_count(), len(specs)) or 1
+    # The fork server imports matplotlib and pandas once, instead of each worker importing them
+    # N.B: Not lib.charts, which imports lib.profiling: the fork server is not a child process, it would write the profiling reports of the parent at exit
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['pandas', 'matplotlib.pyplot'])
+    else:
+        context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_chart_worker, initargs=(dataframes, profiling.get_origin())) as executor:
+        renders = list(executor.map(render_chart, worker_specs))
+
+    for render in renders:
+        profiling.records.extend({**record, 'depth': record['depth'] + len(profiling.get_running_stages())} for record in render.pop('records'))
+    return renders
\ No newline at end of file
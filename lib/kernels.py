@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+
+
+# Per-ticker kernels on arrays already in row order (e.g: sorted by date): tickers are integer codes, and each kernel does one pass over the rows
+# instead of a pandas groupby (which hashes the keys and sorts the groups on every call)
+# With Numba, a row loop keeps the running value of each ticker in an array indexed by its code. Without it (optional dependency), a pure NumPy version
+# gets the same result from one stable sort of the codes
+
+
+
+def is_numba_available() -> bool:
+    try:
+        import numba
+    except ImportError:
+        return False
+    return True
+
+
+
+if is_numba_available():
+
+    import numba
+
+    @numba.njit(cache=True)
+    def signed_cumsum_numba(codes, quantities, is_buy, n_codes):
+        positions = np.zeros(len(codes), dtype=np.int64)
+        running = np.zeros(n_codes, dtype=np.int64)
+        for i in range(len(codes)):
+            if codes[i] < 0:
+                continue
+            running[codes[i]] += quantities[i] if is_buy[i] else -quantities[i]
+            positions[i] = running[codes[i]]
+        return positions
+
+    @numba.njit(cache=True)
+    def forward_fill_numba(codes, values, n_codes):
+        filled = np.empty(len(codes), dtype=np.float64)
+        last = np.full(n_codes, np.nan)
+        for i in range(len(codes)):
+            if codes[i] < 0:
+                filled[i] = np.nan
+                continue
+            if not np.isnan(values[i]):
+                last[codes[i]] = values[i]
+            filled[i] = last[codes[i]]
+        return filled
+
+
+
+def get_codes(keys: pd.Series) -> np.ndarray:
+    # Integer code of each key (-1 for null keys, which groupby drops)
+    codes, _ = pd.factorize(keys)
+    return codes.astype('int64')
+
+
+
+def get_group_order(codes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Row positions grouped by code (stable: rows keep their order within a group), and whether each of them starts a group
+    # Codes are narrowed to the smallest integer type first: NumPy sorts 8 and 16-bit integers with a radix sort (i.e linear time) when stable
+    narrow_codes = codes.astype('int16') if len(codes) and codes.max() < 2**15 else codes
+    order = np.argsort(narrow_codes, kind='stable')
+    sorted_codes = narrow_codes[order]
+    is_start = np.ones(len(order), dtype=bool)
+    is_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    return order, is_start
+
+
+
+def signed_cumsum(codes: np.ndarray, quantities: np.ndarray, is_buy: np.ndarray) -> np.ndarray:
+
+    """
+    Running position of each row's ticker: cumulative sum of +quantity ('BUY') or -quantity ('SELL') over the previous rows of the same code, in row order.
+    Same as np.where(is_buy, qty, -qty) then groupby(ticker).cumsum(). Rows with a null ticker (code -1) get 0 (groupby gives null)
+    """
+
+    quantities = np.asarray(quantities, dtype='int64')
+    n_codes = int(codes.max()) + 1 if len(codes) else 0
+
+    if is_numba_available():
+        positions = signed_cumsum_numba(codes, quantities, np.asarray(is_buy, dtype=bool), max(n_codes, 1))
+    else:
+        # Cumulative sum over the rows grouped by code, minus the cumulative sum reached before the start of each row's group
+        order, is_start = get_group_order(codes)
+        signed_quantities = np.where(is_buy, quantities, -quantities)[order]
+        cumulative = np.cumsum(signed_quantities)
+        starts = np.maximum.accumulate(np.where(is_start, np.arange(len(order)), 0))
+        positions = np.empty(len(codes), dtype='int64')
+        positions[order] = cumulative - cumulative[starts] + signed_quantities[starts]
+
+    return np.where(codes >= 0, positions, 0)
+
+
+
+def forward_fill(codes: np.ndarray, values: np.ndarray) -> np.ndarray:
+
+    """
+    Each null value takes the latest non-null value of a previous row with the same code, in row order (null values before the first one remain null).
+    Same as groupby(keys)[column].ffill(). Rows with a null key (code -1) are left null
+    """
+
+    values = np.asarray(values, dtype='float64')
+    n_codes = int(codes.max()) + 1 if len(codes) else 0
+
+    if is_numba_available():
+        filled = forward_fill_numba(codes, values, max(n_codes, 1))
+    else:
+        # Over the rows grouped by code: position of the latest non-null row, restarting at each group start (a null start stays null)
+        order, is_start = get_group_order(codes)
+        sorted_values = values[order]
+        latest = np.maximum.accumulate(np.where(~np.isnan(sorted_values) | is_start, np.arange(len(order)), 0))
+        filled = np.empty(len(codes), dtype='float64')
+        filled[order] = sorted_values[latest]
+
+    return np.where(codes >= 0, filled, np.nan)
\ No newline at end of file
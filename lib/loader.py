@@ -0,0 +1,104 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from lib.profiling import stage
+
+
+
+# Sources are loaded concurrently in a thread pool: csv parsing, parquet reads and most pandas / NumPy operations release the GIL,
+# so that loading both tx_csv and px_csv takes about as long as the longest of them instead of their sum (given enough cores)
+# A task chains its own post-processing (e.g: reconstruct_positions right after Transaction is loaded), which starts as soon as its source is ready,
+# while the other sources are still loading. Partitioned sources are loaded the same way, one task per file
+
+
+
+class Loader:
+
+    """
+    Runs loading tasks concurrently and prints a progress line each time one is done (e.g: [1/2] transactions loaded in 0.42 s).
+    The total of the progress lines is the number of tasks once the last one is submitted: lines of the tasks done before that are held back until then.
+    Submissions end with close(), called by result(), results() and leaving a with block.
+    results() (or leaving a with block) waits for all of them and raises the first error, if any, in submission order
+    """
+
+    def __init__(self, max_workers: int = None, report: callable = print):
+        self.report = report
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='loader')
+        self.futures = {}
+        self.done = 0
+        self.total = None
+        self.held_reports = []
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+
+
+
+    def submit(self, name: str, function: callable, *args, **kwargs) -> Future:
+        # Runs function(*args, **kwargs) as a stage named after the task
+        if name in self.futures:
+            raise ValueError(f'A task named {name} was already submitted')
+        if self.total is not None:
+            raise ValueError(f'Cannot submit {name}: the loader is closed')
+        future = self.executor.submit(self.run, name, function, *args, **kwargs)
+        self.futures[name] = future
+        return future
+
+
+
+    def run(self, name: str, function: callable, *args, **kwargs) -> object:
+        with stage(f'load {name}'):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.done += 1
+                    if self.total is None:
+                        self.held_reports.append((self.done, name, time.perf_counter() - start))
+                    else:
+                        self.report(f'[{self.done}/{self.total}] {name} loaded in {time.perf_counter() - start:.2f} s')
+
+
+
+    def close(self) -> None:
+        # Ends submissions: the number of tasks is known from now on, and the progress lines held back are printed
+        with self.lock:
+            if self.total is not None:
+                return
+            self.total = len(self.futures)
+            for done, name, elapsed in self.held_reports:
+                self.report(f'[{done}/{self.total}] {name} loaded in {elapsed:.2f} s')
+            self.held_reports = []
+
+
+
+    def result(self, name: str) -> object:
+        # Waits for one task only (e.g: to start a step depending on it while the others are still running)
+        self.close()
+        return self.futures[name].result()
+
+
+
+    def results(self) -> dict[str, object]:
+        # Waits for every task and returns their results by name
+        self.close()
+        self.executor.shutdown(wait=True)
+        results = {name: future.result() for name, future in self.futures.items()}
+        self.report(f'{len(results)} source(s) loaded in {time.perf_counter() - self.start_time:.2f} s')
+        return results
+
+
+
+    def __enter__(self):
+        return self
+
+
+
+    def __exit__(self, exception_type, *exception):
+        # Errors of the tasks are raised unless the with block itself raised
+        if exception_type is None:
+            self.results()
+        else:
+            self.close()
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        return False
\ No newline at end of file
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+
+
+# Risk and return metrics on dense dates x tickers arrays (e.g: the wide px_csv layout, one column per ticker)
+# Rolling metrics are computed from cumulative sums: the sum over a window is the difference of two cumulative sums,
+# so every ticker and every window size is handled by array operations instead of one pass (or one python call) per window
+# Missing values (NaN) are skipped: a window holding fewer than min_periods values gives NaN (by default, min_periods is the window size, like pandas rolling)
+
+
+
+trading_days = 252
+
+
+
+def get_returns(prices: np.ndarray) -> np.ndarray:
+    # Simple returns from one row to the next (NaN on first row, and when either price is missing), same as DataFrame.pct_change(fill_method=None)
+    returns = np.full(prices.shape, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = prices[1:] / prices[:-1] - 1
+    return returns
+
+
+
+def get_window_sums(arrays: list[np.ndarray], windows: list[int]) -> list[np.ndarray]:
+
+    """
+    Sums of each array (rows x columns) over the trailing windows: result[i][w, t] is the sum of arrays[i] from row t-windows[w]+1 to row t.
+    Returns one (windows x rows x columns) array per input array. The first windows[w]-1 rows are NaN
+    """
+
+    results = []
+    for array in arrays:
+        cumulative = np.zeros((len(array) + 1,) + array.shape[1:])
+        np.cumsum(array, axis=0, out=cumulative[1:])
+        sums = np.full((len(windows),) + array.shape, np.nan)
+        for i, window in enumerate(windows):
+            if window <= len(array):
+                sums[i, window - 1:] = cumulative[window:] - cumulative[:-window]
+        results.append(sums)
+    return results
+
+
+
+def get_window_statistics(returns: np.ndarray, windows: list[int], min_periods: int = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+
+    """
+    Count, mean and standard deviation (ddof=1) of returns over the trailing windows, as (windows x rows x columns) arrays.
+    Returns are centered on their column mean before summing, so that squared sums do not lose precision (the variance does not depend on it)
+    """
+
+    is_valid = ~np.isnan(returns)
+    offset = np.nanmean(returns, axis=0) if is_valid.any() else np.zeros(returns.shape[1])
+    centered = np.where(is_valid, returns - offset, 0)
+    count, total, squared_total = get_window_sums([is_valid.astype('float64'), centered, centered**2], windows)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        variance = np.maximum(squared_total - total * mean, 0) / (count - 1)
+
+    is_enough = count >= get_min_periods(windows, min_periods)
+    return count, np.where(is_enough, mean + offset, np.nan), np.where(is_enough & (count > 1), np.sqrt(variance), np.nan)
+
+
+
+def get_min_periods(windows: list[int], min_periods: int = None) -> np.ndarray:
+    # Broadcastable against (windows x rows x columns) arrays
+    return np.array([min_periods or window for window in windows])[:, None, None]
+
+
+
+def rolling_volatility(returns: np.ndarray, windows: list[int], min_periods: int = None) -> np.ndarray:
+    # Annualized standard deviation of returns over each window
+    _, _, std = get_window_statistics(returns, windows, min_periods)
+    return std * np.sqrt(trading_days)
+
+
+
+def rolling_sharpe(returns: np.ndarray, windows: list[int], risk_free: float = 0.0, min_periods: int = None) -> np.ndarray:
+    # Annualized mean excess return over its standard deviation. risk_free: annual rate
+    _, mean, std = get_window_statistics(returns - risk_free / trading_days, windows, min_periods)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return mean / std * np.sqrt(trading_days)
+
+
+
+def rolling_sortino(returns: np.ndarray, windows: list[int], risk_free: float = 0.0, min_periods: int = None) -> np.ndarray:
+    # Annualized mean excess return over its downside deviation (i.e root mean square of the negative excess returns, 0 counting for the positive ones)
+    excess = returns - risk_free / trading_days
+    count, mean, _ = get_window_statistics(excess, windows, min_periods)
+    downside, = get_window_sums([np.where(np.isnan(excess), 0, np.minimum(excess, 0))**2], windows)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return mean / np.sqrt(downside / count) * np.sqrt(trading_days)
+
+
+
+def rolling_beta(returns: np.ndarray, benchmark_returns: np.ndarray, windows: list[int], min_periods: int = None) -> np.ndarray:
+    # Covariance with the benchmark over the benchmark variance, on rows where both returns are known
+    is_valid = ~np.isnan(returns) & ~np.isnan(benchmark_returns)[:, None]
+    x = np.where(is_valid, returns - np.nanmean(returns, axis=0), 0)
+    y = np.where(is_valid, (benchmark_returns - np.nanmean(benchmark_returns))[:, None], 0)
+    count, x_total, y_total, xy_total, yy_total = get_window_sums([is_valid.astype('float64'), x, y, x * y, y * y], windows)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        beta = (xy_total - x_total * y_total / count) / (yy_total - y_total**2 / count)
+    return np.where(count >= get_min_periods(windows, min_periods), beta, np.nan)
+
+
+
+def get_drawdowns(prices: np.ndarray) -> np.ndarray:
+    # Loss from the highest price reached so far (0 at a new high, -0.2 when 20% below it). Missing prices are skipped by the running maximum
+    with np.errstate(invalid='ignore'):
+        return prices / np.fmax.accumulate(prices, axis=0) - 1
+
+
+
+def get_correlation_matrix(returns: np.ndarray, window: int = None) -> np.ndarray:
+
+    """
+    Correlation of returns between every pair of columns, over the last window rows (all rows if None).
+    Each pair uses the rows where both returns are known, like DataFrame.corr: all pairs are computed at once by matrix products
+    """
+
+    returns = returns[-window:] if window else returns
+    is_valid = (~np.isnan(returns)).astype('float64')
+    x = np.where(is_valid > 0, returns - np.nanmean(returns, axis=0), 0)
+
+    # Pairwise sums: count[i, j] = rows where both are known, total[i, j] = sum of column i on those rows, etc.
+    count = is_valid.T @ is_valid
+    total = x.T @ is_valid
+    squared_total = (x**2).T @ is_valid
+    product_total = x.T @ x
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = product_total - total * total.T / count
+        variance = squared_total - total**2 / count
+        return covariance / np.sqrt(variance * variance.T)
+
+
+
+def get_risk_metrics(dates: list, tickers: list[str], prices: np.ndarray, windows: list[int] = (21, 63, 252), benchmark: str = 'SPY', risk_free: float = 0.0, correlation_window: int = None) -> dict[str, pd.DataFrame]:
+
+    """
+    All metrics of a dates x tickers price array (e.g: price.dataframe[price.tickers]), at once for every window.
+    Returns {'volatility', 'sharpe', 'sortino', 'beta': dates x (window, ticker) dataframes, 'drawdown': dates x tickers, 'correlation': tickers x tickers}
+    'beta' is only computed if benchmark is one of tickers
+    """
+
+    windows = list(windows)
+    returns = get_returns(prices)
+
+    def to_dataframe(metric: np.ndarray) -> pd.DataFrame:
+        # (windows x rows x tickers) to rows x (window, ticker)
+        columns = pd.MultiIndex.from_product([windows, tickers], names=['window', 'ticker'])
+        return pd.DataFrame(metric.transpose(1, 0, 2).reshape(len(dates), -1), index=dates, columns=columns)
+
+    metrics = {
+        'volatility': to_dataframe(rolling_volatility(returns, windows)),
+        'sharpe': to_dataframe(rolling_sharpe(returns, windows, risk_free)),
+        'sortino': to_dataframe(rolling_sortino(returns, windows, risk_free)),
+        'drawdown': pd.DataFrame(get_drawdowns(prices), index=dates, columns=tickers),
+        'correlation': pd.DataFrame(get_correlation_matrix(returns, correlation_window), index=tickers, columns=tickers)
+    }
+    if benchmark in tickers:
+        metrics['beta'] = to_dataframe(rolling_beta(returns, returns[:, list(tickers).index(benchmark)], windows))
+
+    return metrics
\ No newline at end of file
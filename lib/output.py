@@ -0,0 +1,145 @@
+import os
+import shutil
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, Future
+from config.constants import output_formats, output_compression
+from lib.cache import is_columnar_cache_available
+from lib.profiling import stage
+
+
+
+# Output formats. Every file (or partitioned folder) is written to a temporary path first, then moved in place by a rename:
+# a reader never sees a half-written output, only the previous version or the new one
+# - csv: one file, with the index (same as dataframe.to_csv)
+# - parquet: compressed, partitioned by year if the dataframe has a 'year' column (hive layout: <name>.parquet/year=2005/part-0.parquet), one file otherwise
+# - feather: one compressed file (the index is not stored)
+# Add a format by adding its write function to writers
+
+
+
+def replace_file(path: str, write: callable) -> None:
+    # write(temporary_path) then atomic replacement of path. The temporary file is removed if write fails
+    temporary_path = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+    try:
+        write(temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+
+def write_csv(dataframe: pd.DataFrame, path: str) -> str:
+    path = f'{path}.csv'
+    replace_file(path, lambda temporary_path: dataframe.to_csv(temporary_path))
+    return path
+
+
+
+def write_parquet(dataframe: pd.DataFrame, path: str) -> str:
+
+    # A partitioned dataset is written whole to a sibling temporary folder, then swapped in by renames: a reader never sees a mix of two versions
+    # The year is stored in the folder names only (hive layout). pd.read_parquet(path) adds it back as the last column, with a categorical dtype:
+    # the other columns read back equal, 'year' needs .astype(int) (and moving it back) to compare with the dataframe
+
+    path = f'{path}.parquet'
+    if 'year' not in dataframe.columns:
+        replace_file(path, lambda temporary_path: dataframe.to_parquet(temporary_path, engine='pyarrow', compression=output_compression, index=False))
+        return path
+
+    temporary_path = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+    try:
+        for year, partition in dataframe.groupby('year', sort=True):
+            os.makedirs(os.path.join(temporary_path, f'year={year}'))
+            partition.drop(columns='year').to_parquet(os.path.join(temporary_path, f'year={year}', 'part-0.parquet'), engine='pyarrow', compression=output_compression, index=False)
+        replace_folder(temporary_path, path)
+    finally:
+        shutil.rmtree(temporary_path, ignore_errors=True)
+    return path
+
+
+
+def replace_folder(temporary_path: str, path: str) -> None:
+    # One rename if path does not exist yet. Otherwise, rename cannot replace a folder (nor a folder a file), so the previous version is renamed aside first,
+    # then removed once the new one is in place: path is only missing between the two renames, and is never partially written
+    if not os.path.exists(path):
+        os.rename(temporary_path, path)
+        return
+    previous_path = f'{temporary_path}-previous'
+    os.rename(path, previous_path)
+    os.rename(temporary_path, path)
+    if os.path.isdir(previous_path):
+        shutil.rmtree(previous_path, ignore_errors=True)
+    else:
+        os.remove(previous_path)
+
+
+
+def write_feather(dataframe: pd.DataFrame, path: str) -> str:
+    path = f'{path}.feather'
+    replace_file(path, lambda temporary_path: dataframe.reset_index(drop=True).to_feather(temporary_path, compression=output_compression))
+    return path
+
+
+
+writers = {'csv': write_csv, 'parquet': write_parquet, 'feather': write_feather}
+
+
+
+@stage(detail=lambda dataframe, path, formats=output_formats: f'{os.path.basename(path)} {formats}', rows_in=lambda dataframe, *args, **kwargs: len(dataframe))
+def write_output(dataframe: pd.DataFrame, path: str, formats: list[str] = output_formats) -> list[str]:
+    # Writes dataframe in every format of formats. path: without extension (e.g: output/monthly). Returns the paths written
+    for output_format in formats:
+        if output_format not in writers:
+            raise ValueError(f'Output formats must be among {list(writers)}. Got {output_format}')
+        if output_format != 'csv' and not is_columnar_cache_available():
+            raise ImportError(f'pyarrow is required to write {output_format} files')
+    paths = []
+    for output_format in formats:
+        paths.append(writers[output_format](dataframe, path))
+    return paths
+
+
+
+class OutputWriter:
+
+    """
+    Writes outputs in a background thread, so that the caller (e.g: chart rendering) does not wait for I/O.
+    Writes are done one at a time, in submission order. close() (or leaving a with block) waits for all of them and raises the first error, if any
+    """
+
+    def __init__(self, formats: list[str] = output_formats):
+        self.formats = formats
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='output')
+        self.futures = []
+
+
+
+    def submit(self, dataframe: pd.DataFrame, path: str) -> Future:
+        # The dataframe must not be modified until the write is done
+        future = self.executor.submit(write_output, dataframe, path, self.formats)
+        self.futures.append(future)
+        return future
+
+
+
+    def close(self) -> list[str]:
+        # Waits for every write and returns all paths written
+        self.executor.shutdown(wait=True)
+        return [path for future in self.futures for path in future.result()]
+
+
+
+    def __enter__(self):
+        return self
+
+
+
+    def __exit__(self, exception_type, *exception):
+        # Errors of the writes are raised unless the with block itself raised
+        if exception_type is None:
+            self.close()
+        else:
+            self.executor.shutdown(wait=True)
+        return False
\ No newline at end of file
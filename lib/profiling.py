@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import atexit
+import threading
+import cProfile
+import functools
+import tracemalloc
+import multiprocessing
+
+
+
+# Stage-level instrumentation, off by default. Environment variables:
+# - ETF_PROFILE=1: records wall time, CPU time and rows in/out of every stage, and prints a summary at exit
+# - ETF_PROFILE_MEMORY=1: also records the peak memory of every stage (tracemalloc, which slows down allocations)
+#   tracemalloc keeps a single peak for the whole process: the peak of a stage overlapping a stage of another thread (e.g: sources loaded concurrently, see lib/loader.py)
+#   would include the allocations of both, so it is not recorded (peak_mib is None)
+# - ETF_PROFILE_TRACE=<path>: saves the records as a json trace at exit
+# - ETF_PROFILE_CPROFILE=<path>: saves a cProfile dump of the whole run at exit (e.g: to open with snakeviz or pstats)
+# When off, a stage costs one attribute lookup
+# Summary, trace and cProfile dump are written by the main process only: child processes (e.g: chart workers) send their records back to it
+
+
+
+is_enabled = os.environ.get('ETF_PROFILE', '0') not in ['', '0']
+is_memory_enabled = is_enabled and os.environ.get('ETF_PROFILE_MEMORY', '0') not in ['', '0']
+
+# Start times are relative to this module import in the main process (child processes align on it with set_origin)
+start_time = time.perf_counter()
+
+# Records of the finished stages, in order of completion, and stack of running stages of each thread (e.g: outputs written in a background thread, see lib/output.py)
+records = []
+thread_state = threading.local()
+
+# Running stages of every thread when recording memory, to detect overlapping stages
+memory_stages = []
+memory_lock = threading.Lock()
+
+
+
+def get_running_stages() -> list:
+    if not hasattr(thread_state, 'running_stages'):
+        thread_state.running_stages = []
+    return thread_state.running_stages
+
+
+
+class stage:
+
+    """
+    Context manager (with stage('name'): ...) or decorator (@stage()) recording a stage of the pipeline.
+    As a decorator, the stage is named after the function, and:
+    - detail: function of the call arguments returning a short description (e.g: a file name)
+    - rows_in: function of the call arguments returning the number of rows read
+    - rows_out: function of the result and the call arguments returning the number of rows produced
+    """
+
+    def __init__(self, name: str = None, detail: callable = None, rows_in: callable = None, rows_out: callable = None):
+        self.name = name
+        self.detail = detail
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+        self.record = {}
+
+
+
+    def __call__(self, function: callable) -> callable:
+
+        name = self.name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not is_enabled:
+                return function(*args, **kwargs)
+            with stage(name) as running_stage:
+                running_stage.record['detail'] = self.detail(*args, **kwargs) if self.detail else None
+                running_stage.record['rows_in'] = self.rows_in(*args, **kwargs) if self.rows_in else None
+                result = function(*args, **kwargs)
+                running_stage.record['rows_out'] = self.rows_out(result, *args, **kwargs) if self.rows_out else None
+            return result
+
+        return wrapper
+
+
+
+    def __enter__(self):
+        if not is_enabled:
+            return self
+
+        running_stages = get_running_stages()
+        self.record = {'stage': self.name, 'depth': len(running_stages), 'detail': None, 'rows_in': None, 'rows_out': None}
+
+        # tracemalloc keeps a single peak: the peak reached so far by the parent stage is saved before resetting it for this stage
+        if is_memory_enabled:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            if running_stages:
+                running_stages[-1].child_peak = max(running_stages[-1].child_peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory, self.child_peak = current, 0
+            self.thread, self.is_overlapping = threading.get_ident(), False
+            with memory_lock:
+                overlapping_stages = [running_stage for running_stage in memory_stages if running_stage.thread != self.thread]
+                for running_stage in overlapping_stages:
+                    running_stage.is_overlapping = True
+                self.is_overlapping = len(overlapping_stages) > 0
+                memory_stages.append(self)
+
+        running_stages.append(self)
+        self.start_wall, self.start_cpu = time.perf_counter(), time.process_time()
+        return self
+
+
+
+    def __exit__(self, *exception):
+        if not is_enabled:
+            return False
+
+        self.record['start_s'] = self.start_wall - start_time
+        self.record['wall_s'] = time.perf_counter() - self.start_wall
+        self.record['cpu_s'] = time.process_time() - self.start_cpu
+        running_stages = get_running_stages()
+        running_stages.pop()
+
+        if is_memory_enabled:
+            with memory_lock:
+                memory_stages.remove(self)
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            self.record['peak_mib'] = None if self.is_overlapping else (peak - self.start_memory) / 2**20
+            if running_stages:
+                running_stages[-1].child_peak = max(running_stages[-1].child_peak, peak)
+
+        records.append(self.record)
+        return False
+
+
+
+def get_origin() -> float:
+    # start_time as an epoch time, comparable across processes (perf_counter is not)
+    return time.time() - (time.perf_counter() - start_time)
+
+
+
+def set_origin(origin: float) -> None:
+    # Start times of this process measured from origin (e.g: get_origin() of the parent process), so that its records sort and nest with the parent's ones
+    global start_time
+    start_time = time.perf_counter() - (time.time() - origin)
+
+
+
+def export_trace(path: str) -> None:
+    with open(path, 'w') as file:
+        json.dump(records, file, indent=4)
+
+
+
+def print_summary() -> None:
+    # Stages are printed by start time, nested stages being indented under their parent
+    for record in sorted(records, key=lambda record: record['start_s']):
+        name = '  ' * record['depth'] + record['stage'] + (f' ({record["detail"]})' if record['detail'] else '')
+        memory = '' if 'peak_mib' not in record else ' | peak      n/a' if record['peak_mib'] is None else f' | peak {record["peak_mib"]:8.1f} MiB'
+        print(f'{name:<50} wall {record["wall_s"]:8.3f} s | cpu {record["cpu_s"]:8.3f} s | rows {record["rows_in"]} -> {record["rows_out"]}{memory}')
+
+
+
+def report_at_exit() -> None:
+    print_summary()
+    if os.environ.get('ETF_PROFILE_TRACE'):
+        export_trace(os.environ['ETF_PROFILE_TRACE'])
+        print(f'Profiling trace saved in {os.environ["ETF_PROFILE_TRACE"]}')
+
+
+
+if is_enabled and multiprocessing.parent_process() is None:
+    atexit.register(report_at_exit)
+
+    if os.environ.get('ETF_PROFILE_CPROFILE'):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(lambda: (profiler.disable(), profiler.dump_stats(os.environ['ETF_PROFILE_CPROFILE']), print(f'cProfile dump saved in {os.environ["ETF_PROFILE_CPROFILE"]}')))
\ No newline at end of file
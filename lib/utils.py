@@ -1,170 +1,153 @@
+import os
+import csv
 import pandas as pd
-import copy
-import matplotlib.pyplot as plt
+import numpy as np
 
 
 def check_file_name(expected_file_name: str, input_file_name: str):
-    if expected_file_name != input_file_name:
+    # Only the name is checked, so that files can be read from another folder (e.g: one folder per account)
+    if expected_file_name != os.path.basename(input_file_name):
         raise ValueError(f'Expected {expected_file_name}. Got {input_file_name}')
 
 
 
-def check_ticker_values(dataframe: pd.DataFrame):
-    unique_ticker_names = list(dataframe['ticker'].unique())
-    uncorrect_ticker_names = [ticker_name for ticker_name in unique_ticker_names if len(ticker_name) != 3]
-    if uncorrect_ticker_names != []:
-        raise ValueError(f'Expected 3 letter-capital-named tickers. Got {uncorrect_ticker_names}') 
-
-
-
-def check_column_type(dataframe: pd.DataFrame, column: str, expected_type: str):
-    input_type = dataframe[column].dtype 
-    if input_type != expected_type:
-        raise TypeError(f'{column} type is {expected_type}. Got {input_type}')
-
-
-
-def check_negative_values(dataframe: pd.DataFrame, column: str):
-    if (dataframe[column]<0).any():
-        raise ValueError(f'Values in {column} should be greater or equal to 0')
-
-    
-
 def is_dataframe_empty(dataframe: pd.DataFrame, function: callable):
     if dataframe.empty:
         raise ValueError(f'Dataframe is empty. Make sure you ran {function.__name__}')
 
 
 
-def evolution(df: pd.DataFrame, start: int, end: int, unit: str, save_path: str = None):
-
-    """
-    start: date. If year: YYYY; if year_month: YYYYMM
-    end: date. If year: YYYY; if year_month: YYYYMM 
-    unit: USD or pct
-    """
+def get_csv_headers(file_name: str) -> list[str]:
+    # First line of a csv file only. Unlike pd.read_csv(nrows=0), no (empty) column is built, which matters with thousands of columns
+    with open(file_name, newline='') as file:
+        return next(csv.reader(file), [])
 
-    # Dates must be 4-or-6 sized and their lengths must be equal (e.g: if start = 2024, end cannot be 202406)
-    start_length = len(str(start))
-    end_length = len(str(end))
-    valid_length = [4,6]
-    if (start_length not in valid_length or end_length not in valid_length) or (start_length != end_length):
-        raise ValueError('start and end parameters must be 4 or 6 characters long and have same length')
-    
-    # The end date cannot be inferior or equal to the start date 
-    if end<start:
-        raise ValueError('end argument must be greater than start')
-    
-    # Performance only available in USD or %
-    if unit != 'USD' and unit != 'pct':
-        raise ValueError('unit parameter must be either "USD" or "pct"')
 
 
-    # Initialize a figure with given size 
-    plt.figure(figsize=(12,6))
+def get_day_numbers(dates: pd.Series) -> np.ndarray:
+    # 'YYYY-MM-DD' strings to number of days since 1970-01-01. Dates repeat a lot (e.g: once per ticker), so only unique values are parsed
+    codes, unique_dates = pd.factorize(dates)
+    unique_days = pd.to_datetime(unique_dates, format='%Y-%m-%d').values.astype('datetime64[D]').astype('int64')
+    return unique_days[codes]
 
 
-    if start_length == 6:
 
-        # Check if input dataframe is correct
-        if 'year_month' not in df.columns or ('portfolio_monthly_performance_USD' not in df.columns and 'portfolio_monthly_performance_pct' not in df.columns):
-            raise ValueError('To get portfolio monthly evolution, dataframe should at least contain "year_month" and "portfolio_monthly_performance_USD"/"portfolio_monthly_performance_pct" attributes')
+def get_ticker_positions(tickers: pd.Series, headers: list[str]) -> np.ndarray:
+    # Ticker names to their position in headers (e.g: px_csv tickers), -1 if unknown. Tickers repeat a lot, so only unique values are looked up
+    codes, unique_tickers = pd.factorize(tickers)
+    unique_positions = pd.Index(headers).get_indexer(unique_tickers).astype('int64')
+    return unique_positions[codes]
 
-        # Even if they have correct lengths, check if start and end dates are valid dates
-        unique_dates = df['year_month'].unique()  
-        if start not in unique_dates or end not in unique_dates:
-            raise ValueError('Invalid dates')
 
-        df_sliced = copy.deepcopy(df[(df['year_month']>=start) & (df['year_month']<=end)])
-        df_sliced['year_month'] = pd.to_datetime(df_sliced['year_month'], format='%Y%m')
 
-        plt.plot(df_sliced['year_month'], df_sliced[f'portfolio_monthly_performance_{unit}'], label={unit})
+def downcast_integers(values: pd.Series) -> pd.Series:
+    # Integer values to int32 when they all fit, unchanged otherwise (e.g: positions summed over a long history)
+    int32 = np.iinfo('int32')
+    if len(values) == 0 or (values.min() >= int32.min and values.max() <= int32.max):
+        return values.astype('int32')
+    return values
 
 
-    elif start_length == 4:
 
-        # Check if input dataframe is correct
-        if 'year' not in df.columns or ('portfolio_yearly_performance_USD' not in df.columns and 'portfolio_yearly_performance_pct' not in df.columns):
-            raise ValueError('To get portfolio yearly evolution, dataframe should at least contain "year" and "portfolio_yearly_performance_USD"/"portfolio_yearly_performance_pct" attributes')
+def get_memory_report(dataframes: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    # Memory used by each column of each dataframe (deep, i.e including the strings held by object columns), with columns: dataframe, column, dtype, bytes
+    rows = []
+    for name, dataframe in dataframes.items():
+        memory = dataframe.memory_usage(deep=True, index=False)
+        rows += [{'dataframe': name, 'column': column, 'dtype': str(dataframe[column].dtype), 'bytes': int(memory[column])} for column in dataframe.columns]
+    return pd.DataFrame(rows, columns=['dataframe', 'column', 'dtype', 'bytes'])
 
-        # Even if they have correct lengths, check if start and end dates are valid dates
-        unique_dates = df['year'].unique()  
-        if start not in unique_dates or end not in unique_dates:
-            raise ValueError('Invalid dates')
 
-        df_sliced = copy.deepcopy(df[(df['year']>=start) & (df['year']<=end)])
-        df_sliced['year'] = pd.to_datetime(df_sliced['year'], format='%Y')
 
-        plt.plot(df_sliced['year'], df_sliced[f'portfolio_yearly_performance_{unit}'], label={unit})
-    
+def validate(dataframe: pd.DataFrame, schema: dict, sample_size: int = None, seed: int = 0) -> pd.DataFrame:
 
-    plt.xlabel('Year')
-    plt.ylabel('Performance')
-    plt.title(f'Portfolio performance from {start} to {end} in {unit}')
-    plt.legend()
-    
-    #plt.show()
-    if save_path != None:
-        plt.savefig(save_path)
-        print(f'Portfolio evolution from {start} to {end} saved in {save_path}')
+    """
+    Evaluates every rule of schema and returns all violations instead of raising on the first one.
+    schema: {column: rules}. '*' applies its rules to every column not named in schema. Named columns are required. Rules:
+    - dtype: expected dtype of the column
+    - min: minimum value (inclusive)
+    - length: expected length of each value
+    - values: list of allowed values
+    sample_size: if given, rules on values are only evaluated on that many random rows (dtype and missing columns are always checked)
+    Returns a dataframe of violations with columns: row (index label, None for a column-level violation), column, rule, value
+    """
 
+    violations = []
 
+    # Step 1 - Missing columns
+    for column in schema:
+        if column != '*' and column not in dataframe.columns:
+            violations.append(pd.DataFrame({'row': [None], 'column': [column], 'rule': ['required'], 'value': [None]}))
 
-def composition(df: pd.DataFrame, date: int, save_path: str = None):
+    # Step 2 - Rows to evaluate
+    rows = dataframe
+    if sample_size is not None and len(dataframe) > sample_size:
+        rows = dataframe.iloc[np.sort(np.random.default_rng(seed).choice(len(dataframe), size=sample_size, replace=False))]
 
-    """
-    start: date. If year: YYYY; if year_month: YYYYMM
-    end: date. If year: YYYY; if year_month: YYYYMM 
-    """
-    
-    date_length = len(str(date))
-
-    if date_length != 4 and date_length != 6:
-        raise ValueError(f'Date must have 4 or 6 characters')    
-    
+    # Step 3 - Columns sharing the same rules are evaluated together, as one 2D block for numeric rules (e.g: all tickers of px_csv at once)
+    blocks = {}
+    for column in dataframe.columns:
+        rules = schema.get(column, schema.get('*', {}))
+        blocks.setdefault(id(rules), (rules, []))[1].append(column)
 
-    # Initialize a figure with given size 
-    plt.figure(figsize=(8, 8))
+    for rules, columns in blocks.values():
 
+        # dtype is checked on the column. Other rules are only evaluated on columns of the expected dtype
+        if 'dtype' in rules:
+            wrong_dtype = [column for column in columns if dataframe[column].dtype != rules['dtype']]
+            if wrong_dtype:
+                violations.append(pd.DataFrame({'row': None, 'column': wrong_dtype, 'rule': 'dtype', 'value': [str(dataframe[column].dtype) for column in wrong_dtype]}))
+            columns = [column for column in columns if column not in wrong_dtype]
 
-    if date_length == 6:
+        if not columns or len(rows) == 0:
+            continue
 
-        # Check if input dataframe is correct
-        if 'year_month' not in df.columns or 'ticker' not in df.columns or 'ticker_monthly_value' not in df.columns:
-            raise ValueError('To get portfolio monthly composition, dataframe should at least contain "year_month", "ticker" and "ticker_monthly_value"')  
+        masks = []
+        if 'min' in rules:
+            masks.append(('min', rows[columns].to_numpy() < rules['min']))
+        if 'length' in rules:
+            masks.append(('length', np.column_stack([map_unique_values(rows[column], lambda values: values.str.len() != rules['length']) for column in columns])))
+        if 'values' in rules:
+            masks.append(('values', np.column_stack([map_unique_values(rows[column], lambda values: ~values.isin(rules['values'])) for column in columns])))
 
-        # Even if it has correct length, check if date is a valid date
-        unique_dates = df['year_month'].unique()  
-        if date not in unique_dates:
-            raise ValueError('Invalid dates')
+        for rule, mask in masks:
+            if mask.any():
+                row_positions, column_positions = np.nonzero(mask)
+                violations.append(pd.DataFrame({
+                    'row': rows.index[row_positions],
+                    'column': np.asarray(columns, dtype=object)[column_positions],
+                    'rule': rule,
+                    'value': rows[columns].to_numpy()[row_positions, column_positions]
+                }))
 
-        df_sliced = copy.deepcopy(df[df['year_month']==date])
-        df_sliced['year_month'] = pd.to_datetime(df_sliced['year_month'], format='%Y%m')
+    if not violations:
+        return pd.DataFrame(columns=['row', 'column', 'rule', 'value'])
+    return pd.concat(violations, ignore_index=True)
 
-        plt.pie(df_sliced['ticker_monthly_value'], labels=df_sliced['ticker'], autopct='%1.1f%%', startangle=140)
 
 
-    elif date_length == 4:
+def map_unique_values(column: pd.Series, is_violation: callable) -> np.ndarray:
+    # Tickers or orders repeat a lot: the rule is evaluated on unique values only. Rows are only scanned again to locate violations, if any
+    unique_values = pd.Series(column.unique())
+    wrong_values = unique_values[np.asarray(is_violation(unique_values), dtype=bool)]
+    if wrong_values.empty:
+        return np.zeros(len(column), dtype=bool)
+    return column.isin(wrong_values).to_numpy()
 
-        # Check if input dataframe is correct
-        if 'year' not in df.columns or 'ticker' not in df.columns or 'ticker_yearly_value' not in df.columns:
-            raise ValueError('To get portfolio yearly composition, dataframe should at least contain "year", "ticker" and "ticker_yearly_value"')  
 
-        # Even if it has correct length, check if date is a valid date
-        unique_dates = df['year'].unique()  
-        if date not in unique_dates:
-            raise ValueError('Invalid dates')
 
-        df_sliced = copy.deepcopy(df[(df['year']==date)])
-        df_sliced['year'] = pd.to_datetime(df_sliced['year'], format='%Y')
+def check_schema(dataframe: pd.DataFrame, schema: dict, mode: str = 'full', sample_size: int = None):
 
-        plt.pie(df_sliced['ticker_yearly_value'], labels=df_sliced['ticker'], autopct='%1.1f%%', startangle=140)
-        
+    """
+    Raises a ValueError listing the violations of schema (see validate).
+    mode: 'full', 'sample' (on sample_size random rows) or 'skip'
+    """
 
-    plt.title(f'Portfolio composition in {date}')
-    plt.legend()
-    #plt.show()
+    if mode not in ['full', 'sample', 'skip']:
+        raise ValueError(f'mode parameter must be either "full", "sample" or "skip". Got {mode}')
+    if mode == 'skip':
+        return
 
-    if save_path != None:
-        plt.savefig(save_path)
-        print(f'Portfolio composition in {date} saved in {save_path}')
\ No newline at end of file
+    violations = validate(dataframe, schema, sample_size if mode == 'sample' else None)
+    if not violations.empty:
+        raise ValueError(f'{len(violations)} violations of the expected schema. First ones:\n{violations.head(20).to_string(index=False)}')
\ No newline at end of file
@@ -1,133 +1,157 @@
 import os
-import pandas as pd
-from config.constants import tx_csv, px_csv, start_year, start_year_month, end_year, end_year_month
-from src.Transaction import Transaction
-from src.Price import Price
-from src.Portfolio import Portfolio
-from lib.utils import evolution, composition
+import argparse
+from config.constants import tx_csv, px_csv, compact_dtypes, grouping_configs, ticker_currencies, start_year, start_year_month, end_year, end_year_month
 
 
 
+# Command line entry point: python main.py [command] [options] (python main.py --help for the options)
+# - value: valued positions, saved as output/positions
+# - aggregate: monthly and yearly performances, saved as output/monthly and output/yearly
+# - chart: charts of the performances, saved as png images in output
+# - all (default): aggregate and chart
+# Modules are imported by the functions using them: pandas, NumPy and the pipeline classes when a command runs, matplotlib only when charts are rendered (see lib/charts.py)
 
-# Instantiate classes
-transaction = Transaction(tx_csv)
-price = Price(px_csv)
-print('Transaction and Price classes instantiated')
-
-
-
-
-# Reconstruct positions and unpivot px_etf to be able to value positions
-transaction.reconstruct_positions()
-price.unpivot()
-print('Positions reconstructed')
+# Every stage is memoized on the content of its inputs (see lib.cache.memoize). A re-run with unchanged csv files directly loads the performances:
+# get_performances only builds the portfolio on a miss. On a miss, transactions and prices are always loaded (Portfolio is built on them),
+# then each of reconstruct_positions, unpivot and value_positions is either loaded or recomputed: a change in one file only recomputes the stages depending on it
 
 
 
+def get_source_keys() -> dict:
+    # Content keys of tx_csv, px_csv and of the optional corporate actions and FX rates (see src/Adjustment.py). Keys are unchanged when neither ca_csv nor fx_csv exists
+    from src.Adjustment import Adjustment
+    from lib.cache import get_file_key
+    adjustment_files = Adjustment.get_files()
+    return {
+        'tx': get_file_key(tx_csv),
+        'px': get_file_key(px_csv),
+        'adjustment_files': adjustment_files,
+        'adjustment': [[file_name, get_file_key(file_name), ticker_currencies] for file_name in adjustment_files.values() if file_name is not None]
+    }
 
-# Value positions 
-portfolio = Portfolio(transaction, price)
-portfolio.value_positions()
-print('Positions evaluated')
 
 
+def get_transaction(keys: dict):
+    # Instantiate class and reconstruct positions
+    from src.Transaction import Transaction
+    from lib.cache import memoize, get_key
+    transaction = Transaction(tx_csv)
+    transaction.dataframe = memoize('reconstruct_positions', get_key(keys['tx'], compact_dtypes), lambda: transaction.reconstruct_positions().dataframe)
+    print('Positions reconstructed')
+    return transaction
 
 
-# Convert 'date' column from 'portfolio' into datetime to extract year and month
-portfolio.dataframe['date'] = pd.to_datetime(portfolio.dataframe['date'], format='%Y-%m-%d')
-portfolio.dataframe['year'] = portfolio.dataframe['date'].dt.year
-portfolio.dataframe['month'] = portfolio.dataframe['date'].dt.month
 
+def get_price(keys: dict):
+    # Instantiate class and unpivot px_etf to be able to value positions
+    from src.Price import Price
+    from lib.cache import memoize, get_key
+    price = Price(px_csv)
+    price.unpivot_dataframe = memoize('unpivot', get_key(keys['px'], compact_dtypes), lambda: price.unpivot().unpivot_dataframe)
+    print('Prices unpivoted')
+    return price
 
 
 
-grouping_configs = [
-    {
-        'columns': ['year', 'ticker'],
-        'agg': {'value': 'sum', 'price': ['mean', 'std']},
-        'suffix': 'yearly'
-    },
-    {
-        'columns': ['year', 'month', 'ticker'],
-        'agg': {'value': 'sum', 'price': ['mean', 'std']},
-        'suffix': 'monthly'
-    },
-    {
-        'columns': ['year'],
-        'agg': {'value': 'sum'},
-        'suffix': 'yearly'
-    },
-    {
-        'columns': ['year', 'month'],
-        'agg': {'value': 'sum'},
-        'suffix': 'monthly'
-    }
-]
+def get_portfolio(keys: dict):
+    # Value positions
+    # Transactions (parsed then reconstructed) and prices (parsed then unpivoted) are loaded concurrently (see lib/loader.py), before the value_positions memo is checked
+    from src.Portfolio import Portfolio
+    from src.Adjustment import Adjustment
+    from lib.loader import Loader
+    from lib.cache import memoize, get_key
+    with Loader() as loader:
+        loader.submit('transactions', get_transaction, keys)
+        loader.submit('prices', get_price, keys)
+    portfolio = Portfolio(loader.result('transactions'), loader.result('prices'))
+    adjustment = Adjustment.from_files(portfolio.get_all_dates(), portfolio.tickers, **keys['adjustment_files']) if keys['adjustment'] else None
+    portfolio.dataframe = memoize('value_positions', get_key(keys['tx'], keys['px'], compact_dtypes, *keys['adjustment']), lambda: portfolio.value_positions(adjustment=adjustment).dataframe)
+    print('Positions evaluated')
+    return portfolio
 
 
-# Process each configuration and store the results depending on the suffix (i.e: monthly, yearly)
-yearly_results = []
-monthly_results = []
-for config in grouping_configs:
-    columns = config['columns']
-    agg = config['agg']
-    suffix = config['suffix']
-    result = portfolio.calculate_performance(columns, agg, suffix)
-    if suffix == 'yearly':
-        yearly_results.append(result)
-    elif suffix == 'monthly':
-        result['year_month'] = result['year'] * 100 + result['month']
-        monthly_results.append(result)
-print('Yearly and monthly performance calculated')
 
+def get_performances(keys: dict) -> dict:
+    # Process all configurations at once and merge the results depending on the suffix (i.e: monthly, yearly)
+    from lib.cache import memoize, get_key, print_result_cache_report
+    performances = memoize('calculate_performances', get_key(keys['tx'], keys['px'], grouping_configs, *keys['adjustment']), lambda: get_portfolio(keys).calculate_performances(grouping_configs))
+    print('Yearly and monthly performance calculated')
+    print_result_cache_report()
+    return performances
 
 
 
-# Merge all monthly results
-if monthly_results:
-    monthly_performance = monthly_results[0]
-    for df in monthly_results[1:]:
-        monthly_performance = pd.merge(monthly_performance, df, how='left', on=['year', 'month', 'year_month'])
+def get_output_folder() -> str:
+    # Create 'output' folder to store performances and charts if it does not exist
+    current_directory = os.getcwd()
+    if 'output' not in os.listdir():
+        os.mkdir(os.path.join(current_directory, 'output'))
+        print(f'Folder named "output" created in current directory: {current_directory}')
+    return os.path.join(current_directory, 'output')
 
 
 
+def render(performances: dict, output_folder: str, arguments: argparse.Namespace) -> None:
 
-# Merge all yearly results
-if yearly_results:
-    yearly_performance = yearly_results[0]
-    for df in yearly_results[1:]:
-        yearly_performance = pd.merge(yearly_performance, df, how='left', on=['year'])
+    # Charts rendered in parallel, saved in 'output' folder as png images:
+    # - Portfolio monthly evolution in USD and pct (%) (for the given dates: start_year_month - end_year_month)
+    # - Portfolio yearly evolution in USD and pct (%) (for the given dates: start_year - end_year)
+    # - Portfolio monthly and yearly composition (for the given dates: start_year and start_year_month)
 
+    from lib.charts import render_charts
 
+    monthly_performance, yearly_performance = performances['monthly'], performances['yearly']
+    start_month, end_month, start, end = arguments.start_year_month, arguments.end_year_month, arguments.start_year, arguments.end_year
+    chart_specs = [
+        {'function': 'evolution', 'df': monthly_performance, 'start': start_month, 'end': end_month, 'unit': 'USD', 'save_path': os.path.join(output_folder, f'evolution_{start_month}_{end_month}_USD.png')},
+        {'function': 'evolution', 'df': monthly_performance, 'start': start_month, 'end': end_month, 'unit': 'pct', 'save_path': os.path.join(output_folder, f'evolution_{start_month}_{end_month}_pct.png')},
+        {'function': 'evolution', 'df': yearly_performance, 'start': start, 'end': end, 'unit': 'USD', 'save_path': os.path.join(output_folder, f'evolution_{start}_{end}_USD.png')},
+        {'function': 'evolution', 'df': yearly_performance, 'start': start, 'end': end, 'unit': 'pct', 'save_path': os.path.join(output_folder, f'evolution_{start}_{end}_pct.png')},
+        {'function': 'composition', 'df': monthly_performance, 'date': start_month, 'save_path': os.path.join(output_folder, f'composition_{start_month}.png')},
+        {'function': 'composition', 'df': yearly_performance, 'date': start, 'save_path': os.path.join(output_folder, f'composition_{start}.png')}
+    ]
+    for rendered in render_charts(chart_specs):
+        print(f'{rendered["function"]} rendered in {rendered["seconds"]:.2f} s')
 
 
 
-# Create 'output' folder to store csv files if it does not exist
-current_directory = os.getcwd()
-if 'output' not in os.listdir():
-    os.mkdir(os.path.join(current_directory, 'output'))
-    print(f'Folder named "output" created in current directory: {current_directory}')
+def run(arguments: argparse.Namespace) -> None:
 
+    from lib.output import OutputWriter
 
+    keys = get_source_keys()
+    output_folder = get_output_folder()
 
-# Convert dataframes into csv and save them in the 'output' folder
-monthly_performance.to_csv(os.path.join(current_directory, 'output', 'monthly.csv'))
-print(f'Monthly performance saved as csv in: {os.path.join(current_directory, "output", "monthly.csv")}')
+    # Save dataframes in the 'output' folder, in every format of output_formats (see lib/output.py)
+    # Files are written in a background thread while charts are rendered
+    writer = OutputWriter()
+    if arguments.command == 'value':
+        writer.submit(get_portfolio(keys).dataframe, os.path.join(output_folder, 'positions'))
+    else:
+        performances = get_performances(keys)
+        if arguments.command in ['aggregate', 'all']:
+            writer.submit(performances['monthly'], os.path.join(output_folder, 'monthly'))
+            writer.submit(performances['yearly'], os.path.join(output_folder, 'yearly'))
+        if arguments.command in ['chart', 'all']:
+            render(performances, output_folder, arguments)
 
-yearly_performance.to_csv(os.path.join(current_directory, 'output', 'yearly.csv'))
-print(f'Yearly performance saved as csv in: {os.path.join(current_directory, "output", "yearly.csv")}')
+    # Wait for the outputs to be written
+    for path in writer.close():
+        print(f'Performance saved in: {path}')
 
 
 
+def get_parser() -> argparse.ArgumentParser:
+    # Date ranges of the charts default to the ones of config/constants.py
+    parser = argparse.ArgumentParser(description='Value positions of tx_etf.csv against px_etf.csv, aggregate monthly and yearly performances and chart them')
+    parser.add_argument('command', nargs='?', default='all', choices=['value', 'aggregate', 'chart', 'all'], help='value: valued positions | aggregate: monthly and yearly performances | chart: charts | all (default): aggregate and chart')
+    parser.add_argument('--start-year-month', type=int, default=start_year_month, help=f'first month of the monthly charts, YYYYMM (default: {start_year_month})')
+    parser.add_argument('--end-year-month', type=int, default=end_year_month, help=f'last month of the monthly evolution charts, YYYYMM (default: {end_year_month})')
+    parser.add_argument('--start-year', type=int, default=start_year, help=f'first year of the yearly charts, YYYY (default: {start_year})')
+    parser.add_argument('--end-year', type=int, default=end_year, help=f'last year of the yearly evolution charts, YYYY (default: {end_year})')
+    return parser
 
-# Chart of Portfolio monthly evolution in USD and pct (%) (for the given dates: start_year_month - end_year_month), saved in 'output' folder as a png image
-evolution(df=monthly_performance, start=start_year_month, end=end_year_month, unit='USD', save_path=os.path.join(current_directory, 'output', f'evolution_{start_year_month}_{end_year_month}_USD.png'))
-evolution(df=monthly_performance, start=start_year_month, end=end_year_month, unit='pct', save_path=os.path.join(current_directory, 'output', f'evolution_{start_year_month}_{end_year_month}_pct.png'))
 
-# Chart of Portfolio yearly evolution in USD and pct (%) (for the given dates: start_year - end_year), saved in 'output' folder as a png image
-evolution(df=yearly_performance, start=start_year, end=end_year, unit='USD', save_path=os.path.join(current_directory, 'output', f'evolution_{start_year}_{end_year}_USD.png'))
-evolution(df=yearly_performance, start=start_year, end=end_year, unit='pct', save_path=os.path.join(current_directory, 'output', f'evolution_{start_year}_{end_year}_pct.png'))
 
-# Chart of Portfolio monthly and yearly composition (for the given dates: start_year and start_year_month), saved in 'output' folder as a png image
-composition(df=monthly_performance, date=start_year_month, save_path=os.path.join(current_directory, 'output', f'composition_{start_year_month}.png'))
-composition(df=yearly_performance, date=start_year, save_path=os.path.join(current_directory, 'output', f'composition_{start_year}.png'))
\ No newline at end of file
+if __name__ == '__main__':
+    run(get_parser().parse_args())
\ No newline at end of file
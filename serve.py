@@ -0,0 +1,83 @@
+import json
+import argparse
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.QueryService import QueryService
+from main import get_source_keys, get_performances
+
+
+
+# Local http service answering performance queries from memory (see QueryService). Performances are computed once at start-up (or loaded from the result cache of main.py)
+# Bound to 127.0.0.1 by default: no external service is involved. Routes (GET, json unless stated otherwise):
+# - /composition?date=200501 (or 2005): value and weight of each ticker
+# - /evolution?start=200501&end=202312 (or 2005 and 2023): portfolio value and performance of each period
+# - /ticker?ticker=SPY&suffix=yearly (or monthly): value and price statistics of a ticker
+# - /chart/evolution?start=2005&end=2023&unit=pct or /chart/composition?date=2005: png
+# Usage: python serve.py [--host 127.0.0.1] [--port 8000]
+
+
+
+def load_service() -> QueryService:
+    # Same keys and memoized stages as main.py: a run of main.py on the same csv files makes start-up immediate
+    return QueryService(get_performances(get_source_keys()))
+
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+
+    service = None
+
+
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            if url.path == '/composition':
+                self.send_json(self.service.get_composition(int(params['date'])))
+            elif url.path == '/evolution':
+                self.send_json(self.service.get_evolution(int(params['start']), int(params['end'])))
+            elif url.path == '/ticker':
+                self.send_json(self.service.get_ticker_statistics(params['ticker'], params.get('suffix', 'yearly')))
+            elif url.path.startswith('/chart/'):
+                # Only the parameters of the chart function are passed (e.g: a 'function' or unknown parameter is ignored)
+                function = url.path[len('/chart/'):]
+                chart_params = {name: params[name] for name in QueryService.chart_parameters.get(function, []) if name in params}
+                with open(self.service.get_chart(function, **chart_params), 'rb') as chart:
+                    self.send_body(200, 'image/png', chart.read())
+            else:
+                self.send_body(404, 'application/json', json.dumps({'error': f'Unknown route: {url.path}'}).encode())
+        except (KeyError, ValueError) as error:
+            # Missing or invalid parameters
+            self.send_body(400, 'application/json', json.dumps({'error': str(error)}).encode())
+
+
+
+    def send_json(self, dataframe):
+        self.send_body(200, 'application/json', dataframe.to_json(orient='records').encode())
+
+
+
+    def send_body(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Serve performance queries on tx_etf.csv and px_etf.csv over local http')
+    parser.add_argument('--host', default='127.0.0.1', help='address to bind (default: localhost only)')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    QueryHandler.service = load_service()
+    server = ThreadingHTTPServer((args.host, args.port), QueryHandler)
+    print(f'Serving on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
\ No newline at end of file
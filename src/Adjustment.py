@@ -0,0 +1,108 @@
+import os
+import numpy as np
+import pandas as pd
+from config.constants import ca_csv, fx_csv, ca_schema, fx_schema, ticker_currencies
+from lib.utils import get_day_numbers, get_ticker_positions, check_schema
+
+
+
+class Adjustment:
+
+
+
+    def __init__(self, dates: list, tickers: list[str]):
+
+        # Corporate-action and FX factors of every (date, ticker) cell of a price matrix (e.g: Portfolio.get_all_dates() x price.tickers)
+        # - share_factors: cumulative product of the corporate-action factors of a ticker up to a date (i.e shares held on that date per share held before any event)
+        # - fx_rates: USD per unit of the ticker's currency, latest known rate on or before a date (1 for USD tickers)
+        # Both arrays are precomputed: adjusting quantities or prices is one multiplication (see Portfolio.mark_to_market and Portfolio.adjust_positions)
+        # A new corporate action only multiplies its ticker's column from its date onwards (see add_corporate_action)
+
+        self.dates = list(dates)
+        self.days = get_day_numbers(pd.Series(self.dates))
+        if np.any(np.diff(self.days) <= 0):
+            raise ValueError('Adjustment dates must be sorted by ascending order, without duplicates')
+        self.tickers = list(tickers)
+        self.share_factors = np.ones((len(self.dates), len(self.tickers)))
+        self.fx_rates = np.ones((len(self.dates), len(self.tickers)))
+
+
+
+    @classmethod
+    def from_files(cls, dates: list, tickers: list[str], ca_file: str = None, fx_file: str = None, currencies: dict = ticker_currencies):
+
+        """
+        ca_file: csv of corporate actions with columns date, ticker, factor (shares held after the event per share held before, e.g: 2 for a 2-for-1 split)
+        fx_file: csv of FX rates with a Date column and one column per currency, in USD per unit of currency
+        currencies: currency of each non-USD ticker (e.g: {'EWG': 'EUR'})
+        """
+
+        adjustment = cls(dates, tickers)
+
+        if ca_file is not None:
+            corporate_actions = pd.read_csv(ca_file, dtype={'factor': 'float64'})
+            check_schema(corporate_actions, ca_schema)
+            adjustment.add_corporate_actions(corporate_actions)
+
+        if fx_file is not None:
+            fx = pd.read_csv(fx_file)
+            fx = fx.astype({column: 'float64' for column in fx.columns if column != 'Date'})
+            check_schema(fx, fx_schema)
+            adjustment.set_fx_rates(fx, currencies)
+
+        return adjustment
+
+
+
+    @staticmethod
+    def get_files() -> dict:
+        # Keyword arguments of from_files for the optional ca_csv and fx_csv, None when the file does not exist
+        return {'ca_file': ca_csv if os.path.exists(ca_csv) else None, 'fx_file': fx_csv if os.path.exists(fx_csv) else None}
+
+
+
+    def get_rows(self, dates: pd.Series) -> np.ndarray:
+        # Row of the latest adjustment date on or before each date (-1 if before the first one)
+        return np.searchsorted(self.days, get_day_numbers(dates), side='right') - 1
+
+
+
+    def add_corporate_actions(self, corporate_actions: pd.DataFrame):
+
+        # All events at once: the factor of each event is placed at its (first date on or after the event, ticker) cell, then factors are multiplied down each column
+        # Events on unknown tickers or after the last date are ignored
+
+        rows = np.searchsorted(self.days, get_day_numbers(corporate_actions['date']), side='left')
+        columns = get_ticker_positions(corporate_actions['ticker'], self.tickers)
+        is_known = (columns >= 0) & (rows < len(self.dates))
+
+        events = np.ones(self.share_factors.shape)
+        np.multiply.at(events, (rows[is_known], columns[is_known]), corporate_actions['factor'].to_numpy()[is_known])
+        self.share_factors *= np.cumprod(events, axis=0)
+
+
+
+    def add_corporate_action(self, date: str, ticker: str, factor: float):
+        # One new event: only the ticker's column, from the first date on or after the event, is updated
+        row = np.searchsorted(self.days, get_day_numbers(pd.Series([date]))[0], side='left')
+        if ticker not in self.tickers:
+            raise ValueError(f'Unknown ticker: {ticker}')
+        self.share_factors[row:, self.tickers.index(ticker)] *= factor
+
+
+
+    def set_fx_rates(self, fx: pd.DataFrame, currencies: dict):
+
+        # Rates are forward filled, then aligned on dates by a binary search (latest rate on or before each date). Dates before the first rate get NaN (unknown value)
+
+        unknown_currencies = {currency for ticker, currency in currencies.items() if ticker in self.tickers and currency != 'USD' and currency not in fx.columns}
+        if unknown_currencies:
+            raise ValueError(f'Missing FX rates for {sorted(unknown_currencies)}')
+
+        fx = fx.sort_values(by='Date', kind='stable')
+        rows = np.searchsorted(get_day_numbers(fx['Date']), self.days, side='right') - 1
+        for column, ticker in enumerate(self.tickers):
+            currency = currencies.get(ticker, 'USD')
+            if currency != 'USD':
+                rates = fx[currency].ffill().to_numpy()
+                self.fx_rates[:, column] = np.where(rows >= 0, rates[np.maximum(rows, 0)], np.nan)
\ No newline at end of file
@@ -1,20 +1,61 @@
 from abc import ABC
 import pandas as pd
+from config.constants import validation_mode, validation_sample_size, compact_dtypes
+from lib.cache import read_csv_cached, is_cache_validated, mark_cache_validated, get_key
+from lib.utils import check_schema, downcast_integers
+from lib.profiling import stage
 
 
 
 class File(ABC):
 
+    # Rules checked by a subclass (e.g: tx_schema). A cache is trusted only if it was validated against the same rules
+    schemas = ()
 
 
-    def __init__(self, file_name: str):
+
+    @stage(detail=lambda self, file_name, *args, **kwargs: file_name, rows_out=lambda result, self, *args, **kwargs: self.rows)
+    def __init__(self, file_name: str, use_cache: bool = True, validation: str = validation_mode, compact: bool = compact_dtypes, usecols: list[str] = None):
         
         self.file_name = file_name
-        self.dataframe = pd.read_csv(self.file_name)
+        self.use_cache = use_cache
+        self.compact = compact
+
+        # A partial load (i.e some columns or rows only, set by subclasses) is never marked as validated: its checks do not cover the whole file
+        self.is_partial = usecols is not None
+
+        # With use_cache, the csv is only parsed when it changed since last run (see lib/cache.py)
+        # A cache which already passed a full validation of the same schemas is trusted: with validation 'auto', its checks are skipped
+        self.schema_key = get_key(*self.schemas)
+        self.is_trusted = use_cache and is_cache_validated(self.file_name, self.schema_key)
+        self.validation = validation if validation != 'auto' else ('skip' if self.is_trusted else 'full')
+
+        self.dataframe = read_csv_cached(self.file_name, usecols=usecols) if use_cache else pd.read_csv(self.file_name, usecols=usecols)
         self.headers = list(self.dataframe.columns)
         self.rows, self.columns = self.dataframe.shape
 
 
 
     def check_headers(self):
-        pass
\ No newline at end of file
+        pass
+
+
+
+    def check_schema(self, schema: dict):
+        # Evaluates all rules of schema at once (see lib.utils.validate). Once a full validation passed, the cache is marked as trusted
+        check_schema(self.dataframe, schema, self.validation, validation_sample_size)
+        if self.use_cache and self.validation == 'full' and not self.is_partial:
+            mark_cache_validated(self.file_name, self.schema_key)
+
+
+
+    def compact_columns(self, dates: tuple[str, ...] = (), categories: tuple[str, ...] = (), integers: tuple[str, ...] = ()):
+        # Called by subclasses once checks passed (rules are declared on the csv dtypes), when compact is set
+        # Dates are parsed once per unique value (ISO strings and datetime64 sort the same way), categories store each distinct value once
+        for column in dates:
+            codes, unique_dates = pd.factorize(self.dataframe[column])
+            self.dataframe[column] = pd.to_datetime(unique_dates, format='%Y-%m-%d').values[codes]
+        for column in categories:
+            self.dataframe[column] = self.dataframe[column].astype('category')
+        for column in integers:
+            self.dataframe[column] = downcast_integers(self.dataframe[column])
\ No newline at end of file
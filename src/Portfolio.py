@@ -1,8 +1,18 @@
+import os
+import json
+import pickle
 import pandas as pd
+import numpy as np
 import copy
+from collections.abc import Iterator, Iterable
 from src.Transaction import Transaction
 from src.Price import Price
-from lib.utils import is_dataframe_empty
+from src.Adjustment import Adjustment
+from lib.utils import is_dataframe_empty, get_day_numbers, get_ticker_positions, downcast_integers
+from lib.cache import get_file_keys
+from lib.profiling import stage
+from lib import kernels
+from config.constants import use_kernels
 
 
 
@@ -12,16 +22,45 @@ class Portfolio:
 
     def __init__(self, transaction: Transaction, price: Price):
 
+        # Dates of both files must share the same type (see File.compact_columns), so that they can be merged and sorted together
+        # N.B: TransactionStream and PriceIndex have no compact attribute. They are only used by the as-of valuation, which works on day numbers whatever the dtype of dates
+        if hasattr(transaction, 'compact') and hasattr(price, 'compact') and transaction.compact != price.compact:
+            raise ValueError('Transaction and Price must be loaded with the same compact parameter')
+
         self.transaction = transaction
         self.price = price
+        self.compact = getattr(transaction, 'compact', False)
         self.transaction_dates = transaction.dates
         self.price_dates = price.dates
         self.tickers = price.tickers
         self.dataframe = pd.DataFrame
 
+        # Dense dates x tickers arrays, filled by mark_to_market, with the adjustment they were built with
+        self.matrix_dates = np.empty(0, dtype=object)
+        self.position_matrix = np.empty((0, 0))
+        self.price_matrix = np.empty((0, 0))
+        self.exposure_matrix = np.empty((0, 0))
+        self.weight_matrix = np.empty((0, 0))
+        self.nav = np.empty(0)
+        self.matrix_adjustment = None
+
+
 
+    @stage(detail=lambda self, engine='cartesian', *args, **kwargs: engine, rows_in=lambda self, *args, **kwargs: len(self.transaction.dataframe), rows_out=lambda result, self, *args, **kwargs: len(self.dataframe))
+    def value_positions(self, engine: str = 'cartesian', kernel: bool = use_kernels, adjustment: Adjustment = None) -> None:
 
-    def value_positions(self) -> None:
+        """
+        engine: 'cartesian' or 'asof'
+        - cartesian: builds every (date, ticker) combination, forward fills prices and keeps rows with a transaction
+        - asof: looks up, for each transaction only, the latest recorded price before that date (see value_positions_asof). Same 'value' column, memory grows with transactions instead of dates x tickers
+        kernel: cartesian only, forward fills prices in one pass over integer ticker codes instead of a groupby (see lib/kernels.py)
+        adjustment: corporate actions and FX rates built on get_all_dates() and px_csv tickers (see src/Adjustment.py and adjust_positions). None: raw quantities and prices
+        """
+
+        if engine == 'asof':
+            return self.value_positions_asof(adjustment)
+        elif engine != 'cartesian':
+            raise ValueError(f'engine parameter must be either "cartesian" or "asof". Got {engine}')
 
         # A quick analysis shows that transactions and prices don't share all dates
         # For example, there might be dates for which transactions have been recorded but not prices. Therefore, we need to tackle that issue before computing the value
@@ -44,27 +83,407 @@ class Portfolio:
         # Step 4 - Create a dataframe of all possible combinations of dates and tickers
         self.dataframe = pd.MultiIndex.from_product([all_dates, self.tickers], names=['date', 'ticker']).to_frame(index=False)
 
+        # In compact mode, tickers stay categorical through the merges as long as both sides share the same categories (px_csv tickers, unknown tickers being dropped by the merge anyway)
+        transactions = self.transaction.dataframe
+        if self.compact:
+            self.dataframe['ticker'] = pd.Categorical(self.dataframe['ticker'], categories=self.tickers)
+            transactions = transactions.assign(ticker=transactions['ticker'].cat.set_categories(self.tickers))
+
         # Step 5 - Merge transaction.dataframe on dataframe using 'date' and 'ticker' attributes
-        self.dataframe = pd.merge(self.dataframe, self.transaction.dataframe, how='left', on=['date', 'ticker'])
+        self.dataframe = pd.merge(self.dataframe, transactions, how='left', on=['date', 'ticker'])
 
         # Step 6 - Merge price.unpivot_dataframe on dataframe using 'date' and 'ticker'
         self.price.unpivot_dataframe.rename(columns={'Date':'date'}, inplace=True)
         self.dataframe = pd.merge(self.dataframe, self.price.unpivot_dataframe, how='left', on=['date','ticker'])
 
         # Step 7 - ffill, meaning 'forward fill', to fill price null values with the latest recorded price before that date
-        self.dataframe = self.dataframe.sort_values(by='date')
-        self.dataframe['price'] = self.dataframe.groupby('ticker')['price'].ffill()
+        # A stable sort keeps the tickers order within a date, so that a full recompute and append_positions give rows in the same order
+        self.dataframe = self.dataframe.sort_values(by='date', kind='stable')
+        if kernel:
+            self.dataframe['price'] = kernels.forward_fill(kernels.get_codes(self.dataframe['ticker']), self.dataframe['price'].to_numpy())
+        else:
+            self.dataframe['price'] = self.dataframe.groupby('ticker', observed=True)['price'].ffill()
 
         # Step 8 - We keep only rows for which we have a transaction
         self.dataframe = self.dataframe[ self.dataframe['order'].isna() == False ]
 
+        # The merge cast quantities to float (null values on dates without transaction). Once those rows are dropped, they are integers again
+        if self.compact:
+            for column in ['qty', 'relative_qty', 'position']:
+                self.dataframe[column] = downcast_integers(self.dataframe[column].astype('int64'))
+
         # Step 9 - Value positions 
+        if adjustment is not None:
+            self.dataframe = self.adjust_positions(self.dataframe, adjustment)
         self.dataframe['value'] = self.dataframe['position'] * self.dataframe['price']
 
         return self
 
 
 
+    @stage(rows_in=lambda self, *args, **kwargs: len(self.transaction.dataframe), rows_out=lambda result, self, *args, **kwargs: len(self.dataframe))
+    def value_positions_asof(self, adjustment: Adjustment = None) -> None:
+
+        # Same valuation as value_positions, without materializing all (date, ticker) combinations
+        # For each ticker, prices are sorted by date so that the latest recorded price before a transaction date is found by a binary search (np.searchsorted)
+        # The binary search is done once for all tickers on a composite key: ticker code in the high bits, day number in the low bits
+
+        # N.B: Rows come out in the same order as value_positions (by date, then by ticker). Unlike value_positions, 'qty', 'relative_qty' and 'position' keep their integer type
+        # Prices are indexed from the wide px_csv layout, so Price.unpivot is not needed
+
+        self.dataframe = self.value_transactions_asof(self.transaction.dataframe, self.get_price_index())
+        if adjustment is not None:
+            self.dataframe = self.adjust_positions(self.dataframe, adjustment)
+            self.dataframe['value'] = self.dataframe['position'] * self.dataframe['price']
+
+        return self
+
+
+
+    def get_all_dates(self) -> list:
+        # Dates from tx_csv and px_csv, without duplicates, sorted by ascending order (i.e rows of the dense matrices, see mark_to_market)
+        return sorted(set(self.transaction_dates + self.price_dates))
+
+
+
+    def check_adjustment(self, adjustment: Adjustment) -> None:
+        # Factors are looked up by row and column: the adjustment must be built on the same dates and tickers
+        if list(adjustment.tickers) != list(self.tickers) or not np.array_equal(adjustment.days, get_day_numbers(pd.Series(self.get_all_dates()))):
+            raise ValueError('Adjustment must be built on Portfolio.get_all_dates() and px_csv tickers')
+
+
+
+    def adjust_positions(self, valued: pd.DataFrame, adjustment: Adjustment) -> pd.DataFrame:
+
+        # Corporate actions change the number of shares held without a transaction (e.g: a 2-for-1 split doubles them), so positions are recomputed from the trades:
+        # each trade is converted to base shares (i.e shares before any corporate action) by dividing it by its cumulative share factor,
+        # base shares are summed per ticker, then converted back to shares held on the transaction date. Prices are converted to USD by the FX rate of that date
+        # Rows must be ordered by date (as value_positions returns them)
+
+        self.check_adjustment(adjustment)
+        valued = valued.copy()
+
+        # Step 1 - Factors of each (transaction date, ticker) cell
+        rows = adjustment.get_rows(valued['date'])
+        columns = self.get_ticker_codes(valued['ticker'])
+        share_factors = adjustment.share_factors[rows, columns]
+        fx_rates = adjustment.fx_rates[rows, columns]
+
+        # Step 2 - Positions in shares held on the transaction date
+        base_qty = pd.Series(valued['relative_qty'].to_numpy(dtype='float64') / share_factors, index=valued.index)
+        valued['position'] = base_qty.groupby(valued['ticker'], observed=True).cumsum().to_numpy() * share_factors
+
+        # Step 3 - Prices in USD
+        valued['price'] = valued['price'].to_numpy(dtype='float64') * fx_rates
+
+        return valued
+
+
+
+    def value_positions_stream(self) -> Iterator[pd.DataFrame]:
+
+        # Streaming version of value_positions_asof, for a TransactionStream: each chunk of reconstructed positions is valued and yielded as soon as it is read
+        # Prices are indexed once for all chunks. Memory is bounded by the size of a chunk (plus prices)
+
+        # N.B: self.dataframe is left untouched. Valued chunks are meant to be passed to calculate_performances
+
+        price_index = self.get_price_index()
+        for chunk in self.transaction:
+            yield self.value_transactions_asof(chunk, price_index)
+
+
+
+    def get_price_index(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Sorted composite keys (ticker code, day number) of recorded prices, with their ticker codes and prices (see Price.get_index)
+        return self.price.get_index()
+
+
+
+    def value_transactions_asof(self, transactions: pd.DataFrame, price_index: tuple[np.ndarray, np.ndarray, np.ndarray]) -> pd.DataFrame:
+
+        price_keys, price_codes, price_values = price_index
+
+        # Step 1 - Keep transactions on known tickers only (value_positions drops the others in its merges)
+        transactions = transactions[transactions['ticker'].isin(self.tickers)]
+
+        # Step 2 - Build the composite keys of transactions, the same way as get_price_index does
+        transaction_codes = self.get_ticker_codes(transactions['ticker'])
+        transaction_days = get_day_numbers(transactions['date'])
+        transaction_keys = transaction_codes * 2**20 + transaction_days + 2**19
+
+        # Step 3 - Look up the latest price whose key is lower or equal to the transaction key
+        # A match is valid only if it belongs to the same ticker (otherwise, there is no recorded price before that date)
+        match = np.searchsorted(price_keys, transaction_keys, side='right') - 1
+        is_valid = (match >= 0) & (price_codes[np.maximum(match, 0)] == transaction_codes)
+        transaction_prices = np.where(is_valid, price_values[np.maximum(match, 0)], np.nan)
+
+        # Step 4 - Order rows by date then ticker, as value_positions does
+        row_order = np.lexsort((transaction_codes, transaction_days))
+        valued = transactions.iloc[row_order].reset_index(drop=True)
+        valued['price'] = transaction_prices[row_order]
+
+        # Step 5 - Value positions
+        valued['value'] = valued['position'] * valued['price']
+
+        return valued
+
+
+
+    @stage(rows_in=lambda self, *args, **kwargs: len(self.transaction.dataframe), rows_out=lambda result, self, *args, **kwargs: self.position_matrix.size)
+    def mark_to_market(self, adjustment: Adjustment = None) -> None:
+
+        # value_positions only values rows for which there is a transaction, so summing 'value' does not give the daily value of the portfolio (i.e NAV)
+        # Here, positions and prices are laid out as dense dates x tickers arrays (one row per date from tx_csv and px_csv, one column per ticker from px_csv headers)
+        # so that the daily exposure per ticker, the NAV and the weights are computed by vectorized operations
+
+        # N.B: Prices are read from the wide px_csv layout (i.e price.dataframe), so Price.unpivot is not needed. Neither is Transaction.reconstruct_positions
+        # adjustment (see src/Adjustment.py): its factor arrays share the layout of the matrices, so adjusting is one element-wise multiplication (or division)
+
+        # Step 1 - Get all dates from tx_csv and px_csv, sorted by ascending order (same as value_positions)
+        self.matrix_dates = np.array(self.get_all_dates(), dtype=object)
+        if adjustment is not None:
+            self.check_adjustment(adjustment)
+        self.matrix_adjustment = adjustment
+        date_index = pd.Index(self.matrix_dates)
+
+        # Step 2 - Signed quantities ('BUY' = +qty, 'SELL' = -qty) added at their (date, ticker) cell. Transactions on unknown tickers are ignored
+        transactions = self.transaction.dataframe
+        rows = date_index.get_indexer(transactions['date'])
+        columns = self.get_ticker_codes(transactions['ticker'])
+        is_known = columns >= 0
+        signed_qty = np.where(transactions['order'] == 'BUY', transactions['qty'], -transactions['qty']).astype('float64')
+
+        trades = np.zeros((len(self.matrix_dates), len(self.tickers)))
+        np.add.at(trades, (rows[is_known], columns[is_known]), signed_qty[is_known])
+
+        # Step 3 - Positions are the cumulative sum of the trades over dates
+        # With corporate actions, trades are summed in base shares (i.e shares before any corporate action), then converted to shares held on each date
+        if adjustment is None:
+            self.position_matrix = np.cumsum(trades, axis=0)
+        else:
+            self.position_matrix = np.cumsum(trades / adjustment.share_factors, axis=0) * adjustment.share_factors
+
+        # Step 4 - Prices placed at their date row, then forward filled with the latest recorded price before that date
+        self.price_matrix = np.full((len(self.matrix_dates), len(self.tickers)), np.nan)
+        self.price_matrix[date_index.get_indexer(self.price.dataframe['Date'])] = self.price.dataframe[self.tickers].to_numpy(dtype='float64')
+        self.price_matrix = self.forward_fill(self.price_matrix)
+        if adjustment is not None:
+            self.price_matrix = self.price_matrix * adjustment.fx_rates
+
+        # Step 5 - Exposure per ticker, NAV and weights. Tickers with no recorded price yet count as 0
+        self.exposure_matrix = np.nan_to_num(self.position_matrix * self.price_matrix)
+        self.nav = self.exposure_matrix.sum(axis=1)
+        self.weight_matrix = np.divide(self.exposure_matrix, self.nav[:, None], out=np.full_like(self.exposure_matrix, np.nan), where=self.nav[:, None] != 0)
+
+        return self
+
+
+
+    @staticmethod
+    def forward_fill(matrix: np.ndarray) -> np.ndarray:
+        # Column-wise ffill: each null value takes the latest non-null value above it (null values before the first one remain null)
+        row_numbers = np.where(np.isnan(matrix), 0, np.arange(matrix.shape[0])[:, None])
+        np.maximum.accumulate(row_numbers, axis=0, out=row_numbers)
+        return matrix[row_numbers, np.arange(matrix.shape[1])]
+
+
+
+    def get_ticker_codes(self, tickers: pd.Series) -> np.ndarray:
+        # Ticker names to their position in px_csv headers (-1 if unknown)
+        return get_ticker_positions(tickers, self.tickers)
+
+
+
+    @stage(rows_in=lambda self, *args, **kwargs: len(self.transaction.dataframe), rows_out=lambda result, self, *args, **kwargs: len(self.dataframe))
+    def append_positions(self, state_folder: str, full: bool = False) -> None:
+
+        """
+        End-of-day mode of value_positions: only the rows appended to tx_csv/px_csv since the last run are valued.
+        full: if True, dataframe holds all valued rows (previous runs included), loaded from the store of state_folder. Otherwise, only the rows valued by this run
+        """
+
+        # The state saved in state_folder holds:
+        # - state.json: the last processed date, the last position and the last known price per ticker, and the size and hash of the part of each csv already processed
+        # - a single store of the valued rows (valued.pkl, then valued-<n>.pkl once compacted), to which each run appends its delta. It is only read when full is True (and then compacted in one block)
+        # The valued rows are bit-identical to those of a full recompute (value_positions) as long as rows are appended to the csv files, strictly later than the last processed date
+
+        # N.B: Valuing and storing scale with the delta, reading the sources does not: Transaction and Price parse both csv files in full, and each file is hashed once per run
+        # (the part processed by the last run and the whole file, in a single read). Load them with use_cache=False: after an append, their parquet cache is cold and writing it is wasted
+
+        # N.B: On first run (i.e no state yet), a full recompute is done and its result is saved as the initial state
+        # N.B: The state (last date, positions) is kept as json, so compact dtypes are not supported here
+
+        if self.compact:
+            raise ValueError('append_positions does not support compact dtypes. Load Transaction and Price with compact=False')
+
+        # Step 1 - First run: full recompute
+        state_file = os.path.join(state_folder, 'state.json')
+        if not os.path.exists(state_file):
+            if 'position' not in self.transaction.dataframe.columns:
+                self.transaction.reconstruct_positions()
+            if self.price.unpivot_dataframe is pd.DataFrame:
+                self.price.unpivot()
+            self.value_positions()
+            self.save_state(state_folder, self.dataframe, self.price.dataframe, {})
+            return self
+
+        with open(state_file) as file:
+            state = json.load(file)
+        if 'store_bytes' not in state:
+            raise ValueError(f'{state_folder} was written by a previous version of append_positions. Remove it to start from a full recompute')
+        last_date = state['last_date']
+
+        # Step 2 - Keep only rows later than the last processed date and make sure previous rows were not modified:
+        # the part of each csv processed by the last run must be unchanged (same bytes), and every new row must be later than the last processed date
+        transactions = self.transaction.dataframe
+        new_transactions = transactions[transactions['date'] > last_date]
+        new_wide_prices = self.price.dataframe[self.price.dataframe['Date'] > last_date]
+        if self.tickers != state['tickers']:
+            raise ValueError(f'Tickers changed since last run. Expected {state["tickers"]}. Got {self.tickers}. Run value_positions for a full recompute')
+        file_keys = {name: get_file_keys(file_name, state['files'][name]['size']) for name, file_name in self.get_source_files().items()}
+        is_unchanged = all(file_keys[name][0] == state['files'][name]['key'] for name in file_keys)
+        is_unchanged &= len(transactions) - len(new_transactions) == state['transaction_rows'] and len(self.price.dataframe) - len(new_wide_prices) == state['price_rows']
+        if not is_unchanged:
+            raise ValueError(f'Rows dated on or before {last_date} changed since last run. Run value_positions for a full recompute')
+
+        if new_transactions.empty and new_wide_prices.empty:
+            self.dataframe = self.load_valued(state_folder, state) if full else self.get_empty_valued(state)
+            return self
+
+        # Step 3 - Same steps as value_positions but restricted to the new dates. Only the new price rows are unpivoted
+        new_prices = pd.melt(new_wide_prices, id_vars='Date', value_vars=self.tickers, var_name='ticker', value_name='price').rename(columns={'Date':'date'})
+        new_transactions = new_transactions[['date', 'ticker', 'qty', 'order']].sort_values(by='date', kind='stable')
+        new_transactions['relative_qty'] = np.where(new_transactions['order'] == 'BUY', new_transactions['qty'], -new_transactions['qty'])
+        # Positions carry on from the last position of each ticker
+        new_transactions['position'] = new_transactions.groupby('ticker')['relative_qty'].cumsum() + new_transactions['ticker'].map(state['positions']).fillna(0).astype('int64')
+
+        new_dates = sorted(set(new_transactions['date']) | set(new_prices['date']))
+        delta = pd.MultiIndex.from_product([new_dates, self.tickers], names=['date', 'ticker']).to_frame(index=False)
+        delta = pd.merge(delta, new_transactions, how='left', on=['date', 'ticker'])
+        delta = pd.merge(delta, new_prices, how='left', on=['date', 'ticker'])
+        delta = delta.sort_values(by='date', kind='stable')
+
+        # Prices carry on from the last known price of each ticker
+        delta['price'] = delta.groupby('ticker')['price'].ffill()
+        delta['price'] = delta['price'].fillna(delta['ticker'].map(state['prices']))
+
+        delta = delta[ delta['order'].isna() == False ]
+        delta['value'] = delta['position'] * delta['price']
+
+        # Step 4 - Align dtypes on previous runs (e.g: the merge casts integer columns to float only when it introduces null values)
+        delta = delta[state['columns']].astype(state['dtypes']).reset_index(drop=True)
+
+        # Step 5 - Append the delta to the store and save the new state
+        self.save_state(state_folder, delta, new_wide_prices, state, file_keys)
+        self.dataframe = self.load_valued(state_folder) if full else delta
+
+        return self
+
+
+
+    def get_source_files(self) -> dict[str, str]:
+        return {'transaction': self.transaction.file_name, 'price': self.price.file_name}
+
+
+
+    @staticmethod
+    def get_empty_valued(state: dict) -> pd.DataFrame:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in state['dtypes'].items()})[state['columns']]
+
+
+
+    def save_state(self, state_folder: str, delta: pd.DataFrame, new_wide_prices: pd.DataFrame, previous_state: dict, file_keys: dict = None) -> None:
+
+        """
+        Saves the state used by append_positions: the valued rows of the current run (delta) are appended to the store, then state.json is replaced (commit point).
+        file_keys: get_file_keys of each source file, computed by append_positions (computed here on first run)
+        """
+
+        os.makedirs(state_folder, exist_ok=True)
+        if file_keys is None:
+            file_keys = {name: get_file_keys(file_name) for name, file_name in self.get_source_files().items()}
+        store_file = previous_state.get('store_file', 'valued.pkl')
+
+        # Bytes written after the last saved state (e.g: a run which crashed before saving it) are dropped first
+        with open(os.path.join(state_folder, store_file), 'ab') as store:
+            store.truncate(previous_state.get('store_bytes', 0))
+            pickle.dump(delta.reset_index(drop=True), store, protocol=pickle.HIGHEST_PROTOCOL)
+            store_bytes = store.tell()
+
+        # Last position per ticker
+        positions = dict(previous_state.get('positions', {}))
+        last_positions = delta.groupby('ticker')['position'].last()
+        positions.update({ticker: int(position) for ticker, position in last_positions.items()})
+
+        # Last known price per ticker (forward filled, so null values are skipped)
+        prices = dict(previous_state.get('prices', {}))
+        if len(new_wide_prices):
+            last_prices = new_wide_prices.sort_values(by='Date', kind='stable')[self.tickers].ffill().iloc[-1]
+            prices.update({ticker: float(price) for ticker, price in last_prices.items() if not np.isnan(price)})
+
+        dates = list(delta['date']) + list(new_wide_prices['Date']) + [previous_state.get('last_date', '')]
+        state = {
+            'last_date': max(dates),
+            'tickers': self.tickers,
+            'files': {name: {'size': size, 'key': key} for name, (_, key, size) in file_keys.items()},
+            'transaction_rows': len(self.transaction.dataframe),
+            'price_rows': previous_state.get('price_rows', 0) + len(new_wide_prices),
+            'positions': positions,
+            'prices': prices,
+            'columns': previous_state.get('columns', list(delta.columns)),
+            'dtypes': previous_state.get('dtypes', {column: str(dtype) for column, dtype in delta.dtypes.items()}),
+            'store_file': store_file,
+            'store_bytes': store_bytes,
+            'store_blocks': previous_state.get('store_blocks', 0) + 1,
+            'store_version': previous_state.get('store_version', 0)
+        }
+        self.write_state(state_folder, state)
+
+
+
+    @staticmethod
+    def write_state(state_folder: str, state: dict) -> None:
+        # Write through a temporary file so a crash never leaves a half-written state behind
+        with open(os.path.join(state_folder, 'state.json.tmp'), 'w') as file:
+            json.dump(state, file)
+        os.replace(os.path.join(state_folder, 'state.json.tmp'), os.path.join(state_folder, 'state.json'))
+
+
+
+    def load_valued(self, state_folder: str, state: dict = None) -> pd.DataFrame:
+
+        # All valued rows of the store. The blocks appended by each run are then rewritten as a single one, so that the next full load reads one block
+        # The compacted store gets a new file name, and state.json is the commit point: the previous store is only removed once the state points to the new one,
+        # so a crash at any step leaves a state whose store_bytes match its store file
+
+        if state is None:
+            with open(os.path.join(state_folder, 'state.json')) as file:
+                state = json.load(file)
+
+        store_path = os.path.join(state_folder, state.get('store_file', 'valued.pkl'))
+        blocks = []
+        with open(store_path, 'rb') as store:
+            while store.tell() < state['store_bytes']:
+                blocks.append(pickle.load(store))
+        valued = pd.concat(blocks, ignore_index=True) if len(blocks) > 1 else blocks[0]
+
+        if len(blocks) > 1:
+            store_version = state.get('store_version', 0) + 1
+            store_file = f'valued-{store_version}.pkl'
+            with open(os.path.join(state_folder, store_file), 'wb') as store:
+                pickle.dump(valued, store, protocol=pickle.HIGHEST_PROTOCOL)
+                store_bytes = store.tell()
+            self.write_state(state_folder, {**state, 'store_file': store_file, 'store_bytes': store_bytes, 'store_blocks': 1, 'store_version': store_version})
+            # Previous store, and stores left behind by a crash before their state was written
+            for file_name in os.listdir(state_folder):
+                if file_name.startswith('valued') and file_name.endswith('.pkl') and file_name != store_file:
+                    os.remove(os.path.join(state_folder, file_name))
+
+        return valued
+
+
+
+    @stage(detail=lambda self, columns, agg, suffix: f'{columns} {suffix}', rows_in=lambda self, *args: len(self.dataframe), rows_out=lambda result, self, *args: len(result))
     def calculate_performance(self, columns, agg, suffix) -> pd.DataFrame:
     
         # Step 1 - Make sure dataframe is is not None (i.e value_positions was run before calling that function)
@@ -73,6 +492,132 @@ class Portfolio:
         portfolio_copy = copy.deepcopy(self.dataframe)
         portfolio_grouped = portfolio_copy.groupby(columns).agg(agg).reset_index()
 
+        return self.format_performance(portfolio_grouped, columns, agg, suffix)
+
+
+
+    @stage(rows_out=lambda result, self, *args, **kwargs: sum(len(performance) for performance in result.values()))
+    def calculate_performances(self, grouping_configs: list[dict], valued_chunks: Iterable[pd.DataFrame] = None) -> dict[str, pd.DataFrame]:
+
+        """
+        Batched version of calculate_performance: all grouping configs are computed at once and the results sharing a suffix are merged together (e.g: {'monthly': ..., 'yearly': ...}).
+        grouping_configs: list of {'columns': subset of ['year', 'month', 'ticker'], 'agg': {column: 'sum'/'mean'/'std'/'count' or a list of them}, 'suffix': str}
+        valued_chunks: valued chunks to aggregate instead of dataframe (e.g: value_positions_stream()). Only the statistics of each chunk are kept in memory
+        """
+
+        # Instead of one deepcopy and one groupby per config:
+        # - year, month and ticker are turned into integer codes once (dates are parsed once per unique date, no datetime column is added to dataframe)
+        # - rows are sorted once by (year, month, ticker), so that the finest groups are contiguous: their count, sum and sum of squared deviations are computed with np.add.reduceat
+        # - every config is then rolled up from those finest groups, which are far fewer than rows
+        # Only the sort order and one column at a time are materialized, never a copy of the whole dataframe
+
+        # Step 1 - Make sure dataframe is is not None (i.e value_positions was run before calling that function)
+        if valued_chunks is None:
+            is_dataframe_empty(self.dataframe, self.value_positions)
+            valued_chunks = [self.dataframe]
+
+        # Step 2 - Statistics of the finest groups of each chunk. A group may be split over several chunks: the roll-up below merges its parts
+        aggregated_columns = list(dict.fromkeys(column for config in grouping_configs for column in config['agg']))
+        chunk_statistics = [self.get_group_statistics(chunk, aggregated_columns) for chunk in valued_chunks if not chunk.empty]
+        if not chunk_statistics:
+            raise ValueError('No valued rows to aggregate')
+
+        group_keys = {name: np.concatenate([keys[name] for keys, _ in chunk_statistics]) for name in ['year', 'month', 'ticker']}
+        statistics = {column: tuple(np.concatenate([chunk[column][i] for _, chunk in chunk_statistics]) for i in range(4)) for column in aggregated_columns}
+
+        # Tickers are coded by alphabetical order, like groupby sorts them
+        group_keys['ticker'], ticker_names = pd.factorize(group_keys['ticker'], sort=True)
+
+        # Step 3 - Roll up each config from the finest groups, then name columns as calculate_performance does
+        results = {}
+        for config in grouping_configs:
+            columns, agg, suffix = config['columns'], config['agg'], config['suffix']
+
+            unique_keys, group_ids = np.unique(np.column_stack([group_keys[name] for name in columns]), axis=0, return_inverse=True)
+            group_ids = group_ids.ravel()
+            portfolio_grouped = pd.DataFrame({name: unique_keys[:, i] for i, name in enumerate(columns)})
+            if 'ticker' in columns:
+                portfolio_grouped['ticker'] = np.asarray(ticker_names)[portfolio_grouped['ticker']]
+
+            for column, functions in agg.items():
+                count, total, mean, squared_deviations = statistics[column]
+                group_count = np.bincount(group_ids, count, len(unique_keys))
+                group_total = np.bincount(group_ids, total, len(unique_keys))
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    group_mean = group_total / group_count
+                    # Sum of squared deviations of the union of groups (parallel variance formula), to avoid the precision loss of sum of squares
+                    group_squared_deviations = np.bincount(group_ids, squared_deviations + np.where(count > 0, count * (mean - group_mean[group_ids])**2, 0), len(unique_keys))
+                    outputs = {
+                        'sum': group_total,
+                        'count': group_count.astype('int64'),
+                        'mean': group_mean,
+                        'std': np.where(group_count > 1, np.sqrt(group_squared_deviations / (group_count - 1)), np.nan)
+                    }
+
+                for function in ([functions] if isinstance(functions, str) else functions):
+                    if function not in outputs:
+                        raise ValueError(f'agg functions must be among {list(outputs)}. Got {function}')
+                    portfolio_grouped[column if isinstance(functions, str) else f'{column}_{function}'] = outputs[function]
+
+            portfolio_grouped = self.format_performance(portfolio_grouped, columns, agg, suffix)
+            if 'month' in columns:
+                portfolio_grouped['year_month'] = portfolio_grouped['year'] * 100 + portfolio_grouped['month']
+
+            # Merge results sharing the same suffix on their common keys
+            if suffix in results:
+                on = [column for column in results[suffix].columns if column in portfolio_grouped.columns]
+                results[suffix] = pd.merge(results[suffix], portfolio_grouped, how='left', on=on)
+            else:
+                results[suffix] = portfolio_grouped
+
+        return results
+
+
+
+    @staticmethod
+    def get_group_statistics(dataframe: pd.DataFrame, columns: list[str]) -> tuple[dict, dict]:
+
+        """
+        Returns the keys (year, month, ticker name) of the finest groups of dataframe, and for each column the (count, sum, mean, sum of squared deviations) of each group.
+        Null values are skipped, as groupby does.
+        """
+
+        # Step 1 - Integer keys
+        date_codes, unique_dates = pd.factorize(dataframe['date'])
+        unique_dates = pd.DatetimeIndex(pd.to_datetime(unique_dates, format='%Y-%m-%d'))
+        ticker_codes, ticker_names = pd.factorize(dataframe['ticker'])
+        keys = {
+            'year': unique_dates.year.to_numpy(dtype='int32')[date_codes],
+            'month': unique_dates.month.to_numpy(dtype='int32')[date_codes],
+            'ticker': ticker_codes
+        }
+
+        # Step 2 - One sort, then boundaries of the finest groups (i.e year, month, ticker)
+        order = np.lexsort((keys['ticker'], keys['month'], keys['year']))
+        keys = {name: key[order] for name, key in keys.items()}
+        is_new_group = np.ones(len(order), dtype=bool)
+        is_new_group[1:] = (np.diff(keys['year']) != 0) | (np.diff(keys['month']) != 0) | (np.diff(keys['ticker']) != 0)
+        starts = np.flatnonzero(is_new_group)
+        group_keys = {name: key[starts] for name, key in keys.items()}
+        group_keys['ticker'] = np.asarray(ticker_names, dtype=object)[group_keys['ticker']]
+
+        # Step 3 - Statistics of each group, one column at a time
+        statistics = {}
+        for column in columns:
+            values = dataframe[column].to_numpy(dtype='float64')[order]
+            is_valid = ~np.isnan(values)
+            count = np.add.reduceat(is_valid.astype('int64'), starts)
+            total = np.add.reduceat(np.where(is_valid, values, 0), starts)
+            mean = np.divide(total, count, out=np.zeros(len(starts)), where=count > 0)
+            deviations = np.where(is_valid, values - np.repeat(mean, np.diff(np.append(starts, len(order)))), 0)
+            statistics[column] = (count, total, mean, np.add.reduceat(deviations**2, starts))
+
+        return group_keys, statistics
+
+
+
+    @staticmethod
+    def format_performance(portfolio_grouped: pd.DataFrame, columns, agg, suffix) -> pd.DataFrame:
 
         if 'ticker' in columns:
 
@@ -1,30 +1,84 @@
 import pandas as pd
+import numpy as np
 import copy
-from config.constants import px_csv
+from config.constants import px_csv, px_schema, ticker_rules, validation_mode, compact_dtypes
 from src.File import File
 from lib.utils import *
+from lib.profiling import stage
 
 
 
 class Price(File):
 
+    # Rules the cache is validated against (see File)
+    schemas = (px_schema, ticker_rules)
 
 
-    def __init__(self, file_name: str):
-        
-        super().__init__(file_name)
+
+    def __init__(self, file_name: str, use_cache: bool = True, validation: str = validation_mode, compact: bool = compact_dtypes, tickers: list[str] = None, start_date: str = None, end_date: str = None):
+
+        """
+        Lazy loading (e.g: to value a small account against a large price universe, see for_transactions):
+        - tickers: only those columns are read. Tickers missing from px_csv are ignored
+          With use_cache, the other columns are never parsed once the csv is cached as parquet, but a cold cache (first run, or csv changed) parses the whole csv once to write it.
+          With use_cache=False, only those columns are parsed, on every run (e.g: a one-off load of a few tickers from a csv which changes between runs)
+        - start_date, end_date: 'YYYY-MM-DD'. Only rows within that range are kept, plus one row carrying the latest price of each ticker before start_date,
+        so that valuing positions from start_date gives the same values as with the whole file
+        """
+
+        # Columns are selected in px_csv order, so that tickers keep the same order as in a full load
+        usecols = None
+        if tickers is not None:
+            requested_tickers = set(tickers)
+            usecols = [header for header in get_csv_headers(file_name) if header == 'Date' or header in requested_tickers]
+
+        super().__init__(file_name, use_cache, validation, compact, usecols)
 
         # Sanity checks
+        # Prices are checked once here, on the wide layout: price type and sign as one block for all tickers (px_schema), and ticker names on headers
+        # Rows out of the date range are dropped first, so that they are not checked either
         check_file_name(px_csv, self.file_name)
         self.check_headers()
+        if start_date is not None or end_date is not None:
+            self.select_dates(start_date, end_date)
+        self.tickers = self.get_tickers()
+        check_schema(pd.DataFrame({'ticker': self.tickers}), {'ticker': ticker_rules}, 'skip' if self.validation == 'skip' else 'full')
+        self.check_schema(px_schema)
 
-        # Once checks passed
+        # Once checks passed. Prices keep float64, so that values (and aggregated outputs) are unchanged
+        if self.compact:
+            self.compact_columns(dates=('Date',))
         self.dates = list(self.dataframe['Date'].unique())
-        self.tickers = self.get_tickers()
         self.unpivot_dataframe = pd.DataFrame
 
 
 
+    @classmethod
+    def for_transactions(cls, file_name: str, transaction, **kwargs):
+        # Lazy Price holding only what valuing transaction needs: its tickers, from its first to its last date
+        start_date, end_date = [pd.Timestamp(date).strftime('%Y-%m-%d') for date in [min(transaction.dates), max(transaction.dates)]]
+        return cls(file_name, tickers=list(transaction.dataframe['ticker'].unique()), start_date=start_date, end_date=end_date, **kwargs)
+
+
+
+    def select_dates(self, start_date: str = None, end_date: str = None):
+
+        # Keeps rows dated from start_date to end_date (inclusive)
+        # Rows before start_date are collapsed into their last one, forward filled: it holds the latest recorded price of each ticker, which is what ffill carries over to later dates
+
+        self.is_partial = True
+        if end_date is not None:
+            self.dataframe = self.dataframe[self.dataframe['Date'] <= end_date]
+        if start_date is not None:
+            is_before = self.dataframe['Date'] < start_date
+            if is_before.any():
+                carried = self.dataframe[is_before].sort_values(by='Date', kind='stable').ffill().iloc[[-1]]
+                self.dataframe = pd.concat([carried, self.dataframe[~is_before]])
+        self.dataframe = self.dataframe.reset_index(drop=True)
+        self.rows = len(self.dataframe)
+
+
+
     def get_tickers(self) -> list[str]:
         tickers = copy.deepcopy(self.headers)
         tickers.remove('Date')
@@ -32,6 +86,7 @@ class Price(File):
 
 
 
+    @stage(rows_in=lambda self: self.rows, rows_out=lambda result, self: len(self.unpivot_dataframe))
     def unpivot(self) -> None:
 
         # In order to compute the value of the positions, we need to merge prices on transactions for each date and ticker
@@ -43,17 +98,35 @@ class Price(File):
         
         # N.B: Does not return a dataframe but the updated unpivot_dataframe
 
+        # N.B: Tickers and prices were already checked in __init__, on the wide layout
+
         self.unpivot_dataframe = pd.melt(self.dataframe, id_vars='Date', value_vars=self.tickers, var_name='ticker', value_name='price') 
-        
-        # Sanity checks
-        check_ticker_values(self.unpivot_dataframe)
-        check_column_type(self.unpivot_dataframe, 'price', 'float64')
-        check_negative_values(self.unpivot_dataframe, 'price')
+        if self.compact:
+            self.unpivot_dataframe['ticker'] = pd.Categorical(self.unpivot_dataframe['ticker'], categories=self.tickers)
 
         return self
 
  
 
+    def get_index(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+
+        # Index used to look up the latest recorded price before a date (see Portfolio.value_positions_asof)
+        # Returns the composite keys (ticker code in the high bits, day number in the low bits) of recorded prices sorted by ascending order, with their ticker codes and prices
+        # Tickers are coded by their position in px_csv headers. Missing prices are dropped (ffill skips them too)
+
+        # N.B: Built from the wide layout (ticker by ticker), so unpivot is not needed
+
+        days = get_day_numbers(self.dataframe['Date'])
+        prices = self.dataframe[self.tickers].to_numpy(dtype='float64').T.ravel()
+        codes = np.repeat(np.arange(len(self.tickers), dtype='int64'), len(days))
+        keys = codes * 2**20 + np.tile(days, len(self.tickers)) + 2**19
+
+        is_known = ~np.isnan(prices)
+        order = np.argsort(keys[is_known], kind='stable')
+        return keys[is_known][order], codes[is_known][order], prices[is_known][order]
+
+
+
     def check_headers(self):
         if 'Date' not in self.headers:
             raise ValueError('Missing "Date" column')
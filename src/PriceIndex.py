@@ -0,0 +1,40 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from src.Price import Price
+
+
+
+class PriceIndex:
+
+
+
+    def __init__(self, folder: str):
+
+        # Read-only stand-in for Price, built from the index saved by PriceIndex.save
+        # Arrays are memory-mapped: processes opening the same folder share the same pages instead of each holding (or unpickling) a copy of the prices
+        # It can be passed to Portfolio in place of a Price, for the as-of valuation only (i.e value_positions('asof'), value_positions_stream)
+
+        self.folder = folder
+        with open(os.path.join(folder, 'price_index.json')) as file:
+            metadata = json.load(file)
+        self.tickers = metadata['tickers']
+        self.dates = metadata['dates']
+        self.keys, self.codes, self.prices = [np.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r') for name in ['keys', 'codes', 'prices']]
+        self.unpivot_dataframe = pd.DataFrame
+
+
+
+    def get_index(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.keys, self.codes, self.prices
+
+
+
+    @staticmethod
+    def save(price: Price, folder: str) -> None:
+        os.makedirs(folder, exist_ok=True)
+        for name, array in zip(['keys', 'codes', 'prices'], price.get_index()):
+            np.save(os.path.join(folder, f'{name}.npy'), array)
+        with open(os.path.join(folder, 'price_index.json'), 'w') as file:
+            json.dump({'tickers': price.tickers, 'dates': price.dates}, file)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import os
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from config.constants import cache_dir
+
+
+
+class QueryService:
+
+    # Parameters of each chart function of get_chart
+    chart_parameters = {'evolution': ['start', 'end', 'unit'], 'composition': ['date']}
+
+
+
+    def __init__(self, performances: dict[str, pd.DataFrame], chart_folder: str = os.path.join(cache_dir, 'charts')):
+
+        # Long-lived lookups on the output of Portfolio.calculate_performances (i.e {'monthly': ..., 'yearly': ...}), without rerunning the pipeline
+        # Indexes are built once: row positions of each period (year_month or year) and of each ticker, and one row per period for the portfolio evolution
+        # Charts are rendered on demand and saved in chart_folder, under a name derived from the data and the chart parameters, so each chart is only rendered once
+
+        self.performances = {suffix: performances[suffix].reset_index(drop=True) for suffix in ['monthly', 'yearly']}
+        self.period_columns = {'monthly': 'year_month', 'yearly': 'year'}
+        self.chart_folder = chart_folder
+
+        # Step 1 - Row positions by period and by ticker
+        self.period_index = {suffix: df.groupby(self.period_columns[suffix]).indices for suffix, df in self.performances.items()}
+        self.ticker_index = {suffix: df.groupby('ticker').indices for suffix, df in self.performances.items()}
+
+        # Step 2 - Portfolio values and performances, one row per period sorted by ascending period (range queries are binary searches on periods)
+        self.evolutions = {}
+        for suffix, df in self.performances.items():
+            columns = [self.period_columns[suffix], f'portfolio_{suffix}_value', f'portfolio_{suffix}_performance_USD', f'portfolio_{suffix}_performance_pct']
+            self.evolutions[suffix] = df[columns].drop_duplicates(self.period_columns[suffix]).sort_values(by=self.period_columns[suffix]).reset_index(drop=True)
+
+        # Step 3 - Key of the data, part of the names of cached charts: charts of other data are never served
+        digest = hashlib.sha256()
+        for suffix, df in self.performances.items():
+            digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        self.data_key = digest.hexdigest()
+
+        # pyplot is not thread-safe: charts are rendered one at a time (lookups are not locked)
+        self.chart_lock = threading.Lock()
+
+
+
+    def get_suffix(self, date: int) -> str:
+        # YYYYMM for a month, YYYY for a year (same convention as evolution and composition)
+        if len(str(date)) == 6:
+            return 'monthly'
+        elif len(str(date)) == 4:
+            return 'yearly'
+        raise ValueError(f'Date must have 4 (YYYY) or 6 (YYYYMM) characters. Got {date}')
+
+
+
+    def get_composition(self, date: int) -> pd.DataFrame:
+        # Value and weight of each ticker for a given month (YYYYMM) or year (YYYY)
+        suffix = self.get_suffix(date)
+        if date not in self.period_index[suffix]:
+            raise ValueError(f'No {suffix} performance for {date}')
+        rows = self.performances[suffix].iloc[self.period_index[suffix][date]]
+        result = pd.DataFrame({'ticker': rows['ticker'].to_numpy(), 'value': rows[f'ticker_{suffix}_value'].to_numpy()})
+        result['weight'] = result['value'] / result['value'].sum()
+        return result
+
+
+
+    def get_evolution(self, start: int, end: int) -> pd.DataFrame:
+        # Portfolio value and performance (USD and pct) of each period between start and end (inclusive). Both must be months (YYYYMM) or both years (YYYY)
+        suffix = self.get_suffix(start)
+        if self.get_suffix(end) != suffix:
+            raise ValueError(f'start and end must have the same format. Got {start} and {end}')
+        evolution_df = self.evolutions[suffix]
+        periods = evolution_df[self.period_columns[suffix]].to_numpy()
+        first, last = np.searchsorted(periods, start, side='left'), np.searchsorted(periods, end, side='right')
+        return evolution_df.iloc[first:last]
+
+
+
+    def get_ticker_statistics(self, ticker: str, suffix: str = 'yearly') -> pd.DataFrame:
+        # Value, mean price and price standard deviation of a ticker for each month or year
+        if suffix not in self.performances:
+            raise ValueError(f'suffix must be either "monthly" or "yearly". Got {suffix}')
+        if ticker not in self.ticker_index[suffix]:
+            raise ValueError(f'Unknown ticker: {ticker}')
+        columns = [self.period_columns[suffix], f'ticker_{suffix}_value', f'ticker_{suffix}_price_mean', f'ticker_{suffix}_price_std']
+        return self.performances[suffix].iloc[self.ticker_index[suffix][ticker]][columns]
+
+
+
+    def get_chart(self, function: str, **kwargs) -> str:
+
+        """
+        Returns the path of the png rendered by lib.charts.evolution or composition, rendering it only if it is not cached yet
+        function: 'evolution' (kwargs: start, end, unit) or 'composition' (kwargs: date)
+        """
+
+        if function == 'evolution':
+            kwargs = {'start': int(kwargs['start']), 'end': int(kwargs['end']), 'unit': kwargs.get('unit', 'USD')}
+            suffix = self.get_suffix(kwargs['start'])
+            if kwargs['unit'] not in ['USD', 'pct']:
+                raise ValueError(f'unit must be either "USD" or "pct". Got {kwargs["unit"]}')
+        elif function == 'composition':
+            kwargs = {'date': int(kwargs['date'])}
+            suffix = self.get_suffix(kwargs['date'])
+        else:
+            raise ValueError(f'function must be either "evolution" or "composition". Got {function}')
+
+        parameters = '_'.join(str(value) for value in kwargs.values())
+        save_path = os.path.join(self.chart_folder, f'{function}_{parameters}_{self.data_key[:16]}.png')
+
+        with self.chart_lock:
+            if not os.path.exists(save_path):
+                os.makedirs(self.chart_folder, exist_ok=True)
+                # matplotlib is imported on the first chart only: queries answered in json never load it
+                import matplotlib
+                import matplotlib.pyplot as plt
+                from lib.charts import evolution, composition
+                matplotlib.use('Agg', force=True)
+                # Rendered to a temporary file, so a failed render never leaves a half-written chart behind
+                chart_functions = {'evolution': evolution, 'composition': composition}
+                try:
+                    chart_functions[function](df=self.performances[suffix], save_path=f'{save_path}.tmp.png', **kwargs)
+                finally:
+                    plt.close('all')
+                os.replace(f'{save_path}.tmp.png', save_path)
+
+        return save_path
\ No newline at end of file
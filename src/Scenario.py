@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from collections.abc import Iterator
+from config.constants import scenario_block_size
+from src.Portfolio import Portfolio
+from src.Adjustment import Adjustment
+from lib.utils import is_dataframe_empty
+
+
+
+class Scenario:
+
+
+
+    def __init__(self, portfolio: Portfolio, adjustment: Adjustment = None):
+
+        # What-if revaluation of a valued and marked to market portfolio (i.e value_positions and mark_to_market were run) under price scenarios: a scenario is one multiplier per ticker (e.g: 0.8 = -20%)
+        # A value is position x price, so a shocked sum of values over a period is the sum over tickers of (sum of values of the ticker over the period) x (multiplier of the ticker)
+        # Those sums are computed once here, as dense periods x tickers matrices. A block of scenarios is then revalued by one matrix product per aggregate,
+        # without rebuilding nor aggregating the valued dataframe again. Memory grows with the block size, not with the number of scenarios
+
+        # N.B: Same aggregates as the 'portfolio_{suffix}_value' columns of Portfolio.calculate_performances (i.e sums of 'value' by year and month, and by year)
+
+        # Step 1 - Make sure dataframe is is not None (i.e value_positions was run before calling that function)
+        is_dataframe_empty(portfolio.dataframe, portfolio.value_positions)
+        valued = portfolio.dataframe
+        self.tickers = list(portfolio.tickers)
+
+        # Step 2 - Integer keys: ticker position in px_csv headers, year and month (dates are parsed once per unique date)
+        ticker_codes = portfolio.get_ticker_codes(valued['ticker'])
+        date_codes, unique_dates = pd.factorize(valued['date'])
+        unique_dates = pd.DatetimeIndex(pd.to_datetime(unique_dates, format='%Y-%m-%d'))
+        period_keys = {
+            'monthly': (unique_dates.year * 100 + unique_dates.month).to_numpy(dtype='int64')[date_codes],
+            'yearly': unique_dates.year.to_numpy(dtype='int64')[date_codes]
+        }
+
+        # Step 3 - Sum of values of each (period, ticker). Null values are skipped, as groupby does
+        values = np.nan_to_num(valued['value'].to_numpy(dtype='float64'))
+        self.periods, self.value_matrices = {}, {}
+        for suffix, keys in period_keys.items():
+            self.periods[suffix], period_codes = np.unique(keys, return_inverse=True)
+            self.value_matrices[suffix] = np.zeros((len(self.periods[suffix]), len(self.tickers)))
+            np.add.at(self.value_matrices[suffix], (period_codes.ravel(), ticker_codes), values)
+
+        # Step 4 - Current value of each ticker: position x price on the last date of the mark_to_market matrices, i.e the daily NAV of the last date is their sum
+        # adjustment must be the one the portfolio was valued and marked to market with, so that current values and period values share the same shares and currency
+        if getattr(portfolio.price, 'dataframe', None) is None:
+            raise ValueError('Scenario needs the wide px_csv prices (price.dataframe) to get current prices. Load prices with Price instead of PriceIndex')
+        if len(portfolio.matrix_dates) == 0:
+            raise ValueError(f'Matrices are empty. Make sure you ran {portfolio.mark_to_market.__name__}')
+        if portfolio.matrix_adjustment is not adjustment:
+            raise ValueError('Portfolio was marked to market with another adjustment. Run mark_to_market with the adjustment given to Scenario')
+        self.current_positions = portfolio.position_matrix[-1]
+        self.current_prices = portfolio.price_matrix[-1]
+        self.current_values = np.nan_to_num(self.current_positions * self.current_prices)
+
+
+
+    def get_multipliers(self, scenarios) -> np.ndarray:
+        # scenarios x tickers array. A dataframe is aligned on tickers by column name (tickers missing from its columns are not shocked, i.e multiplier 1)
+        if isinstance(scenarios, pd.DataFrame):
+            scenarios = scenarios.reindex(columns=self.tickers, fill_value=1.0)
+        multipliers = np.asarray(scenarios, dtype='float64')
+        if multipliers.ndim != 2 or multipliers.shape[1] != len(self.tickers):
+            raise ValueError(f'scenarios must be a scenarios x tickers matrix with {len(self.tickers)} columns ({self.tickers}). Got shape {multipliers.shape}')
+        return multipliers
+
+
+
+    def revalue_blocks(self, scenarios, block_size: int = scenario_block_size) -> Iterator[tuple[int, dict[str, np.ndarray]]]:
+
+        """
+        Yields (first scenario number, results) for each block of block_size scenarios, results being:
+        - 'current': current value of each ticker (block x tickers), 'portfolio': current value of the portfolio (block)
+        - 'monthly' and 'yearly': value of the portfolio over each period (block x periods, periods in self.periods)
+        """
+
+        multipliers = self.get_multipliers(scenarios)
+        for start in range(0, len(multipliers), block_size):
+            block = multipliers[start:start + block_size]
+            results = {'current': block * self.current_values, 'portfolio': block @ self.current_values}
+            for suffix, value_matrix in self.value_matrices.items():
+                results[suffix] = block @ value_matrix.T
+            yield start, results
+
+
+
+    def revalue(self, scenarios, block_size: int = scenario_block_size) -> dict[str, pd.DataFrame]:
+
+        """
+        Revalues the portfolio under every scenario. Returns dataframes with one row per scenario (same index as scenarios if it is a dataframe):
+        - 'current': current value of each ticker and of the portfolio ('portfolio' column)
+        - 'monthly': value of the portfolio of each month (columns: year_month), 'yearly': of each year (columns: year)
+        """
+
+        # Results are written block by block into arrays allocated once
+        n_scenarios = len(self.get_multipliers(scenarios))
+        current = np.empty((n_scenarios, len(self.tickers) + 1))
+        aggregates = {suffix: np.empty((n_scenarios, len(periods))) for suffix, periods in self.periods.items()}
+        for start, results in self.revalue_blocks(scenarios, block_size):
+            end = start + len(results['portfolio'])
+            current[start:end, :-1], current[start:end, -1] = results['current'], results['portfolio']
+            for suffix, values in aggregates.items():
+                values[start:end] = results[suffix]
+
+        index = scenarios.index if isinstance(scenarios, pd.DataFrame) else None
+        revalued = {'current': pd.DataFrame(current, columns=self.tickers + ['portfolio'], index=index)}
+        for suffix, values in aggregates.items():
+            revalued[suffix] = pd.DataFrame(values, columns=pd.Index(self.periods[suffix], name='year_month' if suffix == 'monthly' else 'year'), index=index)
+        return revalued
+
+
+
+    @staticmethod
+    def get_historical_scenarios(price_dataframe: pd.DataFrame, horizon: int = 21) -> pd.DataFrame:
+        # Historical replay: one scenario per date of px_csv, whose multipliers are the price changes of each ticker over the next horizon dates
+        # Prices are forward filled first. A ticker without a price at either end of the window is not shocked (multiplier 1)
+        if horizon < 1:
+            raise ValueError(f'horizon must be a number of dates of at least 1. Got {horizon}')
+        prices = price_dataframe.sort_values(by='Date', kind='stable').set_index('Date').ffill()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            multipliers = prices.shift(-horizon) / prices
+        return multipliers.iloc[:-horizon].where(np.isfinite(multipliers.iloc[:-horizon]), 1.0)
\ No newline at end of file
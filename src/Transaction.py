@@ -1,32 +1,37 @@
 from src.File import File
 from lib.utils import *
-from config.constants import tx_csv, tx_headers
+from lib.profiling import stage
+from lib.kernels import signed_cumsum, get_codes
+from config.constants import tx_csv, tx_headers, tx_schema, validation_mode, compact_dtypes, use_kernels
 import numpy as np
 
 
 
 class Transaction(File):
 
+    # Rules the cache is validated against (see File)
+    schemas = (tx_schema,)
 
 
-    def __init__(self, file_name: str):
+
+    def __init__(self, file_name: str, use_cache: bool = True, validation: str = validation_mode, compact: bool = compact_dtypes):
         
-        super().__init__(file_name)
+        super().__init__(file_name, use_cache, validation, compact)
 
-        # Sanity checks
+        # Sanity checks. Rules on values (ticker names, qty type and sign, order values) are declared in tx_schema
         check_file_name(tx_csv, self.file_name)
         self.check_headers()
-        check_ticker_values(self.dataframe)
-        check_column_type(self.dataframe, 'qty', 'int64')
-        check_negative_values(self.dataframe, 'qty')
-        self.check_order_values()
+        self.check_schema(tx_schema)
 
         # Once checks passed 
+        if self.compact:
+            self.compact_columns(dates=('date',), categories=('ticker', 'order'), integers=('qty',))
         self.dates = list(self.dataframe['date'].unique())
 
 
     
-    def reconstruct_positions(self) -> None:
+    @stage(rows_in=lambda self, *args, **kwargs: len(self.dataframe), rows_out=lambda result, self, *args, **kwargs: len(self.dataframe))
+    def reconstruct_positions(self, kernel: bool = use_kernels) -> None:
 
         # A position is the amount of a particular security, commodity or currency held or owned by a person or entity
         # As for each transaction, we know the date, the order, the quantity and the ticker, we can compute the positions for each ticker
@@ -42,8 +47,14 @@ class Transaction(File):
         # Step 2 - Convert absolute quantities into relative 
         self.dataframe['relative_qty'] = np.where(self.dataframe['order'] == 'BUY', self.dataframe['qty'], -self.dataframe['qty'])
         
-        # Step 3 - Compute cumulative sum for each ticker
-        self.dataframe['position'] = self.dataframe.groupby('ticker')['relative_qty'].cumsum()
+        # Step 3 - Compute cumulative sum for each ticker (computed as int64, then back to int32 in compact mode if positions fit)
+        # With kernel, the cumulative sum is done in one pass over integer ticker codes instead of a groupby (see lib/kernels.py)
+        if kernel:
+            self.dataframe['position'] = signed_cumsum(get_codes(self.dataframe['ticker']), self.dataframe['qty'].to_numpy(), (self.dataframe['order'] == 'BUY').to_numpy())
+        else:
+            self.dataframe['position'] = self.dataframe.groupby('ticker', observed=True)['relative_qty'].cumsum()
+        if self.compact:
+            self.dataframe['position'] = downcast_integers(self.dataframe['position'])
 
         # Step 4 - Drop columns which are not necessary anymore
         # Commented so one can check the good reconstruction of the positions. 
@@ -59,10 +70,4 @@ class Transaction(File):
     def check_headers(self):
         for header in tx_headers:
             if header not in self.headers:
-                raise ValueError(f'Missing {header} in headers. Headers should be {tx_headers}')
-        
-
-    def check_order_values(self):
-        order_unique_values_sorted = sorted(list(self.dataframe['order'].unique())) 
-        if order_unique_values_sorted != ['BUY', 'SELL']:
-            raise ValueError(f'order column should only contain "BUY" and "SELL" values. Got {order_unique_values_sorted}')
\ No newline at end of file
+                raise ValueError(f'Missing {header} in headers. Headers should be {tx_headers}')
\ No newline at end of file
@@ -0,0 +1,73 @@
+import pandas as pd
+import numpy as np
+from collections.abc import Iterator
+from config.constants import tx_csv, tx_headers, tx_schema
+from lib.utils import *
+
+
+
+class TransactionStream:
+
+
+
+    def __init__(self, file_names: str | list[str], chunksize: int = 1_000_000):
+
+        # Streaming counterpart of Transaction, for trade logs larger than RAM
+        # Instead of loading the whole csv, it is read by chunks of chunksize rows (or as a list of date-partitioned files, read in the given order)
+        # Iterating over the stream yields chunks with their positions reconstructed, the running position of each ticker being carried over from one chunk to the next
+
+        # N.B: Rows must be sorted by ascending date across chunks and files (i.e a trade log). Within a chunk, any order is fine
+
+        self.file_names = [file_names] if isinstance(file_names, str) else list(file_names)
+        self.chunksize = chunksize
+
+        # Sanity checks. Only headers are read here, the other checks are run on each chunk
+        # File name is only checked for a single file: partitions are named freely
+        if isinstance(file_names, str):
+            check_file_name(tx_csv, file_names)
+        for file_name in self.file_names:
+            self.check_headers(list(pd.read_csv(file_name, nrows=0).columns))
+
+        # Filled while chunks are read
+        self.dates = []
+        self.positions = {}
+
+
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+
+        self.dates = []
+        self.positions = {}
+        last_date = None
+
+        for file_name in self.file_names:
+            for chunk in pd.read_csv(file_name, chunksize=self.chunksize):
+
+                # Step 0 - Same sanity checks as Transaction, on the chunk
+                check_schema(chunk, tx_schema)
+
+                # Step 1 - Make sure chunks come in ascending date order, otherwise carried positions would be wrong
+                if last_date is not None and chunk['date'].min() < last_date:
+                    raise ValueError(f'Transactions must be sorted by ascending date across chunks. Got {chunk["date"].min()} after {last_date}')
+                last_date = chunk['date'].max()
+
+                # Step 2 - Same steps as Transaction.reconstruct_positions, starting from the positions at the end of the previous chunk
+                chunk = chunk.sort_values(by='date', kind='stable')
+                chunk['relative_qty'] = np.where(chunk['order'] == 'BUY', chunk['qty'], -chunk['qty'])
+                chunk['position'] = chunk.groupby('ticker')['relative_qty'].cumsum() + chunk['ticker'].map(self.positions).fillna(0).astype('int64')
+
+                # Step 3 - Carry positions over to the next chunk
+                self.positions.update(chunk.groupby('ticker')['position'].last().to_dict())
+                new_dates = list(chunk['date'].unique())
+                if self.dates and new_dates[0] == self.dates[-1]:
+                    new_dates = new_dates[1:]
+                self.dates.extend(new_dates)
+
+                yield chunk
+
+
+
+    def check_headers(self, headers: list[str]):
+        for header in tx_headers:
+            if header not in headers:
+                raise ValueError(f'Missing {header} in headers. Headers should be {tx_headers}')
\ No newline at end of file
@@ -0,0 +1,20 @@
+import os
+import sys
+import pytest
+
+
+
+# Tests run on the bundled tx_etf.csv and px_etf.csv, with use_cache=False so that no .cache folder is written next to them
+# Run from the repository root: python -m pytest
+
+
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+
+
+@pytest.fixture(scope='session')
+def bundled_files() -> dict[str, str]:
+    from config.constants import tx_csv, px_csv
+    return {'tx': os.path.join(repository, tx_csv), 'px': os.path.join(repository, px_csv)}
\ No newline at end of file
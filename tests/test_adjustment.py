@@ -0,0 +1,113 @@
+import pytest
+import numpy as np
+import pandas as pd
+from config.constants import tx_csv, px_csv, ca_csv, fx_csv
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+from src.Adjustment import Adjustment
+
+
+
+# Adjusted valuation (src/Adjustment.py) on a hand-computed case: SPY has a 2-for-1 split on 2020-01-06 (its prices and later trades are in post-split shares),
+# QQQ is listed in EUR, with a rate of 1.10 USD from 2020-01-02 and 1.20 USD from 2020-01-06
+# Both engines must give the expected positions (in shares held on each date) and values in USD, and mark_to_market the expected NAV
+# On the bundled files, the same events applied backwards to the csv files (a split, a ticker turned into EUR) must be undone by the adjustment
+
+
+
+@pytest.fixture
+def adjusted_files(tmp_path) -> dict[str, str]:
+    pd.DataFrame({'Date': ['2020-01-02', '2020-01-03', '2020-01-06', '2020-01-07'], 'SPY': [100.0, 102.0, 52.0, 53.0], 'QQQ': [50.0, 51.0, 52.0, 50.0]}).to_csv(tmp_path / px_csv, index=False)
+    pd.DataFrame({
+        'date': ['2020-01-02', '2020-01-03', '2020-01-06', '2020-01-07', '2020-01-07'],
+        'ticker': ['SPY', 'QQQ', 'SPY', 'SPY', 'QQQ'],
+        'qty': [10, 5, 4, 6, 2],
+        'order': ['BUY', 'BUY', 'BUY', 'SELL', 'SELL']
+    }).to_csv(tmp_path / tx_csv, index=False)
+    pd.DataFrame({'date': ['2020-01-06'], 'ticker': ['SPY'], 'factor': [2]}).to_csv(tmp_path / ca_csv, index=False)
+    pd.DataFrame({'Date': ['2020-01-02', '2020-01-06'], 'EUR': [1.10, 1.20]}).to_csv(tmp_path / fx_csv, index=False)
+    return {name: str(tmp_path / file_name) for name, file_name in [('tx', tx_csv), ('px', px_csv), ('ca_file', ca_csv), ('fx_file', fx_csv)]}
+
+
+
+def load(files: dict) -> tuple[Portfolio, Adjustment]:
+    portfolio = Portfolio(Transaction(files['tx'], use_cache=False).reconstruct_positions(), Price(files['px'], use_cache=False).unpivot())
+    adjustment = Adjustment.from_files(portfolio.get_all_dates(), portfolio.tickers, ca_file=files['ca_file'], fx_file=files['fx_file'], currencies={'QQQ': 'EUR'})
+    return portfolio, adjustment
+
+
+
+@pytest.mark.parametrize('engine', ['cartesian', 'asof'])
+def test_adjusted_values(adjusted_files, engine):
+    portfolio, adjustment = load(adjusted_files)
+    valued = portfolio.value_positions(engine, adjustment=adjustment).dataframe.reset_index(drop=True)
+
+    # SPY: 10 shares, 24 after the split and a buy of 4 (i.e 10 x 2 + 4), then 18. QQQ: 5 then 3, priced in EUR x rate of the date
+    expected = pd.DataFrame({
+        'date': ['2020-01-02', '2020-01-03', '2020-01-06', '2020-01-07', '2020-01-07'],
+        'ticker': ['SPY', 'QQQ', 'SPY', 'SPY', 'QQQ'],
+        'position': [10, 5, 24, 18, 3],
+        'price': [100.0, 51.0 * 1.10, 52.0, 53.0, 50.0 * 1.20]
+    })
+    assert valued[['date', 'ticker']].equals(expected[['date', 'ticker']])
+    np.testing.assert_allclose(valued['position'].to_numpy(dtype='float64'), expected['position'])
+    np.testing.assert_allclose(valued['price'].to_numpy(dtype='float64'), expected['price'], rtol=1e-12)
+    np.testing.assert_allclose(valued['value'].to_numpy(dtype='float64'), expected['position'] * expected['price'], rtol=1e-12)
+
+
+
+def test_adjusted_nav(adjusted_files):
+    portfolio, adjustment = load(adjusted_files)
+    portfolio.mark_to_market(adjustment)
+    expected_nav = [10 * 100.0, 10 * 102.0 + 5 * 51.0 * 1.10, 24 * 52.0 + 5 * 52.0 * 1.20, 18 * 53.0 + 3 * 50.0 * 1.20]
+    np.testing.assert_allclose(portfolio.nav, expected_nav, rtol=1e-12)
+
+
+
+def test_empty_adjustment_keeps_raw_values(adjusted_files):
+    portfolio, _ = load(adjusted_files)
+    raw = portfolio.value_positions().dataframe.copy()
+    adjusted = portfolio.value_positions(adjustment=Adjustment(portfolio.get_all_dates(), portfolio.tickers)).dataframe
+    pd.testing.assert_series_equal(adjusted['value'], raw['value'], check_dtype=False)
+
+
+
+def test_adjustment_undoes_adjusted_bundled_files(bundled_files, tmp_path):
+    transactions, prices = pd.read_csv(bundled_files['tx']), pd.read_csv(bundled_files['px'])
+    split_ticker, eur_ticker = prices.columns[1], prices.columns[2]
+    split_date = prices.loc[len(prices) // 2, 'Date']
+    fx = pd.DataFrame({'Date': prices['Date'], 'EUR': 1.1 + np.random.default_rng(0).normal(0, 0.05, len(prices))})
+
+    # Split: prices halved and traded quantities doubled from the split date. EUR listing: prices divided by the rate of their date
+    prices.loc[prices['Date'] >= split_date, split_ticker] /= 2
+    transactions.loc[(transactions['ticker'] == split_ticker) & (transactions['date'] >= split_date), 'qty'] *= 2
+    prices[eur_ticker] /= fx['EUR']
+    files = {name: str(tmp_path / file_name) for name, file_name in [('tx', tx_csv), ('px', px_csv), ('ca_file', ca_csv), ('fx_file', fx_csv)]}
+    transactions.to_csv(files['tx'], index=False)
+    prices.to_csv(files['px'], index=False)
+    pd.DataFrame({'date': [split_date], 'ticker': [split_ticker], 'factor': [2.0]}).to_csv(files['ca_file'], index=False)
+    fx.to_csv(files['fx_file'], index=False)
+
+    original = Portfolio(Transaction(bundled_files['tx'], use_cache=False).reconstruct_positions(), Price(bundled_files['px'], use_cache=False).unpivot())
+    portfolio = Portfolio(Transaction(files['tx'], use_cache=False).reconstruct_positions(), Price(files['px'], use_cache=False).unpivot())
+    adjustment = Adjustment.from_files(portfolio.get_all_dates(), portfolio.tickers, ca_file=files['ca_file'], fx_file=files['fx_file'], currencies={eur_ticker: 'EUR'})
+    for engine in ['cartesian', 'asof']:
+        expected = original.value_positions(engine).dataframe['value'].to_numpy(dtype='float64')
+        np.testing.assert_allclose(portfolio.value_positions(engine, adjustment=adjustment).dataframe['value'].to_numpy(dtype='float64'), expected, rtol=1e-9)
+    np.testing.assert_allclose(portfolio.mark_to_market(adjustment).nav, original.mark_to_market().nav, rtol=1e-9)
+
+
+
+def test_one_corporate_action_at_a_time_matches_full_rebuild():
+    rng = np.random.default_rng(1)
+    dates = list(pd.bdate_range('2020-01-01', periods=500).strftime('%Y-%m-%d'))
+    tickers = [f'T{i:02d}' for i in range(50)]
+    events = pd.DataFrame({'date': rng.choice(dates, 200), 'ticker': rng.choice(tickers, 200), 'factor': rng.choice([2.0, 3.0, 0.5, 1.01], 200)})
+
+    full = Adjustment(dates, tickers)
+    full.add_corporate_actions(events)
+    incremental = Adjustment(dates, tickers)
+    for event in events.itertuples(index=False):
+        incremental.add_corporate_action(event.date, event.ticker, event.factor)
+    np.testing.assert_allclose(incremental.share_factors, full.share_factors, rtol=1e-12)
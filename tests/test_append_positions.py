@@ -0,0 +1,126 @@
+import os
+import json
+import pytest
+import pandas as pd
+from config.constants import tx_csv, px_csv
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+
+
+
+# Portfolio.append_positions over cumulative runs: the bundled csv files are replayed in 4 steps, each one appending the rows of the next dates
+# The valued rows must be bit-identical to value_positions on the whole files, and a change to rows already processed must be detected
+
+
+
+def read_lines(file_name: str) -> tuple[bytes, list[bytes]]:
+    with open(file_name, 'rb') as source_file:
+        lines = source_file.readlines()
+    return lines[0], lines[1:]
+
+
+
+def write_until(lines: tuple[bytes, list[bytes]], path: str, last_date: str) -> None:
+    # Rows dated on or before last_date (both files are sorted by date, so each step appends bytes to the previous one)
+    header, rows = lines
+    with open(path, 'wb') as target_file:
+        target_file.write(header + b''.join(row for row in rows if row[:10].decode() <= last_date))
+
+
+
+def load_portfolio(folder: str) -> Portfolio:
+    return Portfolio(Transaction(os.path.join(folder, tx_csv), use_cache=False), Price(os.path.join(folder, px_csv), use_cache=False))
+
+
+
+@pytest.fixture
+def replay(bundled_files, tmp_path):
+    lines = {name: read_lines(path) for name, path in bundled_files.items()}
+    dates = sorted({row[:10].decode() for row in lines['px'][1]})
+    cutoffs = [dates[len(dates) * step // 4] for step in range(1, 4)] + [dates[-1]]
+
+    def run(last_date: str, full: bool = False) -> Portfolio:
+        write_until(lines['tx'], tmp_path / tx_csv, last_date)
+        write_until(lines['px'], tmp_path / px_csv, last_date)
+        return load_portfolio(tmp_path).append_positions(tmp_path / 'state', full=full)
+
+    return run, cutoffs, tmp_path
+
+
+
+def test_cumulative_runs_match_full_recompute(bundled_files, replay):
+    run, cutoffs, folder = replay
+    deltas = [run(last_date).dataframe for last_date in cutoffs[:-1]]
+    full = run(cutoffs[-1], full=True).dataframe
+
+    expected = Portfolio(Transaction(bundled_files['tx'], use_cache=False).reconstruct_positions(), Price(bundled_files['px'], use_cache=False).unpivot()).value_positions().dataframe
+    pd.testing.assert_frame_equal(full, expected.reset_index(drop=True), check_exact=True)
+
+    # Runs without full only return the rows they valued
+    pd.testing.assert_frame_equal(pd.concat(deltas, ignore_index=True), full.iloc[:sum(len(delta) for delta in deltas)], check_exact=True)
+
+    # The full load compacted the blocks appended by each run into one
+    with open(folder / 'state' / 'state.json') as state_file:
+        assert json.load(state_file)['store_blocks'] == 1
+    pd.testing.assert_frame_equal(run(cutoffs[-1], full=True).dataframe, full, check_exact=True)
+
+
+
+def test_run_without_new_rows(replay):
+    run, cutoffs, _ = replay
+    first = run(cutoffs[0]).dataframe
+    assert run(cutoffs[0]).dataframe.empty
+    pd.testing.assert_frame_equal(run(cutoffs[0], full=True).dataframe, first.reset_index(drop=True), check_exact=True)
+
+
+
+def test_edited_past_price_is_detected(replay):
+    run, cutoffs, folder = replay
+    run(cutoffs[0])
+
+    # Same number of rows, one past price changed
+    write_until(read_lines(folder / px_csv), folder / px_csv, cutoffs[0])
+    with open(folder / px_csv, 'rb') as price_file:
+        content = price_file.read()
+    first_comma = content.index(b',', content.index(b'\n'))
+    with open(folder / px_csv, 'wb') as price_file:
+        price_file.write(content[:first_comma + 1] + b'1' + content[first_comma + 1:])
+
+    with pytest.raises(ValueError, match='changed since last run'):
+        load_portfolio(folder).append_positions(folder / 'state')
+
+
+
+def test_backdated_transaction_is_detected(replay):
+    run, cutoffs, folder = replay
+    run(cutoffs[0])
+    run(cutoffs[1])
+
+    # A trade appended at the end of tx_csv, but dated before the last processed date
+    with open(folder / tx_csv, 'ab') as transaction_file:
+        transaction_file.write(f'{cutoffs[0]},SPY,10,BUY\n'.encode())
+
+    with pytest.raises(ValueError, match='changed since last run'):
+        load_portfolio(folder).append_positions(folder / 'state')
+
+
+
+def test_crash_during_compaction(bundled_files, replay, monkeypatch):
+    run, cutoffs, folder = replay
+    run(cutoffs[0])
+    run(cutoffs[1])
+
+    # Crash once the compacted store is written, before the state points to it: the state must still match its own store
+    def crash(*args, **kwargs):
+        raise OSError('crash')
+    with monkeypatch.context() as patch:
+        patch.setattr(Portfolio, 'write_state', staticmethod(crash))
+        with pytest.raises(OSError, match='crash'):
+            run(cutoffs[1], full=True)
+
+    run(cutoffs[2])
+    full = run(cutoffs[3], full=True).dataframe
+    expected = Portfolio(Transaction(bundled_files['tx'], use_cache=False).reconstruct_positions(), Price(bundled_files['px'], use_cache=False).unpivot()).value_positions().dataframe
+    pd.testing.assert_frame_equal(full, expected.reset_index(drop=True), check_exact=True)
+    assert [name for name in os.listdir(folder / 'state') if name.endswith('.pkl')] == ['valued-1.pkl']
@@ -0,0 +1,37 @@
+import os
+import shutil
+import pandas as pd
+from config.constants import tx_csv, px_csv, grouping_configs
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+from batch import value_accounts
+
+
+
+# Batch valuation must give each account the performances of a single-account run, without writing anything into the account folders
+
+
+
+def test_accounts_valued(bundled_files, tmp_path, monkeypatch):
+    # px_csv is read from the working directory
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(bundled_files['px'], tmp_path / px_csv)
+    transactions = pd.read_csv(bundled_files['tx'])
+    account_folders = []
+    for account, tickers in {'first': ['SPY', 'TLT'], 'second': ['IWM']}.items():
+        os.makedirs(tmp_path / 'accounts' / account)
+        transactions[transactions['ticker'].isin(tickers)].to_csv(tmp_path / 'accounts' / account / tx_csv, index=False)
+        account_folders.append(str(tmp_path / 'accounts' / account))
+
+    results = value_accounts(account_folders, str(tmp_path / 'output'), processes=2)
+    assert sorted(result['account'] for result in results) == account_folders
+
+    price = Price(bundled_files['px'], use_cache=False).unpivot()
+    for account_folder in account_folders:
+        assert os.listdir(account_folder) == [tx_csv]
+        transaction = Transaction(os.path.join(account_folder, tx_csv), use_cache=False).reconstruct_positions()
+        expected = Portfolio(transaction, price).value_positions('asof').calculate_performances(grouping_configs)
+        for suffix, performance in expected.items():
+            result = pd.read_csv(tmp_path / 'output' / os.path.basename(account_folder) / f'{suffix}.csv', index_col=0)
+            pd.testing.assert_frame_equal(result, performance, check_dtype=False)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import os
+import pytest
+import pandas as pd
+from lib.cache import read_csv_cached, is_cache_fresh, is_columnar_cache_available, is_cache_validated, mark_cache_validated, get_key
+
+
+
+# The parquet cache of read_csv_cached is only an accelerator: a cache folder which cannot be written must not fail the read
+# A validated cache is only trusted by the schemas it was validated against
+
+
+
+pytestmark = pytest.mark.skipif(not is_columnar_cache_available(), reason='pyarrow is not installed')
+
+
+
+@pytest.fixture
+def csv_file(tmp_path) -> str:
+    path = tmp_path / 'prices.csv'
+    pd.DataFrame({'Date': ['2020-01-01', '2020-01-02'], 'SPY': [1.5, 2.5]}).to_csv(path, index=False)
+    return str(path)
+
+
+
+def test_cache_written_then_read(csv_file):
+    expected = pd.read_csv(csv_file)
+    pd.testing.assert_frame_equal(read_csv_cached(csv_file), expected)
+    assert is_cache_fresh(csv_file)
+    pd.testing.assert_frame_equal(read_csv_cached(csv_file, usecols=['SPY']), expected[['SPY']])
+
+
+
+def test_cache_folder_existing_as_a_file(csv_file, tmp_path):
+    (tmp_path / '.cache').write_text('not a folder')
+    pd.testing.assert_frame_equal(read_csv_cached(csv_file), pd.read_csv(csv_file))
+    assert not is_cache_fresh(csv_file)
+
+
+
+def test_read_only_folder(csv_file, monkeypatch):
+    # Same error as os.makedirs in a read-only folder (a chmod would not be enforced when the tests run as root)
+    def makedirs(*args, **kwargs):
+        raise PermissionError(13, 'Permission denied')
+    monkeypatch.setattr(os, 'makedirs', makedirs)
+    pd.testing.assert_frame_equal(read_csv_cached(csv_file), pd.read_csv(csv_file))
+    assert not is_cache_fresh(csv_file)
+
+
+
+def test_validation_is_bound_to_the_schema(csv_file):
+    schema, changed_schema = {'SPY': {'min': 0}}, {'SPY': {'min': 1}}
+    read_csv_cached(csv_file)
+    assert not is_cache_validated(csv_file, get_key(schema))
+    mark_cache_validated(csv_file, get_key(schema))
+    assert is_cache_validated(csv_file, get_key(schema))
+    assert not is_cache_validated(csv_file, get_key(changed_schema))
@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+import subprocess
+from conftest import repository
+
+
+
+# render_charts under profiling: the trace saved at exit must hold the records of the parent process and of the chart workers,
+# with worker stages starting within render_charts (i.e measured from the parent's origin), and reports must be written once
+
+
+
+script = '''
+import pandas as pd
+from config.constants import grouping_configs
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+from lib.profiling import stage
+from lib.charts import render_charts
+
+if __name__ == '__main__':
+    with stage('parent'):
+        portfolio = Portfolio(Transaction({tx!r}, use_cache=False).reconstruct_positions(), Price({px!r}, use_cache=False).unpivot())
+        performances = portfolio.value_positions().calculate_performances(grouping_configs)
+    render_charts([
+        {{'function': 'evolution', 'df': performances['yearly'], 'start': 2005, 'end': 2010, 'unit': 'USD', 'save_path': {evolution!r}}},
+        {{'function': 'composition', 'df': performances['yearly'], 'date': 2005, 'save_path': {composition!r}}}
+    ], processes=2)
+'''
+
+
+
+def test_worker_records_reach_the_parent_trace(bundled_files, tmp_path):
+    trace_path = os.path.join(tmp_path, 'trace.json')
+    code = script.format(tx=bundled_files['tx'], px=bundled_files['px'], evolution=str(tmp_path / 'evolution.png'), composition=str(tmp_path / 'composition.png'))
+    environment = {**os.environ, 'ETF_PROFILE': '1', 'ETF_PROFILE_TRACE': trace_path, 'PYTHONPATH': repository}
+    output = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=environment, check=True, capture_output=True, text=True).stdout
+    assert output.count('Profiling trace saved') == 1
+
+    with open(trace_path) as trace_file:
+        records = {record['stage']: record for record in json.load(trace_file)}
+    assert {'parent', 'render_charts', 'evolution', 'composition'} <= set(records)
+    charts = records['render_charts']
+    for name in ['evolution', 'composition']:
+        assert records[name]['depth'] == charts['depth'] + 1
+        assert charts['start_s'] <= records[name]['start_s'] <= charts['start_s'] + charts['wall_s']
\ No newline at end of file
@@ -0,0 +1,27 @@
+import pytest
+import pandas as pd
+from config.constants import grouping_configs
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+
+
+
+# Compact dtypes (see File.compact_columns) only change how columns are stored: aggregated outputs must be identical to the ones of csv dtypes, for both valuation engines
+
+
+
+def get_performances(bundled_files: dict, compact: bool, engine: str) -> dict[str, pd.DataFrame]:
+    transaction = Transaction(bundled_files['tx'], use_cache=False, compact=compact).reconstruct_positions()
+    price = Price(bundled_files['px'], use_cache=False, compact=compact).unpivot()
+    return Portfolio(transaction, price).value_positions(engine).calculate_performances(grouping_configs)
+
+
+
+@pytest.mark.parametrize('engine', ['cartesian', 'asof'])
+def test_compact_performances_match_default(bundled_files, engine):
+    expected = get_performances(bundled_files, False, engine)
+    result = get_performances(bundled_files, True, engine)
+    assert result.keys() == expected.keys()
+    for suffix in expected:
+        pd.testing.assert_frame_equal(result[suffix], expected[suffix], check_exact=True)
\ No newline at end of file
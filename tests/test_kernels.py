@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+from lib.kernels import signed_cumsum, forward_fill, get_codes
+
+
+
+# Per-ticker kernels (lib/kernels.py, Numba or NumPy) must give the same results as the pandas groupby path, on random rows and through the pipeline
+
+
+
+def get_random_rows(n_rows: int = 100_000, n_tickers: int = 50, seed: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Rows already sorted by date (kernels and groupby keep the row order)
+    rng = np.random.default_rng(seed)
+    tickers = rng.integers(0, n_tickers, n_rows)
+    quantities = rng.integers(1, 1000, n_rows)
+    is_buy = rng.random(n_rows) < 0.6
+    prices = np.where(rng.random(n_rows) < 0.5, rng.uniform(10, 500, n_rows), np.nan)
+    return tickers, quantities, is_buy, prices
+
+
+
+def test_signed_cumsum_matches_groupby():
+    tickers, quantities, is_buy, _ = get_random_rows()
+    expected = pd.Series(np.where(is_buy, quantities, -quantities)).groupby(tickers).cumsum().to_numpy()
+    np.testing.assert_array_equal(signed_cumsum(get_codes(tickers), quantities, is_buy), expected)
+
+
+
+def test_forward_fill_matches_groupby():
+    tickers, _, _, prices = get_random_rows()
+    expected = pd.Series(prices).groupby(tickers).ffill().to_numpy()
+    np.testing.assert_array_equal(forward_fill(get_codes(tickers), prices), expected)
+
+
+
+def test_pipeline_matches_groupby(bundled_files):
+    price = Price(bundled_files['px'], use_cache=False).unpivot()
+    transaction = Transaction(bundled_files['tx'], use_cache=False).reconstruct_positions(kernel=False)
+    kernel_transaction = Transaction(bundled_files['tx'], use_cache=False).reconstruct_positions(kernel=True)
+    pd.testing.assert_frame_equal(kernel_transaction.dataframe, transaction.dataframe, check_exact=True)
+
+    valued = Portfolio(transaction, price).value_positions(kernel=False).dataframe
+    kernel_valued = Portfolio(kernel_transaction, price).value_positions(kernel=True).dataframe
+    pd.testing.assert_frame_equal(kernel_valued, valued, check_exact=True)
\ No newline at end of file
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from config.constants import tx_csv, px_csv
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+
+
+
+# A lazy Price (Price.for_transactions: the account tickers only, from its first to its last date) must value an account as the full Price does,
+# from the csv and from its parquet cache. The account tickers have no price on the first days of the range: their values rely on the price carried over from before it
+
+
+
+@pytest.fixture
+def account_files(bundled_files, tmp_path) -> dict[str, str]:
+    transactions, prices = pd.read_csv(bundled_files['tx']), pd.read_csv(bundled_files['px'])
+    tickers = ['XLU', 'TLT']
+    account = transactions[transactions['ticker'].isin(tickers) & (transactions['date'] >= '2015-01-01') & (transactions['date'] <= '2015-12-31')]
+    prices.loc[(prices['Date'] >= '2014-12-01') & (prices['Date'] <= account['date'].min()), tickers] = np.nan
+    account.to_csv(tmp_path / tx_csv, index=False)
+    prices.to_csv(tmp_path / px_csv, index=False)
+    return {'tx': str(tmp_path / tx_csv), 'px': str(tmp_path / px_csv)}
+
+
+
+@pytest.mark.parametrize('use_cache', [False, True])
+@pytest.mark.parametrize('engine', ['cartesian', 'asof'])
+def test_lazy_matches_full(account_files, use_cache, engine):
+    transaction = Transaction(account_files['tx'], use_cache=False).reconstruct_positions()
+    # A first load writes the parquet cache (with use_cache), which the loads below read
+    Price(account_files['px'], use_cache=use_cache)
+    full_price = Price(account_files['px'], use_cache=use_cache).unpivot()
+    lazy_price = Price.for_transactions(account_files['px'], transaction, use_cache=use_cache).unpivot()
+    assert lazy_price.tickers == ['XLU', 'TLT'] and lazy_price.rows < full_price.rows
+
+    columns = ['date', 'ticker', 'position', 'price', 'value']
+    expected = Portfolio(transaction, full_price).value_positions(engine).dataframe.reset_index(drop=True)[columns]
+    result = Portfolio(transaction, lazy_price).value_positions(engine).dataframe.reset_index(drop=True)[columns]
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+    assert result['price'].notna().all()
\ No newline at end of file
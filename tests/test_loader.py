@@ -0,0 +1,71 @@
+import threading
+import tracemalloc
+import pandas as pd
+import pytest
+from src.Transaction import Transaction
+from src.Price import Price
+from lib.loader import Loader
+from lib import profiling
+
+
+
+# Sources loaded concurrently (lib/loader.py) must be the ones loaded one after the other, and the progress lines must count every submitted task
+
+
+
+def load_transaction(tx_path: str) -> Transaction:
+    return Transaction(tx_path, use_cache=False).reconstruct_positions()
+
+
+
+def load_price(px_path: str) -> Price:
+    return Price(px_path, use_cache=False).unpivot()
+
+
+
+def test_concurrent_matches_sequential(bundled_files):
+    with Loader(report=lambda message: None) as loader:
+        loader.submit('transactions', load_transaction, bundled_files['tx'])
+        loader.submit('prices', load_price, bundled_files['px'])
+
+    pd.testing.assert_frame_equal(loader.result('transactions').dataframe, load_transaction(bundled_files['tx']).dataframe, check_exact=True)
+    pd.testing.assert_frame_equal(loader.result('prices').unpivot_dataframe, load_price(bundled_files['px']).unpivot_dataframe, check_exact=True)
+
+
+
+def test_progress_total_counts_every_task():
+    messages = []
+    with Loader(report=messages.append) as loader:
+        loader.submit('first', lambda: 1).result()
+        # The first task is done before the second one is submitted: its line waits for the total
+        assert messages == []
+        loader.submit('second', lambda: 2)
+    assert [message.split(' loaded')[0] for message in messages[:2]] == ['[1/2] first', '[2/2] second']
+    assert loader.results() == {'first': 1, 'second': 2}
+    with pytest.raises(ValueError):
+        loader.submit('third', lambda: 3)
+
+
+
+def test_overlapping_stages_have_no_peak(monkeypatch, request):
+    if not tracemalloc.is_tracing():
+        request.addfinalizer(tracemalloc.stop)
+    monkeypatch.setattr(profiling, 'is_enabled', True)
+    monkeypatch.setattr(profiling, 'is_memory_enabled', True)
+    monkeypatch.setattr(profiling, 'records', [])
+    both_running = threading.Barrier(2)
+
+    def allocate(size: int) -> int:
+        with profiling.stage(f'allocate {size}'):
+            both_running.wait()
+            return len(bytearray(size))
+
+    with Loader(report=lambda message: None) as loader:
+        loader.submit('small', allocate, 2**10)
+        loader.submit('large', allocate, 2**24)
+    with profiling.stage('alone'):
+        bytearray(2**20)
+
+    peaks = {record['stage']: record['peak_mib'] for record in profiling.records}
+    assert peaks['allocate 1024'] is None and peaks['allocate 16777216'] is None and peaks['load small'] is None
+    assert peaks['alone'] >= 1
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+import time
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from lib.cache import memoize, get_key, get_file_key, evict_results
+
+
+
+# A memoized stage (lib.cache.memoize) is only computed again when the key of its inputs changes (content of the source file, parameters such as compact_dtypes)
+# Least recently used results are evicted once the folder exceeds max_bytes, including when stages store their results concurrently (see eviction_lock)
+
+
+
+@pytest.fixture
+def source_file(tmp_path) -> str:
+    path = tmp_path / 'tx_etf.csv'
+    path.write_text('date,ticker,qty,order\n2020-01-02,SPY,10,BUY\n')
+    return str(path)
+
+
+
+class Counter:
+
+    # compute() of memoize, counting its calls
+    def __init__(self, result: object = None):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self) -> object:
+        self.calls += 1
+        return self.result
+
+
+
+def test_hit(tmp_path, source_file):
+    compute = Counter(np.arange(10))
+    key = get_key(get_file_key(source_file), False)
+    first = memoize('stage', key, compute, cache_directory=str(tmp_path / 'results'))
+    second = memoize('stage', key, compute, cache_directory=str(tmp_path / 'results'))
+    assert compute.calls == 1
+    np.testing.assert_array_equal(second, first)
+
+
+
+def test_miss_after_input_change(tmp_path, source_file):
+    compute, cache_directory = Counter(1), str(tmp_path / 'results')
+    memoize('stage', get_key(get_file_key(source_file), False), compute, cache_directory=cache_directory)
+
+    # Same content under another name: same key
+    copy = str(tmp_path / 'copy.csv')
+    shutil.copy(source_file, copy)
+    memoize('stage', get_key(get_file_key(copy), False), compute, cache_directory=cache_directory)
+    assert compute.calls == 1
+
+    # Another parameter, then another content: new keys
+    memoize('stage', get_key(get_file_key(source_file), True), compute, cache_directory=cache_directory)
+    assert compute.calls == 2
+    with open(source_file, 'a') as file:
+        file.write('2020-01-03,SPY,5,SELL\n')
+    memoize('stage', get_key(get_file_key(source_file), False), compute, cache_directory=cache_directory)
+    assert compute.calls == 3
+
+
+
+def test_least_recently_used_evicted(tmp_path):
+    cache_directory = str(tmp_path / 'results')
+    results = {name: Counter(np.zeros(1000)) for name in ['a', 'b', 'c']}
+    memoize('stage', get_key('a'), results['a'], cache_directory=cache_directory)
+    size = os.path.getsize(os.path.join(cache_directory, os.listdir(cache_directory)[0]))
+    memoize('stage', get_key('b'), results['b'], cache_directory=cache_directory)
+
+    # a is older than b, but its hit makes it the most recently used one: b is evicted to store c
+    paths = {name: os.path.join(cache_directory, f'stage_{get_key(name)[:32]}.pkl') for name in results}
+    os.utime(paths['a'], ns=(1, 1))
+    os.utime(paths['b'], ns=(2, 2))
+    memoize('stage', get_key('a'), results['a'], cache_directory=cache_directory, max_bytes=2 * size)
+    memoize('stage', get_key('c'), results['c'], cache_directory=cache_directory, max_bytes=2 * size)
+    assert sorted(os.listdir(cache_directory)) == sorted(os.path.basename(paths[name]) for name in ['a', 'c'])
+
+    # A result larger than max_bytes is kept until the next one is stored
+    memoize('stage', get_key('b'), results['b'], cache_directory=cache_directory, max_bytes=size // 2)
+    assert os.listdir(cache_directory) == [os.path.basename(paths['b'])]
+    assert [results[name].calls for name in ['a', 'b', 'c']] == [1, 2, 1]
+
+
+
+def test_concurrent_evictions(tmp_path, monkeypatch):
+    # Every stage evicts the others: without eviction_lock, two of them could remove the same file (FileNotFoundError)
+    # A slow removal lets the other threads list the folder meanwhile
+    remove = os.remove
+    def slow_remove(path):
+        time.sleep(0.001)
+        remove(path)
+    monkeypatch.setattr(os, 'remove', slow_remove)
+    cache_directory = str(tmp_path / 'results')
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(memoize, 'stage', get_key(i), Counter(np.full(1000, i)), cache_directory, 1) for i in range(64)]
+        results = [future.result() for future in futures]
+    assert all((result == i).all() for i, result in enumerate(results))
+    evict_results(1, cache_directory)
+    assert os.listdir(cache_directory) == []
\ No newline at end of file
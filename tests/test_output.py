@@ -0,0 +1,49 @@
+import os
+import pytest
+import pandas as pd
+from lib.output import write_parquet
+from lib.cache import is_columnar_cache_available
+
+
+
+# Partitioned parquet outputs (lib/output.py) are swapped in whole: a new version replaces the previous one (a folder or a single file) without leftovers
+
+
+
+pytestmark = pytest.mark.skipif(not is_columnar_cache_available(), reason='pyarrow is not installed')
+
+
+
+def get_dataframe(years: list[int]) -> pd.DataFrame:
+    return pd.DataFrame({'year': [year for year in years for _ in range(2)], 'ticker': ['SPY', 'QQQ'] * len(years), 'value': [float(i) for i in range(2 * len(years))]})
+
+
+
+def read_back(path: str) -> pd.DataFrame:
+    # 'year' comes back from the folder names, as the last column with a categorical dtype
+    dataframe = pd.read_parquet(path)
+    assert isinstance(dataframe['year'].dtype, pd.CategoricalDtype) and dataframe.columns[-1] == 'year'
+    dataframe['year'] = dataframe['year'].astype('int64')
+    return dataframe[['year', 'ticker', 'value']]
+
+
+
+def test_new_version_replaces_previous_one(tmp_path):
+    path = os.path.join(tmp_path, 'yearly')
+    write_parquet(get_dataframe([2005, 2006, 2007]), path)
+    expected = get_dataframe([2006, 2007])
+    written = write_parquet(expected, path)
+
+    pd.testing.assert_frame_equal(read_back(written), expected)
+    assert sorted(os.listdir(written)) == ['year=2006', 'year=2007']
+    assert os.listdir(tmp_path) == ['yearly.parquet']
+
+
+
+def test_previous_single_file_is_replaced(tmp_path):
+    path = os.path.join(tmp_path, 'yearly')
+    write_parquet(get_dataframe([2005]).drop(columns='year'), path)
+    assert os.path.isfile(f'{path}.parquet')
+    expected = get_dataframe([2005, 2006])
+    pd.testing.assert_frame_equal(read_back(write_parquet(expected, path)), expected)
+    assert os.listdir(tmp_path) == ['yearly.parquet']
\ No newline at end of file
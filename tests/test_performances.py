@@ -0,0 +1,44 @@
+import pandas as pd
+from config.constants import grouping_configs
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+
+
+
+# Single-pass aggregation (calculate_performances) vs the previous main.py path: one calculate_performance call per grouping config,
+# on year and month columns added to the valued dataframe, then results merged by suffix. Sums and standard deviations are computed in another order
+
+
+
+def get_previous_performances(portfolio: Portfolio) -> dict[str, pd.DataFrame]:
+    previous = Portfolio(portfolio.transaction, portfolio.price)
+    previous.dataframe = portfolio.dataframe.copy()
+    previous.dataframe['date'] = pd.to_datetime(previous.dataframe['date'], format='%Y-%m-%d')
+    previous.dataframe['year'] = previous.dataframe['date'].dt.year
+    previous.dataframe['month'] = previous.dataframe['date'].dt.month
+
+    results = {'yearly': [], 'monthly': []}
+    for config in grouping_configs:
+        result = previous.calculate_performance(config['columns'], config['agg'], config['suffix'])
+        if config['suffix'] == 'monthly':
+            result['year_month'] = result['year'] * 100 + result['month']
+        results[config['suffix']].append(result)
+
+    performances = {}
+    for suffix, on in [('yearly', ['year']), ('monthly', ['year', 'month', 'year_month'])]:
+        performances[suffix] = results[suffix][0]
+        for result in results[suffix][1:]:
+            performances[suffix] = pd.merge(performances[suffix], result, how='left', on=on)
+    return performances
+
+
+
+def test_single_pass_matches_previous_path(bundled_files):
+    portfolio = Portfolio(Transaction(bundled_files['tx'], use_cache=False).reconstruct_positions(), Price(bundled_files['px'], use_cache=False).unpivot()).value_positions()
+    expected = get_previous_performances(portfolio)
+    result = portfolio.calculate_performances(grouping_configs)
+    assert result.keys() == expected.keys()
+    for suffix in expected:
+        # Period columns are int32 in the previous path (.dt.year and .dt.month), int64 here: values are compared, not dtypes
+        pd.testing.assert_frame_equal(result[suffix], expected[suffix], check_exact=False, rtol=1e-12, check_dtype=False)
\ No newline at end of file
@@ -0,0 +1,100 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+from config.constants import grouping_configs
+from src.Transaction import Transaction
+from src.Price import Price
+from src.PriceIndex import PriceIndex
+from src.Portfolio import Portfolio
+from src.Adjustment import Adjustment
+from src.Scenario import Scenario
+
+
+
+# Unshocked scenarios must give the values of the pipeline: periods ones of calculate_performances, current one of the last NAV of mark_to_market,
+# with or without an adjustment (here, one split and one ticker listed in EUR). Shocked ones must give the values of shocked prices run through calculate_performances
+
+
+
+def load_portfolio(bundled_files: dict) -> Portfolio:
+    return Portfolio(Transaction(bundled_files['tx'], use_cache=False).reconstruct_positions(), Price(bundled_files['px'], use_cache=False).unpivot())
+
+
+
+def get_adjustment(portfolio: Portfolio) -> Adjustment:
+    dates = portfolio.get_all_dates()
+    adjustment = Adjustment(dates, portfolio.tickers)
+    adjustment.add_corporate_action(dates[len(dates) // 2], portfolio.tickers[0], 2.0)
+    fx = pd.DataFrame({'Date': dates, 'EUR': 1.1 + np.random.default_rng(0).normal(0, 0.05, len(dates))})
+    adjustment.set_fx_rates(fx, {portfolio.tickers[1]: 'EUR'})
+    return adjustment
+
+
+
+@pytest.mark.parametrize('is_adjusted', [False, True])
+def test_unshocked_values(bundled_files, is_adjusted):
+    portfolio = load_portfolio(bundled_files)
+    adjustment = get_adjustment(portfolio) if is_adjusted else None
+    portfolio.value_positions(adjustment=adjustment)
+    portfolio.mark_to_market(adjustment)
+    unshocked = Scenario(portfolio, adjustment).revalue(np.ones((1, len(portfolio.tickers))))
+
+    yearly = portfolio.calculate_performances(grouping_configs)['yearly'].drop_duplicates('year')['portfolio_yearly_value'].to_numpy()
+    np.testing.assert_allclose(unshocked['yearly'].iloc[0].to_numpy(), yearly, rtol=1e-12)
+    np.testing.assert_allclose(unshocked['current']['portfolio'].iloc[0], portfolio.nav[-1], rtol=1e-12)
+
+
+
+def revalue_naive(portfolio: Portfolio, multipliers: np.ndarray) -> dict[str, np.ndarray]:
+    # One scenario at a time: shocked prices in a copy of the valued dataframe, then calculate_performances
+    shocked = Portfolio(portfolio.transaction, portfolio.price)
+    shocked.dataframe = portfolio.dataframe.copy()
+    shocked.dataframe['price'] *= multipliers[portfolio.get_ticker_codes(shocked.dataframe['ticker'])]
+    shocked.dataframe['value'] = shocked.dataframe['position'] * shocked.dataframe['price']
+    performances = shocked.calculate_performances(grouping_configs)
+    return {suffix: performances[suffix].drop_duplicates(period)[f'portfolio_{suffix}_value'].to_numpy() for suffix, period in [('monthly', 'year_month'), ('yearly', 'year')]}
+
+
+
+def test_shocked_values(bundled_files):
+    portfolio = load_portfolio(bundled_files)
+    portfolio.value_positions()
+    portfolio.mark_to_market()
+    scenarios = np.random.default_rng(0).lognormal(0, 0.2, (3, len(portfolio.tickers)))
+    # Blocks of 2 scenarios: the last block is a partial one
+    revalued = Scenario(portfolio).revalue(scenarios, block_size=2)
+
+    for i, multipliers in enumerate(scenarios):
+        for suffix, values in revalue_naive(portfolio, multipliers).items():
+            np.testing.assert_allclose(revalued[suffix].iloc[i].to_numpy(), values, rtol=1e-9)
+        np.testing.assert_allclose(revalued['current']['portfolio'].iloc[i], np.nansum(portfolio.exposure_matrix[-1] * multipliers), rtol=1e-12)
+
+
+
+def test_matrices_must_match(bundled_files):
+    portfolio = load_portfolio(bundled_files)
+    portfolio.value_positions()
+    with pytest.raises(ValueError, match='mark_to_market'):
+        Scenario(portfolio)
+    portfolio.mark_to_market()
+    with pytest.raises(ValueError, match='another adjustment'):
+        Scenario(portfolio, get_adjustment(portfolio))
+
+
+
+def test_historical_horizon(bundled_files):
+    prices = Price(bundled_files['px'], use_cache=False).dataframe
+    assert len(Scenario.get_historical_scenarios(prices, horizon=1)) == len(prices) - 1
+    with pytest.raises(ValueError, match='horizon'):
+        Scenario.get_historical_scenarios(prices, horizon=0)
+
+
+
+def test_price_index_raises(bundled_files, tmp_path):
+    portfolio = load_portfolio(bundled_files)
+    portfolio.value_positions()
+    PriceIndex.save(portfolio.price, os.path.join(tmp_path, 'price_index'))
+    portfolio.price = PriceIndex(os.path.join(tmp_path, 'price_index'))
+    with pytest.raises(ValueError, match='PriceIndex'):
+        Scenario(portfolio)
\ No newline at end of file
@@ -0,0 +1,64 @@
+import pytest
+import pandas as pd
+from config.constants import grouping_configs
+from src.Transaction import Transaction
+from src.TransactionStream import TransactionStream
+from src.Price import Price
+from src.Portfolio import Portfolio
+
+
+
+# Streaming ingestion (TransactionStream, Portfolio.value_positions_stream) must give the same performances as the in-memory path,
+# whether tx_etf.csv is read by small chunks or as date-partitioned files
+
+
+
+def get_streamed_performances(transaction_stream: TransactionStream, price_file: str) -> dict[str, pd.DataFrame]:
+    portfolio = Portfolio(transaction_stream, Price(price_file, use_cache=False))
+    return portfolio.calculate_performances(grouping_configs, portfolio.value_positions_stream())
+
+
+
+def write_partitions(transaction_file: str, folder) -> list[str]:
+    # One file per year, in date order
+    transactions = pd.read_csv(transaction_file)
+    paths = []
+    for year, partition in transactions.groupby(transactions['date'].str[:4], sort=True):
+        paths.append(str(folder / f'tx_{year}.csv'))
+        partition.to_csv(paths[-1], index=False)
+    return paths
+
+
+
+@pytest.fixture
+def expected_performances(bundled_files) -> dict[str, pd.DataFrame]:
+    portfolio = Portfolio(Transaction(bundled_files['tx'], use_cache=False).reconstruct_positions(), Price(bundled_files['px'], use_cache=False).unpivot())
+    return portfolio.value_positions().calculate_performances(grouping_configs)
+
+
+
+def assert_performances_equal(result: dict[str, pd.DataFrame], expected: dict[str, pd.DataFrame]) -> None:
+    # Sums are accumulated chunk by chunk, so they may differ from the in-memory ones in the last bits
+    assert result.keys() == expected.keys()
+    for suffix in expected:
+        pd.testing.assert_frame_equal(result[suffix], expected[suffix], check_exact=False, rtol=1e-12)
+
+
+
+@pytest.mark.parametrize('chunksize', [500, 1337])
+def test_small_chunks_match_in_memory(bundled_files, expected_performances, chunksize):
+    stream = TransactionStream(bundled_files['tx'], chunksize=chunksize)
+    assert_performances_equal(get_streamed_performances(stream, bundled_files['px']), expected_performances)
+
+
+
+def test_partitioned_files_match_in_memory(bundled_files, expected_performances, tmp_path):
+    stream = TransactionStream(write_partitions(bundled_files['tx'], tmp_path), chunksize=700)
+    assert_performances_equal(get_streamed_performances(stream, bundled_files['px']), expected_performances)
+
+
+
+def test_out_of_order_chunk_raises(bundled_files, tmp_path):
+    stream = TransactionStream(write_partitions(bundled_files['tx'], tmp_path)[::-1], chunksize=700)
+    with pytest.raises(ValueError, match='sorted by ascending date'):
+        get_streamed_performances(stream, bundled_files['px'])
\ No newline at end of file
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from config.constants import tx_csv, tx_schema, px_schema
+from lib.utils import validate, check_schema
+from src.Transaction import Transaction
+
+
+
+# Schema validation (lib.utils.validate) must report every violation with its row label, evaluate rules on values on sampled rows only in 'sample' mode,
+# and not be run at all in 'skip' mode
+
+
+
+def get_transactions() -> pd.DataFrame:
+    # Index labels differ from row positions, so that reported rows are labels
+    return pd.DataFrame({
+        'date': ['2020-01-02', '2020-01-02', '2020-01-03', '2020-01-06'],
+        'ticker': ['SPY', 'SPYY', 'IWM', 'QQ'],
+        'qty': [10, -5, 20, 30],
+        'order': ['BUY', 'SELL', 'HOLD', 'SELL']
+    }, index=[10, 11, 12, 13])
+
+
+
+def get_violations(violations: pd.DataFrame) -> set[tuple]:
+    return set(violations.itertuples(index=False, name=None))
+
+
+
+def test_every_violation_reported():
+    violations = validate(get_transactions(), tx_schema)
+    assert get_violations(violations) == {(11, 'ticker', 'length', 'SPYY'), (13, 'ticker', 'length', 'QQ'), (11, 'qty', 'min', -5), (12, 'order', 'values', 'HOLD')}
+    assert validate(get_transactions().drop(index=[11, 12, 13]), tx_schema).empty
+
+
+
+def test_column_violations_reported():
+    # Missing required column, and wrong dtype: the rules on values of that column are not evaluated
+    transactions = get_transactions().drop(columns=['order'])
+    transactions['qty'] = transactions['qty'].astype('float64')
+    assert get_violations(validate(transactions, tx_schema)) == {(None, 'order', 'required', None), (None, 'qty', 'dtype', 'float64'), (11, 'ticker', 'length', 'SPYY'), (13, 'ticker', 'length', 'QQ')}
+
+
+
+def test_wide_block_violations_reported():
+    # Every ticker column of px_csv shares the '*' rules: they are evaluated as one block
+    prices = pd.DataFrame({'Date': ['2020-01-02', '2020-01-03'], 'SPY': [1.0, -2.0], 'IWM': [-3.0, 4.0], 'QQQ': [5, 6]})
+    assert get_violations(validate(prices, px_schema)) == {(1, 'SPY', 'min', -2.0), (0, 'IWM', 'min', -3.0), (None, 'QQQ', 'dtype', 'int64')}
+
+
+
+def test_sampled_rows_only():
+    # Every row breaks the min rule: only the sampled rows are reported, while column-level rules are still checked
+    transactions = pd.DataFrame({'date': '2020-01-02', 'ticker': 'SPY', 'qty': -np.arange(1, 101)}, index=np.arange(100, 200))
+    violations = validate(transactions, tx_schema, sample_size=10)
+    sampled = violations[violations['rule'] == 'min']
+    assert len(sampled) == 10 and sampled['row'].is_unique and sampled['row'].isin(transactions.index).all()
+    assert get_violations(violations[violations['rule'] == 'required']) == {(None, 'order', 'required', None)}
+    # A sample at least as large as the dataframe is the full validation
+    assert len(validate(transactions, tx_schema, sample_size=1000)) == 101
+
+
+
+def test_check_schema_modes(tmp_path):
+    check_schema(get_transactions(), tx_schema, 'skip')
+    with pytest.raises(ValueError, match='4 violations'):
+        check_schema(get_transactions(), tx_schema, 'full')
+    with pytest.raises(ValueError, match='mode parameter'):
+        check_schema(get_transactions(), tx_schema, 'partial')
+
+    # A file breaking the rules is loaded as is with validation='skip'
+    file_name = str(tmp_path / tx_csv)
+    get_transactions().to_csv(file_name, index=False)
+    assert Transaction(file_name, use_cache=False, validation='skip').rows == 4
+    with pytest.raises(ValueError, match='violations'):
+        Transaction(file_name, use_cache=False, validation='full')
\ No newline at end of file
@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+import pandas as pd
+from config.constants import tx_csv, px_csv
+from src.Transaction import Transaction
+from src.Price import Price
+from src.Portfolio import Portfolio
+
+
+
+# The as-of engine (value_positions('asof')) must value positions as the cartesian one: same rows, positions, prices and values,
+# including transactions dated before the first price of their ticker, on dates without a price row, or on a date whose price is missing
+
+
+
+@pytest.fixture
+def small_files(tmp_path) -> dict[str, str]:
+    pd.DataFrame({
+        'Date': ['2020-01-02', '2020-01-03', '2020-01-06', '2020-01-08'],
+        'SPY': [100.0, 101.5, np.nan, 103.25],
+        'QQQ': [np.nan, 200.0, 202.5, 199.0],
+        'TLT': [50.0, 50.5, 51.0, 51.5]
+    }).to_csv(tmp_path / px_csv, index=False)
+    pd.DataFrame({
+        'date': ['2020-01-01', '2020-01-02', '2020-01-02', '2020-01-04', '2020-01-06', '2020-01-07', '2020-01-08', '2020-01-09'],
+        'ticker': ['SPY', 'QQQ', 'SPY', 'TLT', 'SPY', 'QQQ', 'SPY', 'TLT'],
+        'qty': [10, 5, 3, 7, 4, 2, 1, 7],
+        'order': ['BUY', 'BUY', 'BUY', 'BUY', 'SELL', 'SELL', 'BUY', 'SELL']
+    }).to_csv(tmp_path / tx_csv, index=False)
+    return {'tx': str(tmp_path / tx_csv), 'px': str(tmp_path / px_csv)}
+
+
+
+def get_valued(files: dict, engine: str) -> pd.DataFrame:
+    portfolio = Portfolio(Transaction(files['tx'], use_cache=False).reconstruct_positions(), Price(files['px'], use_cache=False).unpivot())
+    return portfolio.value_positions(engine).dataframe.reset_index(drop=True)[['date', 'ticker', 'position', 'price', 'value']]
+
+
+
+def assert_engines_equal(files: dict) -> pd.DataFrame:
+    cartesian, asof = get_valued(files, 'cartesian'), get_valued(files, 'asof')
+    # The merges of the cartesian engine cast positions to float64, the as-of engine keeps the int64 of reconstruct_positions: values are compared, not dtypes
+    pd.testing.assert_frame_equal(asof, cartesian, check_exact=True, check_dtype=False)
+    return asof
+
+
+
+def test_small_portfolio(small_files):
+    valued = assert_engines_equal(small_files).set_index(['date', 'ticker'])
+    # Before the first price, on a date without a price row, and on a missing price (latest recorded price carried over)
+    assert np.isnan(valued.loc[('2020-01-01', 'SPY'), 'price'])
+    assert valued.loc[('2020-01-04', 'TLT'), 'price'] == 50.5
+    assert valued.loc[('2020-01-06', 'SPY'), 'price'] == 101.5
+    assert valued.loc[('2020-01-09', 'TLT'), 'value'] == 0
+
+
+
+def test_bundled_files(bundled_files):
+    assert_engines_equal(bundled_files)
\ No newline at end of file